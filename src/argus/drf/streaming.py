@@ -0,0 +1,42 @@
+import json
+
+from django.http import StreamingHttpResponse
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+__all__ = ["StreamingJSONListResponse"]
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def _serialize_in_chunks(queryset, serializer_class, context, chunk_size):
+    yield "["
+    separator = ""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) < chunk_size:
+            continue
+        for item in serializer_class(chunk, many=True, context=context).data:
+            yield separator + json.dumps(item, cls=JSONEncoder)
+            separator = ","
+        chunk = []
+    for item in serializer_class(chunk, many=True, context=context).data:
+        yield separator + json.dumps(item, cls=JSONEncoder)
+        separator = ","
+    yield "]"
+
+
+class StreamingJSONListResponse(StreamingHttpResponse):
+    """
+    Serializes a queryset into a JSON list while it is being sent.
+
+    Only ``chunk_size`` objects are held in memory at a time. Prefetches on the
+    queryset are done per chunk.
+    """
+
+    def __init__(self, queryset, serializer_class, context=None, chunk_size=DEFAULT_CHUNK_SIZE, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(_serialize_in_chunks(queryset, serializer_class, context, chunk_size), **kwargs)
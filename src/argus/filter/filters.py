@@ -69,6 +69,12 @@ _INCIDENT_OPENAPI_CUSTOM_FILTER_PARAMETERS = [
         description="Fetch incidents that concern expiration of authentication tokens.",
         enum=BooleanStringOAEnum,
     ),
+    OpenApiParameter(
+        name="fulltext",
+        description="Fetch incidents where the incident or any of its events have all the words in `FULLTEXT` in their description."
+        " Words match as prefixes, and the incidents are ordered by relevance.",
+        type=str,
+    ),
     OpenApiParameter(
         name="filter_pk",
         description="Fetch incidents that are included in the filter with the given primary key.",
@@ -181,6 +187,7 @@ class IncidentFilter(filters.FilterSet):
     duration__gte = filters.NumberFilter(label="Duration", method="incident_filter")
     token_expiry = filters.BooleanFilter(label="Token expiry", method="incident_filter")
     hide_closed_acked = filters.BooleanFilter(label="Hide closed acked", method="incident_filter")
+    fulltext = filters.CharFilter(label="Full text search", method="incident_filter")
     filter_pk = IntegerFilter(label="Filter pk", method="incident_filter")
     notificationprofile_pk = IntegerFilter(label="Notificationprofile pk", method="incident_filter")
 
@@ -251,6 +258,10 @@ class IncidentFilter(filters.FilterSet):
             if value:
                 return queryset.open_or_unacked()
             return queryset
+        if name == "fulltext":
+            if value:
+                return queryset.search(value)
+            return queryset
         if name == "filter_pk":
             return QuerySetFilter.incidents_by_filter_pk(queryset, value)
         if name == "notificationprofile_pk":
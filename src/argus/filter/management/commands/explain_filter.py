@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from argus.filter.queryset_filters import QuerySetFilter
+from argus.notificationprofile.models import Filter
+
+
+class Command(BaseCommand):
+    help = "Show the SQL and query plan used to find the incidents matching a filter"
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument(
+            "-p",
+            "--pk",
+            type=int,
+            help="Select the filter to explain by pk",
+        )
+        group.add_argument(
+            "-n",
+            "--name",
+            type=str,
+            help="Select the filter to explain by name",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            default=False,
+            help="Run the query and show actual row counts and timings",
+        )
+
+    def handle(self, *args, **options):
+        pk = options.get("pk") or None
+        name = options.get("name") or None
+
+        filters = Filter.objects.all()
+        if pk:
+            filters = filters.filter(id=pk)
+        if name:
+            filters = filters.filter(name=name)
+
+        filter_ = filters.first()
+        if not filter_:
+            raise CommandError("No such filter")
+
+        explain_options = {"analyze": True} if options["analyze"] else {}
+        self.stdout.write(QuerySetFilter.explain(filter_.filter, **explain_options))
@@ -1,79 +1,142 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from typing import TYPE_CHECKING, Optional
+
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
 
 from argus.filter.filterwrapper import FilterWrapper, FilterBlobType, SpecialFilterKey
-from argus.incident.models import Incident
+from argus.incident.models import Event, Incident, IncidentTagRelation, Tag
 
 if TYPE_CHECKING:
     from argus.notificationprofile.models import Filter, NotificationProfile
 
 
-__all__ = ["QuerySetFilter"]
+__all__ = ["QuerySetFilter", "compile_filterblob"]
 
 
-def _incidents_with_source_system_types(incident_queryset, filterblob: FilterBlobType):
+# Each condition is a Q on Incident that never joins to more than one row per
+# incident, so that they can be ANDed into a single WHERE clause without
+# needing DISTINCT. Many-valued relations are checked with EXISTS.
+
+
+def _source_system_types_condition(filterblob: FilterBlobType) -> Q:
     source_list = filterblob.get("source_types", [])
     if source_list:
-        incident_queryset.prefetch_related("source")
-        return incident_queryset.filter(source__type_id__in=source_list).distinct()
-    return incident_queryset.distinct()
+        return Q(source__type_id__in=source_list)
+    return Q()
 
 
-def _incidents_with_source_systems(incident_queryset, filterblob: FilterBlobType):
+def _source_systems_condition(filterblob: FilterBlobType) -> Q:
     source_list = filterblob.get("sourceSystemIds", [])
     if source_list:
-        return incident_queryset.filter(source__in=source_list).distinct()
-    return incident_queryset.distinct()
+        return Q(source__in=source_list)
+    return Q()
 
 
-def _incidents_with_tags(incident_queryset, filterblob: FilterBlobType):
+def _tags_condition(filterblob: FilterBlobType) -> Q:
+    "All keys must match, any of the values of the same key will do"
     tags_list = filterblob.get("tags", [])
-    if tags_list:
-        return incident_queryset.from_tags(*tags_list)
-    return incident_queryset.distinct()
-
-
-def _incidents_fitting_tristates(incident_queryset, filterblob: FilterBlobType):
-    fitting_incidents = incident_queryset
+    values_per_key = defaultdict(set)
+    for key, value in (Tag.split(tag) for tag in tags_list):
+        values_per_key[key].add(value)
+    condition = Q()
+    for key, values in values_per_key.items():
+        tag_relations = IncidentTagRelation.objects.filter(incident=OuterRef("pk"), tag__key=key, tag__value__in=values)
+        condition &= Q(Exists(tag_relations))
+    return condition
+
+
+def _tristates_condition(filterblob: FilterBlobType) -> Q:
+    "The same as the IncidentQuerySet methods of the same name"
+    now = timezone.now()
+    condition = Q()
     filter_open = filterblob.get("open", None)
     filter_acked = filterblob.get("acked", None)
     filter_stateful = filterblob.get("stateful", None)
 
     if filter_open is True:
-        fitting_incidents = fitting_incidents.open()
+        condition &= Q(end_time__gt=now)
     if filter_open is False:
-        fitting_incidents = fitting_incidents.closed()
+        condition &= Q(end_time__lte=now)
     if filter_acked is True:
-        fitting_incidents = fitting_incidents.acked()
+        condition &= Q(acked_until__gt=now)
     if filter_acked is False:
-        fitting_incidents = fitting_incidents.not_acked()
+        condition &= ~Q(acked_until__gt=now)
     if filter_stateful is True:
-        fitting_incidents = fitting_incidents.stateful()
+        condition &= Q(end_time__isnull=False)
     if filter_stateful is False:
-        fitting_incidents = fitting_incidents.stateless()
-    return fitting_incidents.distinct()
+        condition &= Q(end_time__isnull=True)
+    return condition
 
 
-def _incidents_fitting_special_filters(incident_queryset, filterblob: FilterBlobType):
+def _special_filters_condition(filterblob: FilterBlobType) -> Q:
     if filterblob.get(SpecialFilterKey.HIDE_CLOSED_ACKED, False):
-        incident_queryset = incident_queryset.open_or_unacked()
-    return incident_queryset.distinct()
+        # IncidentQuerySet.open_or_unacked()
+        now = timezone.now()
+        return ~Q(end_time__lte=now, acked_until__gt=now)
+    return Q()
 
 
-def _incidents_fitting_maxlevel(incident_queryset, filterblob: FilterBlobType):
+def _maxlevel_condition(filterblob: FilterBlobType) -> Q:
     maxlevel = filterblob.get("maxlevel", None)
     if not maxlevel:
-        return incident_queryset.distinct()
-    return incident_queryset.filter(level__lte=maxlevel).distinct()
+        return Q()
+    return Q(level__lte=maxlevel)
 
 
-def _incidents_fitting_event_types(incident_queryset, filterblob):
+def _event_types_condition(filterblob: FilterBlobType) -> Q:
     event_types = filterblob.get("event_types", [])
     if not event_types:
-        return incident_queryset.distinct()
-    incident_queryset = incident_queryset.prefetch_related("events")
-    return incident_queryset.filter(events__type__in=event_types).distinct()
+        return Q()
+    return Q(Exists(Event.objects.filter(incident=OuterRef("pk"), type__in=event_types)))
+
+
+def compile_filterblob(filterblob: FilterBlobType) -> Optional[Q]:
+    "Turn a filterblob into a single condition on incidents, None if the filter is empty"
+    if FilterWrapper(filterblob).is_empty:
+        return None
+    return (
+        _source_system_types_condition(filterblob)
+        & _source_systems_condition(filterblob)
+        & _tags_condition(filterblob)
+        & _tristates_condition(filterblob)
+        & _maxlevel_condition(filterblob)
+        & _event_types_condition(filterblob)
+        & _special_filters_condition(filterblob)
+    )
+
+
+def _incidents_with_source_system_types(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_source_system_types_condition(filterblob))
+
+
+def _incidents_with_source_systems(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_source_systems_condition(filterblob))
+
+
+def _incidents_with_tags(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_tags_condition(filterblob))
+
+
+def _incidents_fitting_tristates(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_tristates_condition(filterblob))
+
+
+def _incidents_fitting_special_filters(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_special_filters_condition(filterblob))
+
+
+def _incidents_fitting_maxlevel(incident_queryset, filterblob: FilterBlobType):
+    return incident_queryset.filter(_maxlevel_condition(filterblob))
+
+
+def _incidents_fitting_event_types(incident_queryset, filterblob):
+    return incident_queryset.filter(_event_types_condition(filterblob))
 
 
 class QuerySetFilter:
@@ -81,27 +144,24 @@ class QuerySetFilter:
     def filtered_incidents(filterblob: FilterBlobType, incident_queryset=None):
         if incident_queryset is None:
             incident_queryset = Incident.objects.all()
-        filterblob = filterblob.copy()
-        fw = FilterWrapper(filterblob)
-        if fw.is_empty:
-            return Incident.objects.none().distinct()
-        filtered_by_source_type = _incidents_with_source_system_types(incident_queryset, filterblob)
-        filtered_by_source = _incidents_with_source_systems(incident_queryset, filterblob)
-        filtered_by_tags = _incidents_with_tags(incident_queryset, filterblob)
-        filtered_by_tristates = _incidents_fitting_tristates(incident_queryset, filterblob)
-        filtered_by_maxlevel = _incidents_fitting_maxlevel(incident_queryset, filterblob)
-        filtered_by_event_types = _incidents_fitting_event_types(incident_queryset, filterblob)
-        filtered_by_special = _incidents_fitting_special_filters(incident_queryset, filterblob)
-
-        return (
-            filtered_by_source_type
-            & filtered_by_source
-            & filtered_by_tags
-            & filtered_by_tristates
-            & filtered_by_maxlevel
-            & filtered_by_event_types
-            & filtered_by_special
-        )
+        condition = compile_filterblob(filterblob)
+        if condition is None:
+            return incident_queryset.none()
+        return incident_queryset.filter(condition)
+
+    @classmethod
+    def explain(cls, filterblob: FilterBlobType, incident_queryset=None, **options) -> str:
+        """Return the SQL of the query for the filterblob, followed by its query plan
+
+        ``options`` are passed on to ``QuerySet.explain()``, for instance
+        ``analyze=True`` to run the query and show the actual timings.
+        """
+        qs = cls.filtered_incidents(filterblob, incident_queryset)
+        try:
+            sql = str(qs.query)
+        except EmptyResultSet:
+            return "The filter is empty and matches no incidents, no query is made"
+        return f"{sql}\n\n{qs.explain(**options)}"
 
     @classmethod
     def incidents_by_filter(cls, incident_queryset, filter: Filter):
@@ -130,15 +190,12 @@ class QuerySetFilter:
         if incident_queryset is None:
             incident_queryset = Incident.objects.all()
 
-        filters = notificationprofile.filters.all()
-
-        filtered_incidents_pks = set()
-        for filtr in filters:
-            filtered_incidents_pks.update(
-                cls.filtered_incidents(filtr.filter, incident_queryset).values_list("pk", flat=True)
-            )
-
-        return incident_queryset.filter(pk__in=filtered_incidents_pks)
+        # An incident matches the profile if it matches any of its filters
+        conditions = [compile_filterblob(filtr.filter) for filtr in notificationprofile.filters.all()]
+        conditions = [condition for condition in conditions if condition is not None]
+        if not conditions:
+            return incident_queryset.none()
+        return incident_queryset.filter(reduce(or_, conditions))
 
     @classmethod
     def incidents_by_notificationprofile_pk(cls, incident_queryset, notificationprofile_pk):
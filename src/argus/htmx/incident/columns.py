@@ -210,6 +210,14 @@ _BUILTIN_COLUMN_LIST = [
         filter_field="description",
         sort_field="description",
     ),
+    IncidentTableColumn(
+        "fulltext_search_description",
+        "Description",
+        "htmx/incident/cells/_incident_description.html",
+        detail_link=True,
+        filter_field="fulltext",
+        sort_field="description",
+    ),
     IncidentTableColumn(
         "ack",
         "Ack",
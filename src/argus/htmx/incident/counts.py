@@ -0,0 +1,112 @@
+"""Count incidents for the incident list without counting the table on every refresh
+
+The incident list shows both the total number of incidents and the number
+after filtering, and is refreshed every few seconds in every open browser tab.
+Exact counts are cached for ``ARGUS_INCIDENT_COUNT_CACHE_TIMEOUT`` seconds in
+Django's cache, keyed on the filter and the filter function, so that all tabs
+showing the same filter share them. A filter function other than the default
+may filter differently for each user, so then every user has their own counts.
+
+Once the incident table has grown past
+``ARGUS_INCIDENT_COUNT_ESTIMATE_THRESHOLD`` rows, the total is the estimate
+PostgreSQL keeps for the query planner instead of an exact count.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Model, QuerySet
+
+from argus.htmx import defaults
+from argus.incident.models import Incident
+from .utils import get_filter_function
+
+
+__all__ = [
+    "IncidentCount",
+    "estimate_incident_count",
+    "get_total_count",
+    "get_filtered_count",
+]
+
+COUNT_CACHE_TIMEOUT = 10  # seconds
+COUNT_ESTIMATE_THRESHOLD = 100_000
+COUNT_CACHE_KEY = "argus.htmx.incident_count.{}"
+# Parameters of the incident list that do not change which incidents are shown
+NON_FILTER_PARAMS = {"page", "cursor", "page_size", "sort", "sort_order"}
+
+
+class IncidentCount(NamedTuple):
+    value: int
+    estimated: bool = False
+
+
+def _normalize(value: Any):
+    if isinstance(value, Model):
+        return value.pk
+    if isinstance(value, (list, tuple, set, QuerySet)):
+        return sorted((_normalize(item) for item in value), key=str)
+    return str(value)
+
+
+def _get_dotted_path(function) -> str:
+    return f"{function.__module__}.{function.__qualname__}"
+
+
+def _get_cache_key(params: dict, user=None) -> str:
+    normalized = {key: _normalize(value) for key, value in params.items() if key not in NON_FILTER_PARAMS and value}
+    filter_function = _get_dotted_path(get_filter_function())
+    user_pk = None
+    if filter_function != _get_dotted_path(get_filter_function(defaults.ARGUS_HTMX_FILTER_FUNCTION)):
+        user_pk = getattr(user, "pk", None)
+    key = [filter_function, user_pk, normalized]
+    digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+    return COUNT_CACHE_KEY.format(digest)
+
+
+def _cached_count(qs: QuerySet, cache_key: str, refresh: bool = False) -> int:
+    timeout = getattr(settings, "ARGUS_INCIDENT_COUNT_CACHE_TIMEOUT", COUNT_CACHE_TIMEOUT)
+    count = cache.get(cache_key) if timeout and not refresh else None
+    if count is None:
+        count = qs.count()
+        if timeout:
+            cache.set(cache_key, count, timeout=timeout)
+    return count
+
+
+def estimate_incident_count() -> Optional[int]:
+    "Return the number of incidents as estimated by PostgreSQL, None if unknown"
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass", [Incident._meta.db_table])
+        row = cursor.fetchone()
+    # The table has never been analyzed if negative
+    if not row or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def get_total_count(qs: QuerySet) -> IncidentCount:
+    "Count all incidents, estimated if there are very many of them"
+    threshold = getattr(settings, "ARGUS_INCIDENT_COUNT_ESTIMATE_THRESHOLD", COUNT_ESTIMATE_THRESHOLD)
+    if threshold:
+        estimate = estimate_incident_count()
+        if estimate is not None and estimate >= threshold:
+            return IncidentCount(estimate, estimated=True)
+    return IncidentCount(_cached_count(qs, COUNT_CACHE_KEY.format("total")))
+
+
+def get_filtered_count(qs: QuerySet, params: dict, user=None, refresh: bool = False) -> int:
+    """Count the incidents in the incident list filtered by ``params`` for ``user``
+
+    If ``refresh`` is True the incidents are counted even if the count is
+    cached.
+    """
+    return _cached_count(qs, _get_cache_key(params, user), refresh=refresh)
@@ -59,6 +59,21 @@ class DescriptionForm(SearchMixin, IncidentListForm):
     description = forms.CharField(required=False)
 
 
+class FullTextSearchForm(IncidentListForm):
+    widget_template_name = "htmx/incident/cells/search_fields/input_search.html"
+    fieldname = "fulltext"
+    field_initial = ""
+    placeholder = "words in incident or events"
+
+    fulltext = forms.CharField(required=False)
+
+    def filter(self, queryset, request):
+        _input = self.get_clean_value(request)
+        if _input:
+            queryset = queryset.search(_input)
+        return queryset
+
+
 class LevelForm(SearchMixin, IncidentListForm):
     fieldname = "level"
     field_initial = ""
@@ -0,0 +1,180 @@
+"""Keyset pagination for the incident list
+
+Instead of skipping the incidents on the previous pages with OFFSET, which
+gets slower the further in one goes, a page starts right after (or before) the
+sort values of the last (or first) incident seen. This is the same technique
+as the cursor pagination of the API, but works with any of the sort fields of
+the incident table.
+
+The sort field is always followed by the primary key, in the same direction,
+so that every incident has a unique position. Empty values (NULL) sort last
+when ascending and first when descending, as PostgreSQL does by default.
+
+The position is sent back and forth as an opaque ``cursor``. A cursor that
+does not fit the current sort order is ignored, which shows the first page.
+"""
+
+from __future__ import annotations
+
+import base64
+from datetime import datetime
+import json
+from typing import Any, Optional, Sequence
+
+from django.db.models import F, Q, QuerySet
+
+
+__all__ = [
+    "KeysetPage",
+    "KeysetPaginator",
+]
+
+
+def _parse_ordering(ordering: Sequence[str]) -> list[tuple[str, bool]]:
+    "Turn ordering strings into (field, descending) pairs ending with the primary key"
+    keys = [(field.lstrip("-"), field.startswith("-")) for field in ordering]
+    if not keys or keys[-1][0] != "pk":
+        keys.append(("pk", keys[0][1] if keys else True))
+    return keys
+
+
+def _get_value(obj, field: str):
+    for attr in field.split("__"):
+        obj = getattr(obj, attr)
+        if obj is None:
+            break
+    return obj
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _equal(field: str, value: Any) -> Q:
+    if value is None:
+        return Q(**{f"{field}__isnull": True})
+    return Q(**{field: value})
+
+
+def _after(field: str, value: Any, descending: bool) -> Q:
+    "Values that come after ``value`` when sorting by ``field``"
+    if descending:
+        # NULLs first
+        if value is None:
+            return Q(**{f"{field}__isnull": False})
+        return Q(**{f"{field}__lt": value})
+    # NULLs last
+    if value is None:
+        return Q(pk__in=[])
+    return Q(**{f"{field}__gt": value}) | Q(**{f"{field}__isnull": True})
+
+
+class KeysetPage:
+    "A page of objects, duck-typing the parts of Django's Page used by the templates"
+
+    number = None
+
+    def __init__(
+        self,
+        object_list: list,
+        paginator: KeysetPaginator,
+        has_next: bool,
+        has_previous: bool,
+    ):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def next_cursor(self) -> Optional[str]:
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[-1], previous=False)
+
+    def previous_cursor(self) -> Optional[str]:
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.encode_cursor(self.object_list[0], previous=True)
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` sorted by ``ordering`` by position instead of page number
+
+    ``ordering`` is a list of field names as given to ``QuerySet.order_by``,
+    the queryset is sorted by them and the primary key.
+    """
+
+    def __init__(self, queryset: QuerySet, ordering: Sequence[str], per_page: int):
+        self.keys = _parse_ordering(ordering)
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def _order_by(self, queryset: QuerySet, reverse: bool = False) -> QuerySet:
+        expressions = []
+        for field, descending in self.keys:
+            if descending != reverse:
+                expressions.append(F(field).desc(nulls_first=True))
+            else:
+                expressions.append(F(field).asc(nulls_last=True))
+        return queryset.order_by(*expressions)
+
+    def _after(self, values: list, reverse: bool = False) -> Q:
+        # (a, b) after (x, y) is: a after x, or a equal to x and b after y
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (field, descending), value in zip(self.keys, values):
+            condition |= equal & _after(field, value, descending != reverse)
+            equal &= _equal(field, value)
+        return condition
+
+    def _signature(self) -> list:
+        return [f"-{field}" if descending else field for field, descending in self.keys]
+
+    def encode_cursor(self, obj, previous: bool) -> str:
+        values = [_encode_value(_get_value(obj, field)) for field, _ in self.keys]
+        data = {"o": self._signature(), "v": values, "p": previous}
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def decode_cursor(self, cursor: Optional[str]) -> Optional[tuple[list, bool]]:
+        "Return the values and direction of the cursor, None if it does not fit"
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, previous = data["v"], bool(data["p"])
+            if data["o"] != self._signature() or len(values) != len(self.keys):
+                return None
+        except (ValueError, TypeError, KeyError):
+            return None
+        return values, previous
+
+    def get_page(self, cursor: Optional[str] = None) -> KeysetPage:
+        position = self.decode_cursor(cursor)
+        if position is None:
+            objects = list(self._order_by(self.queryset)[: self.per_page + 1])
+            has_next = len(objects) > self.per_page
+            return KeysetPage(objects[: self.per_page], self, has_next=has_next, has_previous=False)
+
+        values, previous = position
+        queryset = self._order_by(self.queryset.filter(self._after(values, reverse=previous)), reverse=previous)
+        objects = list(queryset[: self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[: self.per_page]
+        if previous:
+            objects.reverse()
+            return KeysetPage(objects, self, has_next=True, has_previous=has_more)
+        return KeysetPage(objects, self, has_next=has_more, has_previous=True)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 from collections.abc import Iterable
 from datetime import datetime
@@ -7,8 +8,10 @@ from urllib.parse import urlencode
 from typing import Optional, Any
 
 from django import forms
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.http import (
     HttpResponse,
@@ -33,6 +36,8 @@ from argus.util.datetime_utils import make_aware
 from ..request import HtmxHttpRequest
 
 from .columns import get_incident_table_columns
+from .counts import get_filtered_count, get_total_count
+from .pagination import KeysetPaginator
 from .constants import KIOSK_PAGE_SIZE
 from .filter import get_kiosk_filter_display
 from .utils import get_filter_function
@@ -50,6 +55,9 @@ from ..utils import (
 User = get_user_model()
 LOG = logging.getLogger(__name__)
 KIOSK_URL_NAME = "htmx:incident-list-kiosk"
+TAG_SUGGESTIONS_LIMIT = 20
+TAG_SUGGESTIONS_CACHE_TIMEOUT = 60  # seconds
+TAG_SUGGESTIONS_CACHE_KEY = "argus.htmx.tag_suggestions.{}"
 
 
 # Map request trigger to parameters for incidents update
@@ -251,6 +259,22 @@ class SearchForm(forms.Form):
     search = forms.CharField(required=False)
 
 
+def get_tag_suggestions(query: str) -> list[str]:
+    """Return the most used tags matching ``query``
+
+    The suggestions are cached for ``ARGUS_TAG_SUGGESTIONS_CACHE_TIMEOUT``
+    seconds since every keystroke in the tag autocomplete asks for them.
+    """
+    timeout = getattr(settings, "ARGUS_TAG_SUGGESTIONS_CACHE_TIMEOUT", TAG_SUGGESTIONS_CACHE_TIMEOUT)
+    cache_key = TAG_SUGGESTIONS_CACHE_KEY.format(hashlib.sha256(query.encode()).hexdigest())
+    suggestions = cache.get(cache_key) if timeout else None
+    if suggestions is None:
+        suggestions = [str(tag) for tag in Tag.objects.suggest(query)[:TAG_SUGGESTIONS_LIMIT]]
+        if timeout:
+            cache.set(cache_key, suggestions, timeout=timeout)
+    return suggestions
+
+
 @require_GET
 def search_tags(request):
     query = request.GET.get("q")
@@ -258,13 +282,7 @@ def search_tags(request):
     if not query:
         return JsonResponse({"results": []})
 
-    if Tag.TAG_DELIMITER in query:
-        key, value = Tag.split(query)
-        tags = Tag.objects.filter(key=key, value__icontains=value)[:20]
-    else:
-        tags = Tag.objects.filter(key__icontains=query)[:20]
-
-    options = [{"id": str(tag), "text": str(tag)} for tag in tags]
+    options = [{"id": tag, "text": tag} for tag in get_tag_suggestions(query)]
 
     return JsonResponse({"results": options})
 
@@ -295,7 +313,7 @@ def incident_list(request: HtmxHttpRequest, kiosk_mode: bool = False) -> HttpRes
         # has a lot of identical values
         qs = qs.order_by(ordering, f"-{SORT_DEFAULT}")
 
-    total_count = qs.count()
+    total_count = get_total_count(qs)
     last_refreshed = make_aware(datetime.now())
 
     incident_list_filter = get_filter_function()
@@ -325,26 +343,55 @@ def incident_list(request: HtmxHttpRequest, kiosk_mode: bool = False) -> HttpRes
         GET_params[form.fieldname] = form.get_clean_value(request) or initial_value
         qs = form.filter(qs, request)
 
+    if sort_form.is_default_sort_field() and "search_rank" in qs.query.annotations:
+        # Most relevant first when doing a full text search
+        qs = qs.order_by("-search_rank", ordering)
+
     # Add sort parameters to GET_params for URL preservation
     GET_params["sort"] = sort_form.get_sort_field()
     GET_params["sort_order"] = sort_form.get_sort_order()
 
-    filtered_count = qs.count()
+    filtered_count = get_filtered_count(qs, GET_params, request.user)
 
-    # Standard Django pagination
     # Kiosk mode has no page navigation, and has its own page size, so it always shows page 1
-    page_number = 1 if kiosk_mode else GET_params.get("page", 1)
     page_size = KIOSK_PAGE_SIZE if kiosk_mode else GET_params["page_size"]
-    paginator = Paginator(object_list=qs, per_page=page_size)
-    page = paginator.get_page(page_number)
-    last_page_num = page.paginator.num_pages
+    # Ranked full text search results are not sorted by a stored value
+    keyset_pagination = (
+        getattr(settings, "ARGUS_INCIDENTS_KEYSET_PAGINATION", False)
+        and not kiosk_mode
+        and "search_rank" not in qs.query.annotations
+    )
+    if keyset_pagination:
+        ordering_fields = [ordering] if sort_form.is_default_sort_field() else [ordering, f"-{SORT_DEFAULT}"]
+        paginator = KeysetPaginator(qs, ordering_fields, per_page=page_size)
+        cursor = request.GET.get("cursor", "")
+        page = paginator.get_page(cursor)
+        GET_params.pop("page", None)
+        if cursor:
+            GET_params["cursor"] = cursor
+        last_page_num = None
+    else:
+        # Standard Django pagination
+        page_number = 1 if kiosk_mode else GET_params.get("page", 1)
+        paginator = Paginator(object_list=qs, per_page=page_size)
+        # Do not count again, pages before the last do not depend on the exact count
+        paginator.count = filtered_count
+        page = paginator.get_page(page_number)
+        if page.number == paginator.num_pages or not page.object_list:
+            # The cached count may be stale, and would give the wrong last page
+            filtered_count = get_filtered_count(qs, GET_params, request.user, refresh=True)
+            paginator = Paginator(object_list=qs, per_page=page_size)
+            paginator.count = filtered_count
+            page = paginator.get_page(page_number)
+        last_page_num = page.paginator.num_pages
 
     qd = QueryDict(urlencode(GET_params, doseq=True))
     LOG.debug("Cleaned QueryDict: %s", qd)
     request.GET = qd
 
     refresh_info = {
-        "count": total_count,
+        "count": total_count.value,
+        "count_is_estimate": total_count.estimated,
         "filtered_count": filtered_count,
         "last_refreshed": last_refreshed,
     }
@@ -370,8 +417,10 @@ def incident_list(request: HtmxHttpRequest, kiosk_mode: bool = False) -> HttpRes
         "page_title": "Incidents",
         "base": base_template,
         "page": page,
+        "keyset_pagination": keyset_pagination,
+        "cursor": GET_params.get("cursor", ""),
         "last_page_num": last_page_num,
-        "second_to_last_page": last_page_num - 1,
+        "second_to_last_page": last_page_num - 1 if last_page_num else None,
         "kiosk_mode": kiosk_mode,
         "kiosk_filter_display": kiosk_filter_display,
         "incident_list_url": incident_list_url,
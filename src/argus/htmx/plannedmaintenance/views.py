@@ -1,6 +1,9 @@
+from functools import reduce
+from operator import and_
+
 from django import forms
 from django.core.exceptions import PermissionDenied
-from django.db.models import Case, IntegerField, When
+from django.db.models import Case, Count, IntegerField, Q, When
 from django.forms import modelform_factory
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
@@ -8,7 +11,7 @@ from django.urls import reverse
 from django.utils import timezone
 from django.views.generic import CreateView, DeleteView, DetailView, ListView, UpdateView, View
 
-from argus.filter.queryset_filters import QuerySetFilter
+from argus.filter.queryset_filters import compile_filterblob
 from argus.htmx.incident.columns import get_incident_table_columns, MAINTENANCE_COLUMN_LAYOUT_NAME
 from argus.htmx.utils import TemplateNameViewMixin, UserIsStaffMixin
 from argus.htmx.widgets import SearchDropdownMultiSelect
@@ -217,25 +220,34 @@ class FilterPreviewView(UserIsStaffMixin, View):
         if not filter_ids:
             return render(request, FILTER_PREVIEW_TEMPLATE, {"no_filters": True})
 
+        # All filters must match (AND logic), same as actual PM coverage in utils.py
+        filters = Filter.objects.filter(pk__in=filter_ids)
+        conditions = [compile_filterblob(filter_obj.filter) for filter_obj in filters]
+
+        # Count both all open incidents and the matching ones in one go
         open_incidents = Incident.objects.open()
-        total_open = open_incidents.count()
+        if None in conditions:
+            # An empty filter matches nothing
+            counts = open_incidents.aggregate(total_open=Count("pk"))
+            counts["matching_count"] = 0
+        else:
+            matching = reduce(and_, conditions, Q())
+            counts = open_incidents.aggregate(total_open=Count("pk"), matching_count=Count("pk", filter=matching))
+        total_open = counts["total_open"]
+        matching_count = counts["matching_count"]
 
         if not total_open:
             return render(request, "htmx/plannedmaintenance/_filter_preview.html", {"no_open_incidents": True})
 
-        # All filters must match (AND logic), same as actual PM coverage in utils.py
-        filters = Filter.objects.filter(pk__in=filter_ids)
-        matching_qs = open_incidents
-        for filter_obj in filters:
-            matching_qs = QuerySetFilter.filtered_incidents(filter_obj.filter, matching_qs)
-
-        matching_count = matching_qs.count()
-        matching_percent = round(100 * matching_count / total_open) if total_open else 0
-        incident_list = (
-            matching_qs.select_related("source")
-            .prefetch_related("incident_tag_relations", "incident_tag_relations__tag")
-            .order_by("-start_time")[:FILTER_PREVIEW_LIMIT]
-        )
+        matching_percent = round(100 * matching_count / total_open)
+        incident_list = []
+        if matching_count:
+            incident_list = (
+                open_incidents.filter(matching)
+                .select_related("source")
+                .prefetch_related("incident_tag_relations", "incident_tag_relations__tag")
+                .order_by("-start_time")[:FILTER_PREVIEW_LIMIT]
+            )
         columns = get_incident_table_columns(MAINTENANCE_COLUMN_LAYOUT_NAME)
 
         return render(
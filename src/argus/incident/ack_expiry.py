@@ -0,0 +1,110 @@
+"""Act on acknowledgements when they expire
+
+Whether an incident is acked is decided by comparing ``Incident.acked_until``
+with the current time, so it is correct without any writes when an
+acknowledgement expires. Nothing happens at that moment either, though. Here,
+an event is added to the incident when its last acknowledgement expires, which
+sends notifications like any other event.
+
+Acknowledgements that have expired but are not yet processed form a queue
+ordered by expiration. Saving an acknowledgement with an expiration schedules
+``task_process_expired_acks`` to run at that time, which processes everything
+that is due in batches. Running the ``process_expired_acks`` management command
+regularly does the same without a task queue worker.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Optional
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Acknowledgement, Event, Incident, get_or_create_default_instances
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "process_expired_acks",
+    "schedule_ack_expiry_processing",
+]
+
+DEFAULT_BATCH_SIZE = 500
+EXPIRED_DESCRIPTION = "Acknowledgement expired"
+
+
+def _process_batch(now: datetime, batch_size: int) -> tuple[int, list[Event]]:
+    "Process a batch of due expirations, return the batch size and the new events"
+    with transaction.atomic():
+        # Skip what other workers are processing right now
+        due = (
+            Acknowledgement.objects.expiry_due(now)
+            .order_by("expiration")
+            .select_for_update(skip_locked=True, of=("self",))
+            .values_list("pk", "event__incident_id")[:batch_size]
+        )
+        due = list(due)
+        if not due:
+            return 0, []
+
+        # Incidents with other acknowledgements still in effect are not unacked.
+        # An incident whose acknowledgements expire at once may show up in
+        # several batches, so lock it and only add the event once.
+        incident_ids = {incident_id for _, incident_id in due}
+        already_expired = Event.objects.filter(
+            incident=OuterRef("pk"),
+            type=Event.Type.OTHER,
+            description=EXPIRED_DESCRIPTION,
+            timestamp__gte=OuterRef("acked_until"),
+        )
+        unacked = (
+            Incident.objects.filter(pk__in=incident_ids, acked_until__lte=now)
+            .filter(~Exists(already_expired))
+            .order_by("pk")
+            .select_for_update(of=("self",))
+        )
+        argus_user, _, _ = get_or_create_default_instances()
+        events = [
+            Event.objects.create(
+                incident=incident,
+                actor=argus_user,
+                timestamp=incident.acked_until,
+                type=Event.Type.OTHER,
+                description=EXPIRED_DESCRIPTION,
+            )
+            for incident in unacked
+        ]
+        Acknowledgement.objects.filter(pk__in=[pk for pk, _ in due]).update(expiry_processed=True)
+    return len(due), events
+
+
+def process_expired_acks(now: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> list[Event]:
+    """Add an event to each incident whose last acknowledgement has expired
+
+    Returns the new events.
+    """
+    now = now or timezone.now()
+    events = []
+    while True:
+        processed, new_events = _process_batch(now, batch_size)
+        events.extend(new_events)
+        LOG.debug("Ack expiry: processed %i expired acks, %i incidents are no longer acked", processed, len(new_events))
+        if processed < batch_size:
+            return events
+
+
+def schedule_ack_expiry_processing(run_after: datetime):
+    "Process expired acknowledgements at ``run_after``"
+    from .tasks import task_process_expired_acks
+
+    if not task_process_expired_acks.get_backend().supports_defer:
+        # Leave it to the management command
+        return
+    task = task_process_expired_acks.using(run_after=run_after)
+    transaction.on_commit(task.enqueue)
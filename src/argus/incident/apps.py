@@ -11,9 +11,13 @@ class IncidentConfig(AppConfig):
             close_token_incident,
             delete_associated_user,
             delete_associated_event,
+            invalidate_cached_tags,
+            update_incident_ack_state,
         )
 
         post_delete.connect(delete_associated_user, "argus_incident.SourceSystem")
         post_delete.connect(delete_associated_event, "argus_incident.Acknowledgement")
+        post_delete.connect(update_incident_ack_state, "argus_incident.Acknowledgement")
+        post_delete.connect(invalidate_cached_tags, "argus_incident.Tag")
         post_delete.connect(close_token_incident, "authtoken.Token")
         post_save.connect(close_token_incident, "authtoken.Token")
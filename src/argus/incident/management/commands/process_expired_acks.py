@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from argus.incident.ack_expiry import DEFAULT_BATCH_SIZE, process_expired_acks
+
+
+class Command(BaseCommand):
+    help = "Add an event to incidents whose last acknowledgement has expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Process this many expired acknowledgements per transaction (default {DEFAULT_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        events = process_expired_acks(batch_size=options["batch_size"])
+        if options["verbosity"] > 1:
+            self.stdout.write(f"{len(events)} incidents are no longer acked")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.16 on 2026-10-18 04:47
+
+import django_psycopg_infinity.fields
+from django.db import migrations
+from django.db.models import Case, Exists, Max, OuterRef, Q, Subquery, Value, When
+
+
+def set_acked_until(apps, schema_editor):
+    Event = apps.get_model('argus_incident', 'Event')
+    Incident = apps.get_model('argus_incident', 'Incident')
+    ack_events = Event.objects.filter(incident=OuterRef('pk')).filter(Q(type='ACK') | Q(ack__isnull=False))
+    open_ended = ack_events.filter(Q(ack__isnull=True) | Q(ack__expiration__isnull=True))
+    latest_expiration = ack_events.order_by().values('incident').annotate(latest=Max('ack__expiration')).values('latest')
+    Incident.objects.filter(Exists(ack_events)).update(
+        acked_until=Case(
+            When(Exists(open_ended), then=Value('infinity')),
+            default=Subquery(latest_expiration),
+            output_field=django_psycopg_infinity.fields.DateTimeInfinityField(),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('argus_incident', '0004_alter_event_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='acked_until',
+            field=django_psycopg_infinity.fields.DateTimeInfinityField(blank=True, db_index=True, editable=False, help_text="When the latest acknowledgement expires, 'infinity' if it does not. Kept up to date from the acknowledgements; if not set, the incident has never been acked.", null=True),
+        ),
+        migrations.RunPython(set_acked_until, migrations.RunPython.noop),
+    ]
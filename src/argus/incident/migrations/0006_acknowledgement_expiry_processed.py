@@ -0,0 +1,30 @@
+# Generated by Django 5.2.16 on 2026-10-18 04:51
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_past_expiry_processed(apps, schema_editor):
+    # Do not add events for acknowledgements that expired before this
+    Acknowledgement = apps.get_model('argus_incident', 'Acknowledgement')
+    Acknowledgement.objects.filter(expiration__lte=timezone.now()).update(expiry_processed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('argus_incident', '0005_incident_acked_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='acknowledgement',
+            name='expiry_processed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_past_expiry_processed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='acknowledgement',
+            index=models.Index(condition=models.Q(('expiration__isnull', False), ('expiry_processed', False)), fields=['expiration'], name='acknowledgement_expiry_queue'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.16 on 2026-10-18 05:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def fill_search_vector(apps, schema_editor):
+    Incident = apps.get_model('argus_incident', 'Incident')
+    Incident.objects.update(
+        search_vector=django.contrib.postgres.search.SearchVector('description', 'search_text', config='simple')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('argus_incident', '0006_acknowledgement_expiry_processed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incident',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # Building the index after filling in the vectors is faster
+        migrations.RunPython(fill_search_vector, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='incident',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='incident_search_vector'),
+        ),
+    ]
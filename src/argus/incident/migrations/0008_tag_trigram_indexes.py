@@ -0,0 +1,50 @@
+# Generated by Django 5.2.16 on 2026-10-18 05:06
+
+import logging
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations
+
+
+LOG = logging.getLogger(__name__)
+
+TRIGRAM_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('key'), name='gin_trgm_ops'), name='tag_key_trigram'),
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('value'), name='gin_trgm_ops'), name='tag_value_trigram'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm is in contrib, which is not installed everywhere
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    if not available:
+        LOG.warning("The PostgreSQL extension pg_trgm is not available, tag search will not be indexed")
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    Tag = apps.get_model('argus_incident', 'Tag')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(Tag, index)
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for index in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('argus_incident', '0007_incident_search_vector'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+            ],
+            state_operations=[migrations.AddIndex(model_name='tag', index=index) for index in TRIGRAM_INDEXES],
+        ),
+    ]
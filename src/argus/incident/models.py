@@ -4,19 +4,25 @@ from functools import reduce
 import logging
 from operator import and_
 from urllib.parse import urljoin
-from typing import Optional
+from typing import Iterable, Optional
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchRank, SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, URLValidator
-from django.db import models
-from django.db.models import F, Q
+from django.db import DatabaseError, models, transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Concat, Length, Upper
 from django.utils import timezone
 from django.utils.timesince import timesince
 
-from argus.util.datetime_utils import INFINITY_REPR, get_infinity_repr
+from argus.util.datetime_utils import INFINITY_REPR, LOCAL_INFINITY, get_infinity_repr
 from .constants import Level
 from .fields import DateTimeInfinityField
+from .search import append_to_search_vector, make_search_query, make_search_vector
+from .tag_cache import get_tag_cache
 from .validators import validate_key, validate_lowercase
 
 
@@ -24,6 +30,7 @@ SOURCE_TAG_KEY = "source_system_id"
 HEARTBEAT_TAG = "problem_type=missing_heartbeat"
 MINIMUM_DURATION = timedelta(seconds=60)
 MAXIMUM_DURATION = timedelta(days=1)
+LAST_SEEN_INTERVAL = 60  # seconds
 LOG = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -103,7 +110,35 @@ class SourceSystem(models.Model):
 
     def update_last_seen(self, timestamp: Optional[datetime] = None):
         self.last_seen = timestamp if timestamp else timezone.now()
-        self.save()
+        self.save(update_fields=["last_seen"])
+
+    def get_last_seen_interval(self) -> timedelta:
+        "How old ``last_seen`` may get before an API request from the source updates it"
+        interval = timedelta(seconds=getattr(settings, "ARGUS_HEARTBEAT_LAST_SEEN_INTERVAL", LAST_SEEN_INTERVAL))
+        if self.heartbeat_frequency:
+            # Far from being mistaken for a missing heartbeat
+            interval = min(interval, self.heartbeat_frequency / 4)
+        return interval
+
+    def throttled_update_last_seen(self, timestamp: Optional[datetime] = None) -> bool:
+        """Update ``last_seen`` unless it is more recent than the last seen interval
+
+        Busy sources would otherwise write the same row on every request. The
+        check is repeated in the update, so that concurrent requests write at
+        most once. Returns whether ``last_seen`` was updated.
+        """
+        timestamp = timestamp if timestamp else timezone.now()
+        cutoff = timestamp - self.get_last_seen_interval()
+        if self.last_seen and self.last_seen > cutoff:
+            return False
+        updated = (
+            SourceSystem.objects.filter(pk=self.pk)
+            .filter(Q(last_seen__isnull=True) | Q(last_seen__lte=cutoff))
+            .update(last_seen=timestamp)
+        )
+        if updated:
+            self.last_seen = timestamp
+        return bool(updated)
 
     def is_dead(self, timestamp) -> None | bool:
         """Check if an expected heartbeat of a source is missing"""
@@ -123,9 +158,8 @@ class TagQuerySet(models.QuerySet):
         return querysets
 
     def create_from_tag(self, tag):
-        key, value = Tag.split(tag)
-        tag, _ = self.get_or_create(key=key, value=value)
-        return tag
+        pair = Tag.split(tag)
+        return self.get_or_create_many([pair])[pair]
 
     def from_tags(self, *tags: str):
         "Get a set Tag objects matching one or more tagstrings of format key=value"
@@ -135,11 +169,72 @@ class TagQuerySet(models.QuerySet):
             tagobjs.extend(list(qs))
         return set(tagobjs)
 
+    def get_or_create_many(self, pairs: Iterable[tuple[str, str]]) -> dict[tuple[str, str], "Tag"]:
+        """Get the tags with the given keys and values, creating the missing ones
+
+        ``pairs`` are (key, value) tuples. Returns a dict of (key, value): tag.
+        Recently used tags are remembered, see ``argus.incident.tag_cache``,
+        so no query is needed for them. Finding the rest takes one query if
+        they all exist, three otherwise.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        tag_cache = get_tag_cache()
+        tags = {}
+        if tag_cache is not None:
+            fields = ["id", "key", "value"]
+            for pair, tag_id in tag_cache.get_many(pairs).items():
+                tags[pair] = Tag.from_db(self.db, fields, [tag_id, *pair])
+        missing = pairs - tags.keys()
+        if not missing:
+            return tags
+
+        found = self._get_many(missing)
+        if missing - found.keys():
+            # Others might be creating the same tags
+            self.bulk_create(
+                [Tag(key=key, value=value) for key, value in missing - found.keys()], ignore_conflicts=True
+            )
+            found.update(self._get_many(missing - found.keys()))
+        tags.update(found)
+        if tag_cache is not None:
+            ids = {pair: tag.pk for pair, tag in found.items()}
+            # Tags created in a transaction that is rolled back must not be remembered
+            transaction.on_commit(lambda: tag_cache.set_many(ids), using=self.db)
+        return tags
+
+    def _get_many(self, pairs: set[tuple[str, str]]) -> dict[tuple[str, str], "Tag"]:
+        keys = {key for key, _ in pairs}
+        values = {value for _, value in pairs}
+        qs = self.filter(key__in=keys, value__in=values)
+        return {(tag.key, tag.value): tag for tag in qs if (tag.key, tag.value) in pairs}
+
     def from_tag_keys(self, *keys: str):
         "Get a queryset of Tag objects having the given keys"
         qs = self.filter(key__in=keys)
         return qs
 
+    def suggest(self, query: str, candidates: int = 200):
+        """Tags matching what has been typed so far, most used first
+
+        If ``query`` contains the delimiter, the key must match exactly and the
+        value contain the rest, otherwise the key must contain ``query``.
+        Matching uses the trigram indexes.
+
+        Only the ``candidates`` closest matches, the shortest ones, are ranked
+        by how much they are used, so that short queries do not count the
+        incidents of most tags.
+        """
+        if Tag.TAG_DELIMITER in query:
+            key, value = query.split(Tag.TAG_DELIMITER, maxsplit=1)
+            qs = self.filter(key=key.strip(), value__icontains=value.strip()).order_by(Length("value"), "value")
+        else:
+            qs = self.filter(key__icontains=query.strip()).order_by(Length("key"), "key", "value")
+        closest = qs.values("pk")[:candidates]
+        qs = self.filter(pk__in=closest).annotate(usage=Count("incident_tag_relations"))
+        return qs.order_by("-usage", "key", "value")
+
 
 class Tag(models.Model):
     TAG_DELIMITER = "="
@@ -154,6 +249,11 @@ class Tag(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["key", "value"], name="%(class)s_unique_key_and_value"),
         ]
+        indexes = [
+            # Substring search with icontains, which compares UPPER() of both sides
+            GinIndex(OpClass(Upper("key"), name="gin_trgm_ops"), name="%(class)s_key_trigram"),
+            GinIndex(OpClass(Upper("value"), name="gin_trgm_ops"), name="%(class)s_value_trigram"),
+        ]
 
     def __str__(self):
         return self.representation
@@ -231,12 +331,26 @@ class Event(models.Model):
         ordering = ["-timestamp"]
 
     def save(self, *args, **kwargs):
+        if self._state.adding and self.type == self.Type.ACKNOWLEDGE:
+            # The event is created before its acknowledgement, and notifications
+            # about the event check whether the incident is acked
+            self.incident.acked_until = LOCAL_INFINITY
+            self.incident.save(update_fields=["acked_until"])
         super().save(*args, **kwargs)
-        # update incident.search_text
-        if self.description in self.incident.search_text:
-            return
-        self.incident.search_text += " " + self.description
-        self.incident.save(force_update=True, update_fields=["search_text"])
+        if self.description:
+            self.add_to_search_document()
+
+    def add_to_search_document(self):
+        """Append the description to the search text and vector of the incident
+
+        Done in SQL so that the ever growing search text is never read and
+        written back. The incident row is not touched if the description is
+        already in it.
+        """
+        Incident.objects.filter(pk=self.incident_id).exclude(search_text__contains=self.description).update(
+            search_text=Concat(F("search_text"), Value(" " + self.description)),
+            search_vector=append_to_search_vector(self.description),
+        )
 
     def __str__(self):
         return f"'{self.get_type_display()}': {self.incident.description}, {self.actor} @ {self.timestamp}"
@@ -256,10 +370,10 @@ class IncidentQuerySet(models.QuerySet):
         return self.filter(end_time__lte=timezone.now())
 
     def acked(self):
-        return self.filter(id__in=self._get_acked_incident_ids())
+        return self.filter(acked_until__gt=timezone.now())
 
     def not_acked(self):
-        return self.exclude(id__in=self._get_acked_incident_ids())
+        return self.exclude(acked_until__gt=timezone.now())
 
     def open_or_unacked(self):
         """Exclude incidents that are both closed and acked.
@@ -267,10 +381,25 @@ class IncidentQuerySet(models.QuerySet):
         Shows all open incidents regardless of ack status, and all closed
         incidents that are still unacked.
         """
-        return self.exclude(
-            end_time__lte=timezone.now(),
-            id__in=self._get_acked_incident_ids(),
-        )
+        now = timezone.now()
+        return self.exclude(end_time__lte=now, acked_until__gt=now)
+
+    def search(self, text):
+        """Full text search in the descriptions of incidents and their events
+
+        Every word in ``text`` must match the start of a word. The incidents
+        are annotated with their relevance as ``search_rank``.
+        """
+        query = make_search_query(text)
+        if query is None:
+            return self
+        # Exact decimals rather than floats, so that the rank can be used in a cursor
+        rank = Cast(SearchRank(F("search_vector"), query), output_field=DecimalField(max_digits=20, decimal_places=10))
+        return self.filter(search_vector=query).annotate(search_rank=rank)
+
+    def update_search_vector(self):
+        "Rebuild the full text search vector from the incident and event descriptions"
+        return self.update(search_vector=make_search_vector("description", "search_text"))
 
     def has_ticket(self):
         return self.exclude(ticket_url="")
@@ -317,17 +446,41 @@ class IncidentQuerySet(models.QuerySet):
 
         return self.filter(source_id=argus_source_system.id).filter(incident_tag_relations__tag=token_expiry_tag)
 
-    # Cannot be a constant, because `timezone.now()` would have been evaluated at compile time
-    @staticmethod
-    def _get_acked_incident_ids():
-        current_acks = Acknowledgement.objects.active().prefetch_related("event__incident")
-        return current_acks.values_list("event__incident", flat=True).distinct()
+    def update_ack_state(self):
+        """
+        Recalculate ``acked_until`` from the acknowledgements of the incidents
+
+        Acknowledgements without expiration, and acknowledge-events whose
+        acknowledgement is not yet saved, make ``acked_until`` infinity.
+        Otherwise it is set to the latest expiration, or NULL if the incident
+        has never been acked.
+        """
+        ack_events = Event.objects.filter(incident=OuterRef("pk")).filter(
+            Q(type=Event.Type.ACKNOWLEDGE) | Q(ack__isnull=False)
+        )
+        open_ended = ack_events.filter(Q(ack__isnull=True) | Q(ack__expiration__isnull=True))
+        latest_expiration = (
+            ack_events.order_by().values("incident").annotate(latest=Max("ack__expiration")).values("latest")
+        )
+        acked_until = Case(
+            When(Exists(open_ended), then=Value(LOCAL_INFINITY)),
+            default=Subquery(latest_expiration),
+            output_field=DateTimeInfinityField(),
+        )
+        return self.update(acked_until=acked_until)
 
     def create_acks(self, actor: User, timestamp=None, description="", expiration=None):
         events = self.create_events(actor, Event.Type.ACKNOWLEDGE, timestamp, description)
         ack_objs = [Acknowledgement(event=event, expiration=expiration) for event in events]
         Acknowledgement.objects.bulk_create(ack_objs)
+        # bulk_create bypasses Acknowledgement.save()
+        Incident.objects.filter(pk__in=[event.incident_id for event in events]).update_ack_state()
         qs = Acknowledgement.objects.filter(event__in=events)
+        if ack_objs and expiration:
+            from .ack_expiry import schedule_ack_expiry_processing
+
+            # Parsed by the database, the expiration might be a string
+            schedule_ack_expiry_processing(qs.values_list("expiration", flat=True).first())
         return qs
 
     def create_events(self, actor: User, event_type: Event.Type, timestamp=None, description=""):
@@ -356,6 +509,46 @@ class IncidentQuerySet(models.QuerySet):
         )
         return qs
 
+    def create_with_first_events(self, incidents: list["Incident"], tags: list[Iterable[Tag]], actor: User):
+        """Create many incidents with their tags and first events at once
+
+        The bulk version of creating each incident, adding its tags and calling
+        ``create_first_event``. ``tags`` holds the tags of each of the
+        ``incidents``, added by ``actor``.
+
+        Since ``save()`` is bypassed no ``post_save`` signals are sent, instead
+        ``incidents_created_in_bulk`` is sent once for all the incidents and
+        events. Returns the first events.
+        """
+        from .signals import incidents_created_in_bulk
+
+        end_time_field = Incident._meta.get_field("end_time")
+        for incident in incidents:
+            incident.end_time = end_time_field.to_python(incident.end_time)
+            # What saving the first event would have added
+            if incident.description:
+                incident.search_text = " " + incident.description
+        incidents = Incident.objects.bulk_create(incidents)
+        Incident.objects.filter(pk__in=[incident.pk for incident in incidents]).update_search_vector()
+
+        IncidentTagRelation.objects.bulk_create(
+            IncidentTagRelation(tag=tag, incident=incident, added_by=actor)
+            for incident, incident_tags in zip(incidents, tags)
+            for tag in incident_tags
+        )
+        events = Event.objects.bulk_create(
+            Event(
+                incident=incident,
+                actor=incident.source.user,
+                timestamp=incident.start_time,
+                type=Event.Type.INCIDENT_START if incident.stateful else Event.Type.STATELESS,
+                description=incident.description,
+            )
+            for incident in incidents
+        )
+        incidents_created_in_bulk.send(sender=Incident, incidents=incidents, events=events)
+        return events
+
     def close(self, actor: User, timestamp=None, description=""):
         "Close incidents correctly and create the needed events"
         qs = self.open()
@@ -411,10 +604,22 @@ class Incident(models.Model):
         help_text="URL to existing ticket in a ticketing system.",
     )
     search_text = models.TextField(blank=True, default="", verbose_name="Search Text")
+    search_vector = SearchVectorField(null=True, editable=False)
     metadata = models.JSONField(blank=True, default=dict)
+    acked_until = DateTimeInfinityField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True,
+        help_text="When the latest acknowledgement expires, 'infinity' if it does not."
+        " Kept up to date from the acknowledgements; if not set, the incident has never been acked.",
+    )
 
     objects = IncidentQuerySet.as_manager()
 
+    # Only written by explicitly naming them in update_fields or in queryset updates
+    SQL_MAINTAINED_FIELDS = {"acked_until", "search_text", "search_vector"}
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -423,16 +628,65 @@ class Incident(models.Model):
                 name="%(class)s_unique_source_incident_id_per_source",
             ),
         ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="%(class)s_search_vector"),
+        ]
         ordering = ["-start_time"]
 
     def __str__(self):
         end_time_str = f" - {self.end_time_str}" if self.end_time else ""
         return f"Incident #{self.pk} at {self.start_time}{end_time_str} [#{self.source_incident_id} from {self.source}]"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Compared on save, to only reindex a changed description
+        self._loaded_description = self.__dict__.get("description")
+
     def save(self, *args, **kwargs):
         # Parse and replace `end_time`, to avoid having to call `refresh_from_db()`
-        self.end_time = self._meta.get_field("end_time").to_python(self.end_time)
-        super().save(*args, **kwargs)
+        if "end_time" not in self.get_deferred_fields():
+            self.end_time = self._meta.get_field("end_time").to_python(self.end_time)
+        if self._state.adding or kwargs.get("force_insert"):
+            super().save(*args, **kwargs)
+            self._reindex()
+            return
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            # Never overwrite what is kept up to date in SQL with a stale copy
+            update_fields = self._get_writable_fields()
+        reindex = "description" in update_fields and self.description != self._loaded_description
+        in_atomic_block = transaction.get_connection().in_atomic_block
+        needed_rollback = in_atomic_block and transaction.get_rollback()
+        try:
+            super().save(*args, **{**kwargs, "update_fields": update_fields})
+        except DatabaseError as e:
+            # Errors from the database have a cause, no rows updated has none
+            if kwargs.get("update_fields") is not None or kwargs.get("force_update") or e.__cause__ is not None:
+                raise
+            # The row is gone, insert it anew like a save without update_fields
+            # would. Nothing failed in the database, so the transaction may go on.
+            if in_atomic_block:
+                transaction.set_rollback(needed_rollback)
+            super().save(*args, **{**kwargs, "force_insert": True})
+            reindex = True
+        if reindex:
+            self._reindex()
+
+    def _get_writable_fields(self) -> list[str]:
+        "Names of the loaded fields that saving may write, see SQL_MAINTAINED_FIELDS"
+        deferred_fields = self.get_deferred_fields()
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.attname not in deferred_fields
+            and field.name not in self.SQL_MAINTAINED_FIELDS
+        ]
+
+    def _reindex(self):
+        Incident.objects.filter(pk=self.pk).update_search_vector()
+        self._loaded_description = self.description
 
     @property
     def end_time_str(self):
@@ -512,15 +766,13 @@ class Incident(models.Model):
 
     @property
     def acked(self):
-        acks_query = Q(ack__isnull=False)
-        acks_not_expired_query = Q(ack__expiration__isnull=True) | Q(ack__expiration__gt=timezone.now())
-        # This is specifically for when acks are just created
-        # The event (with type ACK) is created before the acknowledgement
-        # which triggers the notification sending which uses this function
-        # which is why we have to have this additional check
-        ack_is_just_being_created = Q(type=Event.Type.ACKNOWLEDGE) & Q(ack__isnull=True)
+        # Acks that are just being created count as well, see Event.save()
+        return self.acked_until is not None and self.acked_until > timezone.now()
 
-        return self.events.filter((acks_query & acks_not_expired_query) | ack_is_just_being_created).exists()
+    def update_ack_state(self):
+        "Recalculate and reload ``acked_until``"
+        Incident.objects.filter(pk=self.pk).update_ack_state()
+        self.refresh_from_db(fields=["acked_until"])
 
     def has_tags(self, *tags: str):
         tags = Tag.objects.from_tags(*tags)
@@ -739,6 +991,10 @@ class AcknowledgementQuerySet(models.QuerySet):
         timestamp = timestamp if timestamp else timezone.now()
         return self.exclude(expiration__lte=timestamp)
 
+    def expiry_due(self, timestamp=None):
+        "Expired acknowledgements whose expiry has not been processed yet"
+        return self.filter(expiry_processed=False).expired(timestamp)
+
     def group_names(self):
         return self.values_list("event__actor__groups__name", flat=True).distinct()
 
@@ -746,11 +1002,34 @@ class AcknowledgementQuerySet(models.QuerySet):
 class Acknowledgement(models.Model):
     event = models.OneToOneField(to=Event, on_delete=models.PROTECT, primary_key=True, related_name="ack")
     expiration = models.DateTimeField(null=True, blank=True)
+    expiry_processed = models.BooleanField(default=False, editable=False)
 
     objects = AcknowledgementQuerySet.as_manager()
 
     class Meta:
         ordering = ["-event__timestamp"]
+        indexes = [
+            models.Index(
+                fields=["expiration"],
+                condition=Q(expiry_processed=False, expiration__isnull=False),
+                name="%(class)s_expiry_queue",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # May be a string when set by hand
+        self.expiration = self._meta.get_field("expiration").to_python(self.expiration)
+        if settings.USE_TZ and self.expiration is not None and timezone.is_naive(self.expiration):
+            self.expiration = timezone.make_aware(self.expiration)
+        upcoming_expiry = self.expiration is not None and self.expiration > timezone.now()
+        if upcoming_expiry:
+            self.expiry_processed = False
+        super().save(*args, **kwargs)
+        self.event.incident.update_ack_state()
+        if upcoming_expiry:
+            from .ack_expiry import schedule_ack_expiry_processing
+
+            schedule_ack_expiry_processing(self.expiration)
 
     def __str__(self):
         expiration_message = f" (expires {self.expiration})" if self.expiration else ""
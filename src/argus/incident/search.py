@@ -0,0 +1,59 @@
+"""Full text search in incidents and their events
+
+``Incident.search_vector`` holds the words of the incident description and the
+descriptions of its events, and has a GIN index. The vector is rebuilt when the
+incident description changes and appended to in SQL when events are added, so
+that the incident row never has to be read first.
+
+The "simple" configuration is used since descriptions are mostly host names,
+interface names and error messages rather than prose in a known language.
+Every word searched for is matched as a prefix.
+"""
+
+import re
+from typing import Optional
+
+from django.contrib.postgres.search import SearchQuery, SearchVector, SearchVectorField
+from django.db.models import F, Func, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+__all__ = [
+    "SEARCH_CONFIG",
+    "append_to_search_vector",
+    "make_search_query",
+    "make_search_vector",
+]
+
+SEARCH_CONFIG = "simple"
+# Would end the quoting of a term in a raw tsquery
+UNSAFE_RE = re.compile(r"['\\]")
+
+
+def make_search_vector(*expressions):
+    return SearchVector(*expressions, config=SEARCH_CONFIG)
+
+
+def append_to_search_vector(text: str):
+    "Add the words in ``text`` to the existing search vector"
+    existing = Coalesce(F("search_vector"), Cast(Value(""), output_field=SearchVectorField()))
+    return Func(
+        existing,
+        make_search_vector(Value(text)),
+        template="(%(expressions)s)",
+        arg_joiner=" || ",
+        output_field=SearchVectorField(),
+    )
+
+
+def make_search_query(text: str) -> Optional[SearchQuery]:
+    """Match incidents having all the words in ``text``, as prefixes
+
+    Each word is quoted, so that it is split up by the same parser as the
+    descriptions were. Returns None if ``text`` has no words.
+    """
+    words = [word for word in UNSAFE_RE.sub(" ", text).split() if re.search(r"\w", word)]
+    if not words:
+        return None
+    raw_query = " & ".join(f"'{word}':*" for word in words)
+    return SearchQuery(raw_query, search_type="raw", config=SEARCH_CONFIG)
@@ -1,4 +1,5 @@
 from django.db.models import Q
+from django.dispatch import Signal
 from rest_framework.authtoken.models import Token
 
 from .models import (
@@ -8,15 +9,24 @@ from .models import (
     Tag,
     get_or_create_default_instances,
 )
+from .tag_cache import invalidate_tag_cache
 
 
 __all__ = [
+    "incidents_created_in_bulk",
     "delete_associated_user",
     "delete_associated_event",
+    "update_incident_ack_state",
+    "invalidate_cached_tags",
     "close_token_incident",
 ]
 
 
+# Sent by ``IncidentQuerySet.create_with_first_events()`` with the arguments
+# ``incidents`` and ``events``, in place of ``post_save`` for each of them
+incidents_created_in_bulk = Signal()
+
+
 def delete_associated_user(sender, instance: SourceSystem, *args, **kwargs):
     if hasattr(instance, "user") and instance.user:
         instance.user.delete()
@@ -27,6 +37,15 @@ def delete_associated_event(sender, instance: Acknowledgement, *args, **kwargs):
         instance.event.delete()
 
 
+def update_incident_ack_state(sender, instance: Acknowledgement, *args, **kwargs):
+    Incident.objects.filter(pk=instance.event.incident_id).update_ack_state()
+
+
+def invalidate_cached_tags(sender, *args, **kwargs):
+    "Make sure deleted tags are not handed out from the tag cache"
+    invalidate_tag_cache()
+
+
 # the rest_framework.authtoken is not under our control so keep the signal here
 def close_token_incident(instance: Token, **kwargs):
     if not hasattr(instance.user, "source_system"):
@@ -0,0 +1,120 @@
+"""Remember the ids of the most recently used tags
+
+Sources send the same few tags, like ``host=...`` and ``problem_type=...``, on
+every incident. Rather than looking each of them up in the database for every
+incident, the ids of the last ``ARGUS_TAG_CACHE_SIZE`` tags used are kept per
+process, by key and value.
+
+Tags are rarely deleted, but a deleted tag must not be handed out again.
+Deletions are signalled via a generation counter in Django's cache, bumped once
+the deletion is committed, and the remembered tags are forgotten at the latest
+after ``MAX_AGE`` seconds. For other processes to forget them right away, a
+cache shared between the processes is needed.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+__all__ = [
+    "TagCache",
+    "get_tag_cache",
+    "invalidate_tag_cache",
+]
+
+DEFAULT_SIZE = 1000
+MAX_AGE = 60  # seconds
+GENERATION_CACHE_KEY = "argus.incident.tag_cache.generation"
+
+_cached_tags: Optional[TagCache] = None
+
+
+class TagCache:
+    """A bounded mapping of (key, value) to tag id, dropping the least recently used first
+
+    Shared by all threads of the process.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.ids = OrderedDict()
+        self.generation = None
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_many(self, pairs: Iterable[tuple[str, str]]) -> dict[tuple[str, str], int]:
+        found = {}
+        with self.lock:
+            for pair in pairs:
+                tag_id = self.ids.get(pair)
+                if tag_id is not None:
+                    self.ids.move_to_end(pair)
+                    found[pair] = tag_id
+        return found
+
+    def set_many(self, ids: dict[tuple[str, str], int]):
+        with self.lock:
+            for pair, tag_id in ids.items():
+                self.ids[pair] = tag_id
+                self.ids.move_to_end(pair)
+            while len(self.ids) > self.size:
+                self.ids.popitem(last=False)
+
+
+def _get_size() -> int:
+    return getattr(settings, "ARGUS_TAG_CACHE_SIZE", DEFAULT_SIZE)
+
+
+def _get_generation() -> int:
+    return cache.get(GENERATION_CACHE_KEY, 0)
+
+
+def get_tag_cache() -> Optional[TagCache]:
+    "Return the remembered tags, or None if remembering tags is turned off"
+    global _cached_tags
+
+    size = _get_size()
+    if not size:
+        return None
+    generation = _get_generation()
+    tags = _cached_tags
+    if tags is not None and tags.generation == generation and time.monotonic() - tags.built_at < MAX_AGE:
+        tags.size = size
+        return tags
+
+    tags = TagCache(size)
+    tags.generation = generation
+    _cached_tags = tags
+    return tags
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        # Key is missing
+        cache.set(GENERATION_CACHE_KEY, 1, timeout=None)
+
+
+def invalidate_tag_cache():
+    "Make all processes forget the remembered tags"
+    global _cached_tags
+
+    _cached_tags = None
+    # Tags remembered meanwhile have the old generation and are forgotten too.
+    # Other processes must not forget before the change is visible to them.
+    transaction.on_commit(_bump_generation)
@@ -0,0 +1,8 @@
+from django_tasks import task
+
+from .ack_expiry import process_expired_acks
+
+
+@task
+def task_process_expired_acks():
+    process_expired_acks()
@@ -3,12 +3,13 @@ from collections import OrderedDict
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 from rest_framework import serializers
 
 from argus.auth.serializers import UsernameSerializer
-from argus.util.datetime_utils import INFINITY_REPR
+from argus.util.datetime_utils import INFINITY_REPR, get_infinity_repr
 from argus.incident import fields
 from argus.incident.models import (
     Acknowledgement,
@@ -133,11 +134,12 @@ class IncidentSerializer(serializers.ModelSerializer):
         user = validated_data.pop("user")
 
         tags_data = validated_data.pop("tags")
-        tags = {Tag.objects.get_or_create(**tag_data)[0] for tag_data in tags_data}
+        tags = Tag.objects.get_or_create_many((tag_data["key"], tag_data["value"]) for tag_data in tags_data)
 
         incident = Incident.objects.create(**validated_data)
-        for tag in tags:
-            IncidentTagRelation.objects.create(tag=tag, incident=incident, added_by=user)
+        IncidentTagRelation.objects.bulk_create(
+            IncidentTagRelation(tag=tag, incident=incident, added_by=user) for tag in tags.values()
+        )
         incident.create_first_event()
 
         return incident
@@ -225,7 +227,7 @@ class IncidentPureDeserializer(serializers.ModelSerializer):
 
     @staticmethod
     def add_and_remove_tags(instance: Incident, user: User, tags_data: list[dict]):
-        posted_tags = {Tag.objects.get_or_create(**tag_data)[0] for tag_data in tags_data}
+        posted_tags = set(Tag.objects.get_or_create_many((tag["key"], tag["value"]) for tag in tags_data).values())
 
         existing_tag_relations = instance.incident_tag_relations.select_related("tag")
         existing_tags = {tag_relation.tag for tag_relation in existing_tag_relations}
@@ -255,8 +257,9 @@ class IncidentPureDeserializer(serializers.ModelSerializer):
             tag_relation.delete()
             # XXX: remove tag object as well if no incident is connected to it?
 
-        for tag in add_tags:
-            IncidentTagRelation.objects.create(tag=tag, incident=instance, added_by=user)
+        IncidentTagRelation.objects.bulk_create(
+            IncidentTagRelation(tag=tag, incident=instance, added_by=user) for tag in add_tags
+        )
 
     def to_representation(self, instance: Incident):
         return IncidentSerializer(instance).data
@@ -282,6 +285,92 @@ class IncidentPureDeserializer(serializers.ModelSerializer):
         return IncidentSerializer().validate_ticket_url(value)
 
 
+class IncidentUpsertSerializer(IncidentSerializer):
+    """
+    Creates the incident, or updates the incident with the same
+    `source_incident_id` from the same source, recording the changes as events.
+    """
+
+    # Fields a source may change by posting the incident again
+    UPSERTABLE_FIELDS = ["details_url", "level", "metadata", "description"]
+
+    source_incident_id = serializers.CharField()
+
+    created = False
+
+    def create(self, validated_data: dict):
+        assert "source" in validated_data
+        lookup = {"source": validated_data["source"], "source_incident_id": validated_data["source_incident_id"]}
+        with transaction.atomic():
+            incident = Incident.objects.select_for_update().filter(**lookup).first()
+            if incident is None:
+                try:
+                    with transaction.atomic():
+                        incident = super().create(dict(validated_data))
+                    self.created = True
+                    return incident
+                except IntegrityError:
+                    # Created by someone else in the meantime
+                    incident = Incident.objects.select_for_update().filter(**lookup).first()
+                    if incident is None:
+                        raise
+            return self.update_existing(incident, validated_data)
+
+    def update_existing(self, instance: Incident, validated_data: dict):
+        user: User = validated_data["user"]
+        timestamp = timezone.now()
+
+        changes = {attr: validated_data[attr] for attr in self.UPSERTABLE_FIELDS if attr in validated_data}
+        changes = {attr: value for attr, value in changes.items() if value != getattr(instance, attr)}
+        if changes:
+            IncidentPureDeserializer().post_change_events(instance, user, changes)
+            for attr, value in changes.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=list(changes))
+
+        self.replace_own_tags(instance, user, validated_data["tags"], timestamp)
+
+        end_time = Incident._meta.get_field("end_time").to_python(validated_data["end_time"])
+        if instance.stateful and end_time is not None:
+            if get_infinity_repr(end_time, str_repr=True) != INFINITY_REPR:
+                instance.set_end(user, end_time)
+            elif not instance.open:
+                instance.end_time = INFINITY_REPR
+                instance.save(update_fields=["end_time"])
+                Event.objects.create(
+                    incident=instance, actor=user, timestamp=timestamp, type=Event.Type.INCIDENT_RESTART
+                )
+        return instance
+
+    @staticmethod
+    def replace_own_tags(instance: Incident, user: User, tags_data: list[dict], timestamp):
+        "Make the tags added by `user` the posted ones, tags added by others are kept"
+        posted_tags = set(Tag.objects.get_or_create_many((tag["key"], tag["value"]) for tag in tags_data).values())
+
+        existing_tag_relations = list(instance.incident_tag_relations.select_related("tag"))
+        existing_tags = {tag_relation.tag for tag_relation in existing_tag_relations}
+        remove_tag_relations = [
+            tag_relation
+            for tag_relation in existing_tag_relations
+            if tag_relation.tag not in posted_tags and tag_relation.added_by_id == user.pk
+        ]
+        add_tags = posted_tags - existing_tags
+        if not (remove_tag_relations or add_tags):
+            return
+
+        new_tags = existing_tags - {tag_relation.tag for tag_relation in remove_tag_relations} | add_tags
+        description = ChangeEvent.format_description(
+            "tags",
+            sorted(str(tag) for tag in existing_tags),
+            sorted(str(tag) for tag in new_tags),
+        )
+        ChangeEvent.objects.create(incident=instance, actor=user, timestamp=timestamp, description=description)
+        IncidentTagRelation.objects.filter(pk__in=[tag_relation.pk for tag_relation in remove_tag_relations]).delete()
+        IncidentTagRelation.objects.bulk_create(
+            IncidentTagRelation(tag=tag, incident=instance, added_by=user) for tag in add_tags
+        )
+
+
 class EventSerializer(serializers.ModelSerializer):
     actor = UsernameSerializer(required=False)
 
@@ -10,6 +10,7 @@ router.register(r"sources", views.SourceSystemViewSet)
 router.register(r"source-types", views.SourceSystemTypeViewSet)
 router.register(r"", views.IncidentViewSet)
 
+incidents_bulk_list = views.BulkIncidentViewSet.as_view({"post": "create"})
 sourced_incident_list = views.SourceLockedIncidentViewSet.as_view({"get": "list", "post": "create"})
 
 all_events_list = views.AllEventsViewSet.as_view({"get": "list"})
@@ -29,6 +30,7 @@ ticket_url_bulk_list = views.BulkTicketUrlViewSet.as_view({"post": "create"})
 
 app_name = "incident"
 urlpatterns = [
+    path("bulk/", incidents_bulk_list, name="incidents-bulk"),
     path("acks/bulk/", acks_bulk_list, name="incident-acks-bulk"),
     path("events/", all_events_list, name="events"),
     path("events/bulk/", events_bulk_list, name="incident-events-bulk"),
@@ -3,7 +3,7 @@ import secrets
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
 from django_filters import rest_framework as filters
@@ -16,9 +16,11 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError, PermissionDenied, MethodNotAllowed
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from argus.drf.parsers import NDJSONParser
 from argus.drf.permissions import IsSuperuserOrReadOnly
 from argus.filter import get_filter_backend
 from argus.util.datetime_utils import INFINITY_REPR
@@ -50,6 +52,7 @@ from .serializers import (
     IncidentPureDeserializer,
     IncidentSerializer,
     IncidentTicketUrlSerializer,
+    IncidentUpsertSerializer,
     RequestAcknowledgementSerializer,
     RequestBulkAcknowledgementSerializer,
     RequestBulkEventSerializer,
@@ -79,12 +82,36 @@ class IncidentPagination(CursorPagination):
     ordering = "-start_time"
     page_size_query_param = "page_size"
 
+    def get_ordering(self, request, queryset, view):
+        # Most relevant first when doing a full text search
+        if "search_rank" in queryset.query.annotations:
+            return ("-search_rank", self.ordering)
+        return super().get_ordering(request, queryset, view)
+
 
 class EventPagination(CursorPagination):
     ordering = "-timestamp"
     page_size_query_param = "page_size"
 
 
+def get_source_for_new_incident(user: User, data: dict) -> SourceSystem:
+    "Superusers may set the source of a new incident, otherwise it is the source of the user"
+    if "source" in data:
+        if not user.is_superuser:
+            raise serializers.ValidationError("You must be a superuser to be allowed to specify the 'source' field.")
+
+        source_pk = data["source"]
+        try:
+            return SourceSystem.objects.select_related("user").get(pk=source_pk)
+        except SourceSystem.DoesNotExist:
+            raise ValidationError(f"SourceSystem with pk={source_pk} does not exist.")
+
+    try:
+        return user.source_system
+    except SourceSystem.DoesNotExist:
+        raise ValidationError("The requesting user must have a connected source system.")
+
+
 class SourceSystemTypeViewSet(
     HeartBeatMixin,
     mixins.CreateModelMixin,
@@ -160,23 +187,7 @@ class BaseIncidentViewSet(
 
     def perform_create(self, serializer):
         user = self.request.user
-
-        if "source" in serializer.initial_data:
-            if not user.is_superuser:
-                raise serializers.ValidationError(
-                    "You must be a superuser to be allowed to specify the 'source' field."
-                )
-
-            source_pk = serializer.initial_data["source"]
-            try:
-                source = SourceSystem.objects.get(pk=source_pk)
-            except SourceSystem.DoesNotExist:
-                raise ValidationError(f"SourceSystem with pk={source_pk} does not exist.")
-        else:
-            try:
-                source = user.source_system
-            except SourceSystem.DoesNotExist:
-                raise ValidationError("The requesting user must have a connected source system.")
+        source = get_source_for_new_incident(user, serializer.initial_data)
 
         # TODO: send notifications to users
         try:
@@ -264,6 +275,29 @@ class IncidentViewSet(BaseIncidentViewSet):
             Incident.objects.prefetch_default_related().select_related("source").prefetch_related("events__ack").all()
         )
 
+    @extend_schema(
+        request=IncidentUpsertSerializer,
+        responses={"200": IncidentUpsertSerializer, "201": IncidentUpsertSerializer},
+    )
+    @action(detail=False, methods=["post"])
+    def upsert(self, request):
+        """Create an incident or update the existing one
+
+        The incident is identified by its `source_incident_id` and its source.
+        If it exists, changes to level, description, details URL, metadata,
+        tags and end time are applied and recorded as events, and 200 is
+        returned. Tags added by others are kept. Otherwise the incident is
+        created and 201 is returned.
+        """
+        serializer = IncidentUpsertSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        source = get_source_for_new_incident(request.user, request.data)
+        try:
+            serializer.save(user=request.user, source=source)
+        except IntegrityError as e:
+            raise serializers.ValidationError(e)
+        return Response(serializer.data, status=status.HTTP_201_CREATED if serializer.created else status.HTTP_200_OK)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -412,7 +446,7 @@ class IncidentTagViewSet(
 
     def perform_create(self, serializer):
         data = serializer.validated_data
-        tag, _ = Tag.objects.get_or_create(**data)
+        tag = Tag.objects.create_from_tag(Tag.join(data["key"], data["value"]))
         incident = self._get_incident()
         IncidentTagRelation.objects.get_or_create(incident=incident, tag=tag, defaults={"added_by": self.request.user})
 
@@ -697,6 +731,119 @@ class BulkEventViewSet(HeartBeatMixin, BulkHelper, viewsets.ViewSet):
         )
 
 
+@extend_schema_view(
+    create=extend_schema(
+        request=IncidentSerializer(many=True),
+        responses=ResponseBulkSerializer,
+    )
+)
+class BulkIncidentViewSet(HeartBeatMixin, viewsets.ViewSet):
+    """Create many incidents at once
+
+    Takes a JSON array of incidents, or newline delimited JSON with one
+    incident per line. Each incident is validated on its own and the result
+    for each is reported under its position in the input.
+    """
+
+    serializer_class = ResponseBulkSerializer
+    write_serializer_class = IncidentSerializer
+    parser_classes = [JSONParser, NDJSONParser]
+    change_key = "incident"
+
+    def create(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError("Expected a list of incidents.")
+
+        user = request.user
+        changes = {}
+        status_codes_seen = set()
+        sources = {}
+        source_incident_ids = set()
+        valid = []
+        for position, data in enumerate(request.data):
+            serializer = self.write_serializer_class(data=data)
+            try:
+                serializer.is_valid(raise_exception=True)
+                source_key = str(data.get("source"))
+                if source_key not in sources:
+                    sources[source_key] = get_source_for_new_incident(user, data)
+                source = sources[source_key]
+                source_incident_id = serializer.validated_data.get("source_incident_id")
+                if source_incident_id:
+                    if (source.pk, source_incident_id) in source_incident_ids:
+                        raise ValidationError({"source_incident_id": "Is repeated for the same source."})
+                    source_incident_ids.add((source.pk, source_incident_id))
+            except ValidationError as e:
+                changes[str(position)] = {
+                    self.change_key: None,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": e.detail,
+                }
+                status_codes_seen.add(status.HTTP_400_BAD_REQUEST)
+                continue
+            valid.append((position, source, serializer.validated_data))
+
+        existing = self.find_existing_source_incident_ids(source_incident_ids)
+        incidents = []
+        incident_positions = []
+        for position, source, validated_data in valid:
+            if (source.pk, validated_data.get("source_incident_id")) in existing:
+                changes[str(position)] = {
+                    self.change_key: None,
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": {"source_incident_id": "An incident with this source incident ID already exists."},
+                }
+                status_codes_seen.add(status.HTTP_400_BAD_REQUEST)
+                continue
+            incidents.append((source, validated_data))
+            incident_positions.append(position)
+
+        for position, incident in zip(incident_positions, self.create_incidents(incidents, user)):
+            changes[str(position)] = {
+                self.change_key: IncidentSerializer(incident).data,
+                "status": status.HTTP_201_CREATED,
+                "errors": None,
+            }
+            status_codes_seen.add(status.HTTP_201_CREATED)
+
+        all_bad = status_codes_seen == set((status.HTTP_400_BAD_REQUEST,))
+        return Response(
+            data={"changes": changes}, status=status.HTTP_400_BAD_REQUEST if all_bad else status.HTTP_201_CREATED
+        )
+
+    @staticmethod
+    def find_existing_source_incident_ids(source_incident_ids: set[tuple[int, str]]) -> set[tuple[int, str]]:
+        if not source_incident_ids:
+            return set()
+        qs = Incident.objects.filter(
+            source__in={source_pk for source_pk, _ in source_incident_ids},
+            source_incident_id__in={source_incident_id for _, source_incident_id in source_incident_ids},
+        )
+        return set(qs.values_list("source", "source_incident_id")) & source_incident_ids
+
+    @staticmethod
+    def create_incidents(incidents: list[tuple[SourceSystem, dict]], user: User) -> list[Incident]:
+        if not incidents:
+            return []
+        all_tags = Tag.objects.get_or_create_many(
+            (tag["key"], tag["value"]) for _, data in incidents for tag in data["tags"]
+        )
+        new_incidents = []
+        tags = []
+        for source, data in incidents:
+            data = dict(data)
+            tags.append({all_tags[(tag["key"], tag["value"])] for tag in data.pop("tags")})
+            new_incidents.append(Incident(source=source, **data))
+        try:
+            with transaction.atomic():
+                events = Incident.objects.create_with_first_events(new_incidents, tags, user)
+        except IntegrityError as e:
+            # TODO: this should be replaced by more verbose feedback, that also doesn't reference database tables
+            raise serializers.ValidationError(e)
+        created = Incident.objects.prefetch_default_related().in_bulk([event.incident_id for event in events])
+        return [created[event.incident_id] for event in events]
+
+
 @extend_schema_view(
     create=extend_schema(
         request=RequestBulkTicketUrlSerializer,
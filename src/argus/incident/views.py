@@ -10,5 +10,6 @@ class HeartBeatMixin:
         super().initial(request, *args, **kwargs)
 
         if request.user.is_authenticated and request.user.is_source_system:
-            LOG.info("Heartbeat: %s", request.user.source_system.name)
-            request.user.source_system.update_last_seen()
+            source_system = request.user.source_system
+            if source_system.throttled_update_last_seen():
+                LOG.info("Heartbeat: %s", source_system.name)
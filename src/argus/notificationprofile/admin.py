@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.db.models.functions import Concat
 from django.utils.html import format_html_join
 
+from .matcher import invalidate_notification_profile_matcher
 from .models import DestinationConfig, Filter, Media, NotificationProfile, TimeRecurrence, Timeslot
 
 
@@ -15,11 +16,13 @@ def toggle_activation(modeladmin, request, queryset):
 @admin.action(description="Activate selected profiles")
 def activate_profiles(modeladmin, request, queryset):
     queryset.update(active=True)
+    invalidate_notification_profile_matcher()
 
 
 @admin.action(description="Deactivate selected profiles")
 def deactivate_profiles(modeladmin, request, queryset):
     queryset.update(active=False)
+    invalidate_notification_profile_matcher()
 
 
 class TimeslotAdmin(admin.ModelAdmin):
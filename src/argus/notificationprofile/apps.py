@@ -1,5 +1,6 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save, post_migrate
+from django.core.signals import setting_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save, post_migrate
 
 
 class NotificationprofileConfig(AppConfig):
@@ -8,13 +9,19 @@ class NotificationprofileConfig(AppConfig):
 
     def ready(self):
         # Signals
+        from .models import DestinationConfig, Filter, NotificationProfile, TimeRecurrence, Timeslot
         from .signals import (
             create_default_timeslot,
+            invalidate_compiled_notification_profiles,
+            invalidate_compiled_notification_profiles_on_setting_changed,
             sync_email_destination,
             sync_media,
             task_background_send_notification,
+            task_background_send_notifications_for_many_events,
         )
 
+        from argus.incident.signals import incidents_created_in_bulk
+
         # uses settings
         from .utils import are_notifications_enabled
 
@@ -22,8 +29,19 @@ class NotificationprofileConfig(AppConfig):
         post_save.connect(sync_email_destination, "argus_auth.User")
         post_migrate.connect(sync_media, sender=self)
 
+        # keep compiled notification profiles up to date
+        for model in (NotificationProfile, Filter, Timeslot, TimeRecurrence, DestinationConfig):
+            post_save.connect(invalidate_compiled_notification_profiles, model)
+            post_delete.connect(invalidate_compiled_notification_profiles, model)
+        for through_model in (NotificationProfile.filters.through, NotificationProfile.destinations.through):
+            m2m_changed.connect(invalidate_compiled_notification_profiles, through_model)
+        setting_changed.connect(invalidate_compiled_notification_profiles_on_setting_changed)
+
         if are_notifications_enabled():
             # sending notifications
             post_save.connect(
                 task_background_send_notification, "argus_incident.Event", dispatch_uid="send_notification"
             )
+            incidents_created_in_bulk.connect(
+                task_background_send_notifications_for_many_events, dispatch_uid="send_notifications_for_many_events"
+            )
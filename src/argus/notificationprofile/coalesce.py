@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from django.db import connections
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "Coalescer",
+]
+
+
+class Coalescer:
+    """Collect items for a short while and hand them on in one batch
+
+    The first item added starts a timer, when the timer runs out all items
+    collected so far are passed to ``flush_func`` in one go. Anything still
+    pending when the process exits is flushed then.
+    """
+
+    def __init__(self, flush_func: Callable[[list], None]):
+        self.flush_func = flush_func
+        self.lock = threading.Lock()
+        self.items = []
+        self.timer = None
+        atexit.register(self.flush)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item, window: float):
+        with self.lock:
+            self.items.append(item)
+            if self.timer is None:
+                self.timer = threading.Timer(window, self._flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            items, self.items = self.items, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if items:
+            LOG.debug("Coalescer: flushing %i items", len(items))
+            self.flush_func(items)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            LOG.exception("Coalescer: failed to flush")
+        finally:
+            # The timer thread has its own database connections
+            connections.close_all()
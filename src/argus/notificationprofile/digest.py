@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from datetime import timedelta
+import logging
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from argus.incident.models import Event
+
+from .models import DestinationConfig, PendingNotification
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "get_digest_config",
+    "hold_back_for_digest",
+    "pop_pending_events",
+]
+
+DEFAULT_WINDOW = 300  # seconds
+DEFAULT_MAX_PER_MINUTE = 1
+SENT_COUNT_CACHE_KEY = "argus.notificationprofile.digest.sent.{destination_id}.{minute}"
+
+
+def get_digest_config(medium_slug: str) -> Optional[dict]:
+    """Return the digest config of a medium, or None if it sends every event
+
+    Example setting::
+
+        ARGUS_NOTIFICATION_DIGESTS = {
+            "sms": {"max_per_minute": 2, "window": 600},
+        }
+    """
+    config = getattr(settings, "ARGUS_NOTIFICATION_DIGESTS", {}).get(medium_slug)
+    if config is None:
+        return None
+    return {
+        "max_per_minute": config.get("max_per_minute", DEFAULT_MAX_PER_MINUTE),
+        "window": config.get("window", DEFAULT_WINDOW),
+    }
+
+
+def _count_message(destination: DestinationConfig) -> int:
+    "Count a message to the destination, return messages so far this minute"
+    key = SENT_COUNT_CACHE_KEY.format(destination_id=destination.pk, minute=int(time.time() // 60))
+    cache.add(key, 0, timeout=120)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr
+        cache.set(key, 1, timeout=120)
+        return 1
+
+
+def _lock_destination(destination: DestinationConfig):
+    """Lock the destination until the end of the transaction
+
+    Holding back an event and popping the held back events lock the
+    destination first. Otherwise a digest could pop the pending events right
+    after an event was held back as part of them, leaving the event behind
+    without a digest scheduled for it.
+    """
+    list(DestinationConfig.objects.select_for_update().filter(pk=destination.pk).values_list("pk", flat=True))
+
+
+def _schedule_digest(destination: DestinationConfig, window: int):
+    from .tasks import task_send_digest
+
+    task = task_send_digest
+    if task.get_backend().supports_defer:
+        task = task.using(run_after=timezone.now() + timedelta(seconds=window))
+    # Should the digest already be scheduled, the extra task will find nothing to send
+    transaction.on_commit(lambda: task.enqueue(destination.pk))
+
+
+def hold_back_for_digest(event: Event, destinations: Iterable[DestinationConfig], config: dict) -> list:
+    """Return the destinations to send the event to right now
+
+    Destinations that already got ``max_per_minute`` messages this minute get
+    the event later, together with all other held back events, in one digest.
+    """
+    send_now = []
+    for destination in destinations:
+        if _count_message(destination) <= config["max_per_minute"]:
+            send_now.append(destination)
+            continue
+        with transaction.atomic():
+            _lock_destination(destination)
+            digest_is_scheduled = PendingNotification.objects.filter(destination=destination).exists()
+            PendingNotification.objects.get_or_create(destination=destination, event=event)
+        LOG.debug("Notification: holding back event #%s for digest to destination #%s", event.pk, destination.pk)
+        if not digest_is_scheduled:
+            _schedule_digest(destination, config["window"])
+    return send_now
+
+
+@transaction.atomic
+def pop_pending_events(destination: DestinationConfig) -> list[Event]:
+    "Return and forget all events held back for the destination, oldest first"
+    _lock_destination(destination)
+    pending = PendingNotification.objects.filter(destination=destination)
+    event_ids = list(pending.values_list("event_id", flat=True))
+    if not event_ids:
+        return []
+    PendingNotification.objects.filter(destination=destination, event_id__in=event_ids).delete()
+    events = Event.objects.filter(id__in=event_ids).select_related("incident", "actor")
+    return sorted(events, key=lambda event: event.timestamp)
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from argus.notificationprofile.matcher import invalidate_notification_profile_matcher
 from argus.notificationprofile.models import NotificationProfile
 
 
@@ -33,3 +34,4 @@ class Command(BaseCommand):
             profile.active = not profile.active
 
         NotificationProfile.objects.bulk_update(objs=profiles, fields=["active"])
+        invalidate_notification_profile_matcher()
@@ -0,0 +1,303 @@
+"""Match events against all active notification profiles in memory
+
+Matching an event against the notification profiles used to cost several
+queries per profile and filter. Instead, all active profiles are loaded once,
+together with their filters, timeslots and destinations, and each filterblob
+is compiled into a filterwrapper. The result is cached per process until a
+profile, filter, timeslot or destination changes.
+
+Invalidation is signalled via a generation counter in Django's cache. In order
+for changes made in one process (the web server) to be seen in another (a task
+worker) immediately, a cache shared between the processes is needed. With the
+default per-process cache, changes are picked up at the latest after
+``ARGUS_NOTIFICATION_MATCHER_MAX_AGE`` seconds.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from argus.filter import get_filter_backend
+from argus.filter.filterwrapper import FilterKey, FilterWrapper as BaseFilterWrapper
+
+from .models import DestinationConfig, NotificationProfile
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from argus.incident.models import Event, Incident
+
+
+filter_backend = get_filter_backend()
+FallbackFilterWrapper = filter_backend.FallbackFilterWrapper
+FilterWrapper = filter_backend.FilterWrapper
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "CompiledNotificationProfile",
+    "NotificationProfileIndex",
+    "NotificationProfileMatcher",
+    "get_notification_profile_matcher",
+    "invalidate_notification_profile_matcher",
+]
+
+DEFAULT_MAX_AGE = 60  # seconds
+GENERATION_CACHE_KEY = "argus.notificationprofile.matcher.generation"
+
+_cached_matcher: Optional[NotificationProfileMatcher] = None
+# Per thread, as are database connections and their transactions
+_local = threading.local()
+
+
+class CompiledNotificationProfile:
+    """A notification profile with its filters compiled once
+
+    Behaves like ``NotificationProfileFilterWrapper`` but does not touch the
+    database when matching.
+    """
+
+    def __init__(self, profile: NotificationProfile):
+        self.profile = profile
+        self.pk = profile.pk
+        self.timeslot = profile.timeslot
+        filterblobs = [filter_.filter for filter_ in profile.filters.all()]
+        self.incident_filters = [FallbackFilterWrapper(filterblob) for filterblob in filterblobs]
+        self.event_filters = [FilterWrapper(filterblob) for filterblob in filterblobs]
+        self.destinations = frozenset(profile.destinations.all())
+
+    def __str__(self):
+        return str(self.profile)
+
+    def get_index_keys(self) -> Optional[list[tuple]]:
+        """Return keys an incident must have at least one of for the profile to fit
+
+        Since all filters must fit, it is sufficient to index on the most
+        selective list constraint of any one filter. Returns None if there are
+        no such constraints and the profile must always be checked.
+        """
+        constraints = {}
+        for filterwrapper in self.incident_filters:
+            if not isinstance(filterwrapper, BaseFilterWrapper):
+                # Unknown filter backend, cannot tell how it works
+                return None
+            for key in NotificationProfileIndex.KEY_PRIORITY:
+                value, ignored = filterwrapper._get_filter_value_and_ignored_status(key)
+                if not ignored and key not in constraints:
+                    constraints[key] = value
+        for key in NotificationProfileIndex.KEY_PRIORITY:
+            if key not in constraints:
+                continue
+            value = constraints[key]
+            if key == FilterKey.TAGS:
+                # The incident must have all the tags, so any one will do
+                return [(key, sorted(value)[0])]
+            if key == FilterKey.MAXLEVEL:
+                return [(key, value)]
+            return [(key, item) for item in value]
+        return None
+
+    def timeslot_fits(self, timestamp) -> bool:
+        return self.timeslot.timestamp_is_within_time_recurrences(timestamp)
+
+    def incident_fits(self, incident: Incident) -> bool:
+        # All filters must fit
+        for filterwrapper in self.incident_filters:
+            if not filterwrapper.incident_fits(incident):
+                return False
+        return True
+
+    def event_fits(self, event: Event) -> bool:
+        if not self.timeslot_fits(event.timestamp):
+            return False
+        # Any filter may fit
+        for filterwrapper in self.event_filters:
+            if filterwrapper.event_fits(event):
+                return True
+        return False
+
+
+class NotificationProfileIndex:
+    """Look up which profiles could possibly fit an incident
+
+    Profiles are indexed on source system id, source system type, tag or
+    maxlevel. Profiles without any of these are in the wildcard bucket and are
+    always candidates.
+    """
+
+    # Most selective first
+    KEY_PRIORITY = (
+        FilterKey.SOURCE_SYSTEM_IDS,
+        FilterKey.TAGS,
+        FilterKey.SOURCE_SYSTEM_TYPES,
+        FilterKey.MAXLEVEL,
+    )
+
+    def __init__(self, profiles: Iterable[CompiledNotificationProfile]):
+        self.order = {}
+        self.buckets = defaultdict(list)
+        self.wildcard = []
+        for position, profile in enumerate(profiles):
+            self.order[profile.pk] = position
+            keys = profile.get_index_keys()
+            if keys is None:
+                self.wildcard.append(profile)
+                continue
+            for key in keys:
+                self.buckets[key].append(profile)
+        self.maxlevels = sorted(value for key, value in self.buckets if key == FilterKey.MAXLEVEL)
+
+    def get_incident_keys(self, incident: Incident) -> list[tuple]:
+        keys = [
+            (FilterKey.SOURCE_SYSTEM_IDS, incident.source.id),
+            (FilterKey.SOURCE_SYSTEM_TYPES, incident.source.type.name),
+        ]
+        keys.extend((FilterKey.TAGS, tag.representation) for tag in incident.deprecated_tags)
+        keys.extend((FilterKey.MAXLEVEL, maxlevel) for maxlevel in self.maxlevels if incident.level <= maxlevel)
+        return keys
+
+    def get_candidates(self, incident: Incident) -> list[CompiledNotificationProfile]:
+        "Return profiles that could fit the incident, in original order"
+        candidates = {profile.pk: profile for profile in self.wildcard}
+        for key in self.get_incident_keys(incident):
+            for profile in self.buckets.get(key, ()):
+                candidates[profile.pk] = profile
+        return sorted(candidates.values(), key=lambda profile: self.order[profile.pk])
+
+
+class NotificationProfileMatcher:
+    "Find the destinations of all active profiles an event fits"
+
+    def __init__(self, profiles: Iterable[NotificationProfile]):
+        self.profiles = [CompiledNotificationProfile(profile) for profile in profiles]
+        self.index = NotificationProfileIndex(self.profiles)
+        self.generation = None
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.profiles)
+
+    @classmethod
+    def build(cls):
+        qs = NotificationProfile.objects.filter(active=True).select_related("user", "timeslot")
+        qs = qs.prefetch_related(
+            "filters",
+            "timeslot__time_recurrences",
+            Prefetch("destinations", queryset=DestinationConfig.objects.select_related("media")),
+        )
+        return cls(qs)
+
+    def get_profiles_fitting_incident(self, incident: Incident) -> list[CompiledNotificationProfile]:
+        return [profile for profile in self.index.get_candidates(incident) if profile.incident_fits(incident)]
+
+    def _get_destinations(self, event: Event, profiles: Iterable[CompiledNotificationProfile]) -> set:
+        destinations = set()
+        for profile in profiles:
+            LOG.debug(
+                'Notification: checking profile "%s" (%s) for event "%s"', profile, profile.profile.user.username, event
+            )
+            if profile.event_fits(event):
+                destinations.update(profile.destinations)
+                LOG.info(
+                    'Notification: will send notification for profile "%s"#%i, event: %s, destination ids: %s',
+                    profile,
+                    profile.pk,
+                    event,
+                    [destination.pk for destination in profile.destinations],
+                )
+        return destinations
+
+    def find_destinations_for_event(self, event: Event, incident: Optional[Incident] = None) -> set:
+        """Return the destinations of all profiles that fit the event
+
+        ``incident`` should have its tags and source prefetched, see
+        ``IncidentQuerySet.prefetch_default_related``, or else matching will
+        cost queries per profile.
+        """
+        incident = incident if incident is not None else event.incident
+        return self._get_destinations(event, self.get_profiles_fitting_incident(incident))
+
+    def find_destinations_for_many_events(self, events: Iterable[Event], incidents: dict[int, Incident]) -> dict:
+        """Return the destinations of all profiles that fit each event
+
+        ``incidents`` maps incident pks to incidents with their tags and source
+        prefetched. Each incident is only checked once, no matter how many of
+        the events belong to it. Events without any destinations are left out.
+        """
+        fitting_profiles = {}
+        destinations = {}
+        for event in events:
+            incident_id = event.incident_id
+            if incident_id not in fitting_profiles:
+                fitting_profiles[incident_id] = self.get_profiles_fitting_incident(incidents[incident_id])
+            found = self._get_destinations(event, fitting_profiles[incident_id])
+            if found:
+                destinations[event] = found
+        return destinations
+
+
+def _get_max_age() -> int:
+    return getattr(settings, "ARGUS_NOTIFICATION_MATCHER_MAX_AGE", DEFAULT_MAX_AGE)
+
+
+def _get_generation() -> int:
+    return cache.get(GENERATION_CACHE_KEY, 0)
+
+
+def _can_store_matcher() -> bool:
+    # A matcher built after an uncommitted change to the profiles might see
+    # changes that are later rolled back, and rollbacks do not send any signals
+    if not transaction.get_connection().in_atomic_block:
+        # Any change has been committed or rolled back by now
+        _local.pending_invalidation = False
+    return not getattr(_local, "pending_invalidation", False)
+
+
+def get_notification_profile_matcher() -> NotificationProfileMatcher:
+    "Return a matcher for all active profiles, rebuilding it if stale"
+    global _cached_matcher
+
+    max_age = _get_max_age()
+    generation = _get_generation()
+    matcher = _cached_matcher
+    if matcher is not None and matcher.generation == generation and time.monotonic() - matcher.built_at < max_age:
+        return matcher
+
+    matcher = NotificationProfileMatcher.build()
+    matcher.generation = generation
+    LOG.debug("Notification: compiled %i active notification profiles", len(matcher))
+    if max_age and _can_store_matcher():
+        _cached_matcher = matcher
+    return matcher
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        # Key is missing
+        cache.set(GENERATION_CACHE_KEY, 1, timeout=None)
+
+
+def _commit_invalidation():
+    _local.pending_invalidation = False
+    _bump_generation()
+
+
+def invalidate_notification_profile_matcher():
+    "Force all processes to recompile the notification profiles"
+    global _cached_matcher
+
+    _cached_matcher = None
+    _local.pending_invalidation = True
+    # Other processes must not recompile before the change is visible to them
+    transaction.on_commit(_commit_invalidation)
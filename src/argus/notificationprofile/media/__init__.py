@@ -1,20 +1,25 @@
 from __future__ import annotations
 
 import logging
-from multiprocessing import Process
 from typing import TYPE_CHECKING
 
 from django.conf import settings
-from django.db import connections
+from django.db import transaction
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from rest_framework.exceptions import ValidationError
 
 from argus.filter import get_filter_backend
+from argus.incident.models import Incident
 from argus.util.utils import import_class_from_dotted_path
 
-from ..models import DestinationConfig, Media, NotificationProfile
-from ..filterwrapper import NotificationProfileFilterWrapper
+from ..digest import get_digest_config, hold_back_for_digest
+from ..models import DestinationConfig, Media
+from ..matcher import get_notification_profile_matcher
 from ..utils import are_notifications_enabled
-from .base import NotificationMedium
+from .base import NotificationMedium, render_cache
+from .delivery import deliver
+from .pool import get_notification_worker_pool
 
 filter_backend = get_filter_backend()
 FallbackFilterWrapper = filter_backend.FallbackFilterWrapper
@@ -32,11 +37,13 @@ LOG = logging.getLogger(__name__)
 __all__ = [
     "safely_get_medium_object",
     "send_notification",
+    "send_digest_notification",
     "background_send_notification",
     "find_destinations_for_event",
     "find_destinations_for_many_events",
     "send_notifications_to_users",
     "get_notification_media",
+    "precompile_notification_templates",
 ]
 
 # Special case for consistency
@@ -47,6 +54,9 @@ MEDIA_PLUGINS = getattr(settings, "MEDIA_PLUGINS")
 _media_classes = [import_class_from_dotted_path(media_plugin) for media_plugin in MEDIA_PLUGINS]
 MEDIA_CLASSES_DICT = {media_class.MEDIA_SLUG: media_class for media_class in _media_classes}
 
+# Set once the templates have been loaded by the first notification sent
+_templates_precompiled = False
+
 
 def safely_get_medium_object(media_slug, strict: bool = True):
     "Returns the medium object for the given slug, or a base medium if strict=False and it's not installed"
@@ -67,66 +77,103 @@ def send_notification(destinations: Iterable[DestinationConfig], *events: Iterab
         return
     if not events:
         return
+    _precompile_notification_templates_once()
     media = get_notification_media(destinations)
     media_count = len(media)
     pp_destinations = []
     if LOG.isEnabledFor(logging.INFO):
         pp_destinations = [destination.pk for destination in destinations]
-    for event in events:
-        LOG.info('Notification: sending event "%s" to %i mediums', event, media_count)
-        for medium in media:
-            sent = medium.send(event=event, destinations=destinations)
-            if sent:
-                LOG.info(
-                    'Notification: sent event "%s" to "%s", destination ids: %s',
-                    event,
-                    medium.MEDIA_SLUG,
-                    pp_destinations,
-                )
-            else:
-                LOG.warn(
-                    'Notification: could not send event "%s" to "%s", destination ids: %s',
-                    event,
-                    medium.MEDIA_SLUG,
-                    pp_destinations,
-                )
+    with render_cache():
+        jobs = []
+        for event in events:
+            LOG.info('Notification: sending event "%s" to %i mediums', event, media_count)
+            for medium in media:
+                medium_destinations = destinations
+                digest_config = get_digest_config(medium.MEDIA_SLUG)
+                if digest_config:
+                    medium_destinations = medium.get_relevant_destinations(destinations)
+                    medium_destinations = hold_back_for_digest(event, medium_destinations, digest_config)
+                    if not medium_destinations:
+                        LOG.info('Notification: held back event "%s" for "%s" digests', event, medium.MEDIA_SLUG)
+                        continue
+                jobs.append((medium, event, medium_destinations))
+        results = deliver(jobs)
+
+    for (medium, event, _), sent in zip(jobs, results):
+        if sent:
+            LOG.info(
+                'Notification: sent event "%s" to "%s", destination ids: %s',
+                event,
+                medium.MEDIA_SLUG,
+                pp_destinations,
+            )
+        else:
+            LOG.warn(
+                'Notification: could not send event "%s" to "%s", destination ids: %s',
+                event,
+                medium.MEDIA_SLUG,
+                pp_destinations,
+            )
+
+
+def send_digest_notification(destination: DestinationConfig, events: list[Event]):
+    "Sends all the events to the destination in one message"
+    if not are_notifications_enabled():
+        LOG.info("Notification: turned off sitewide, not sending any")
+        return
+    if not events:
+        return
+    medium = get_notification_media([destination])
+    if not medium:
+        return
+    medium = medium[0]
+    _precompile_notification_templates_once()
+    with render_cache():
+        sent = medium.send_digest(events=events, destinations=[destination])
+    if sent:
+        LOG.info(
+            'Notification: sent digest of %i events to "%s", destination id: %s',
+            len(events),
+            medium.MEDIA_SLUG,
+            destination.pk,
+        )
+    else:
+        LOG.warning(
+            'Notification: could not send digest of %i events to "%s", destination id: %s',
+            len(events),
+            medium.MEDIA_SLUG,
+            destination.pk,
+        )
 
 
 def background_send_notification(destinations: Iterable[DestinationConfig], *events: Event):
-    connections.close_all()
+    "Sends the events via the background worker pool once the current transaction is committed"
     LOG.info("Notification: backgrounded: about to send %i events", len(events))
-    p = Process(target=send_notification, args=(destinations, *events))
-    p.start()
-    return p
+    pool = get_notification_worker_pool()
+    transaction.on_commit(lambda: pool.submit(destinations, *events))
+    return pool
+
+
+def _get_incidents_for_matching(events: Iterable[Event]) -> dict[int, Incident]:
+    # Fresh copies with tags and source prefetched, leaving event.incident untouched
+    qs = Incident.objects.select_related("source__type").prefetch_related("incident_tag_relations__tag")
+    return qs.in_bulk({event.incident_id for event in events})
 
 
 def find_destinations_for_event(event: Event):
-    destinations = set()
-    incident = event.incident
-    qs = NotificationProfile.objects.filter(active=True)
-    for profile in qs.prefetch_related("destinations").select_related("user"):
-        fw = NotificationProfileFilterWrapper(profile)
-        LOG.debug('Notification: checking profile "%s" (%s) for event "%s"', profile, profile.user.username, event)
-        if fw.incident_fits(incident) and fw.event_fits(event):
-            profile_destinations = profile.destinations.all()
-            destinations.update(profile_destinations)
-            LOG.info(
-                'Notification: will send notification for profile "%s"#%i, event: %s, destination ids: %s',
-                profile,
-                profile.pk,
-                event,
-                [destination.pk for destination in profile_destinations],
-            )
-    return destinations
+    incident = _get_incidents_for_matching([event])[event.incident_id]
+    matcher = get_notification_profile_matcher()
+    return matcher.find_destinations_for_event(event, incident)
 
 
 def find_destinations_for_many_events(events: Iterable[Event]):
-    destinations = dict()
-    for event in events:
-        found = find_destinations_for_event(event)
-        if found:
-            destinations[event] = found
-    return destinations
+    "Find destinations for all events in one go, returns a dict of event: destinations"
+    events = list(events)
+    if not events:
+        return {}
+    incidents = _get_incidents_for_matching(events)
+    matcher = get_notification_profile_matcher()
+    return matcher.find_destinations_for_many_events(events, incidents)
 
 
 def send_notifications_to_users(*events: Iterable[Event], send=send_notification):
@@ -158,3 +205,22 @@ def get_notification_media(destinations: Iterable[DestinationConfig]):
             not_installed_medium.installed = False
             not_installed_medium.save(update_fields=["installed"])
     return media
+
+
+def precompile_notification_templates():
+    "Load the templates of all media once, so that the template cache is warm"
+    for medium in MEDIA_CLASSES_DICT.values():
+        for template_name in getattr(medium, "MESSAGE_TEMPLATES", ()):
+            try:
+                get_template(template_name)
+            except TemplateDoesNotExist:
+                LOG.warning('Medium %s: template "%s" not found', medium.MEDIA_SLUG, template_name)
+
+
+def _precompile_notification_templates_once():
+    # Not in AppConfig.ready(), which would load the templates in every
+    # process, including management commands that never send anything
+    global _templates_precompiled
+    if not _templates_precompiled:
+        precompile_notification_templates()
+        _templates_precompiled = True
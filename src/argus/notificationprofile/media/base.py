@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 import logging
 from abc import ABC
 from typing import TYPE_CHECKING, Any
@@ -29,15 +31,17 @@ if TYPE_CHECKING:
     from django.contrib.auth import get_user_model
     from django.db.models.query import QuerySet
 
-    from argus.incident.models import Event
+    from argus.incident.models import Event, Incident
 
     User = get_user_model()
 
 
-__all__ = ["NotificationMedium", "AppriseMedium"]
+__all__ = ["NotificationMedium", "AppriseMedium", "render_cache", "render_event_template"]
 
 LOG = logging.getLogger(__name__)
 
+_render_cache: ContextVar[Optional[dict]] = ContextVar("notification_render_cache", default=None)
+
 
 def modelinstance_to_dict(obj):
     dict_ = vars(obj).copy()
@@ -45,6 +49,64 @@ def modelinstance_to_dict(obj):
     return dict_
 
 
+def incident_to_message_dict(incident: Incident) -> dict:
+    "Return the fields of the incident that are shown in notifications"
+    incident_dict = modelinstance_to_dict(incident)
+    for field in ("id", "source_id"):
+        incident_dict.pop(field)
+    incident_dict["details_url"] = incident.pp_details_url()
+    if incident.end_time in {INFINITY, LOCAL_INFINITY}:
+        incident_dict["end_time"] = "Still open"
+    return incident_dict
+
+
+@contextmanager
+def render_cache():
+    """Reuse what is rendered for an event within the block
+
+    Lets several media and destinations share the rendered messages when
+    sending the same event. Nested blocks share the outermost cache.
+    """
+    if _render_cache.get() is not None:
+        yield
+        return
+    token = _render_cache.set({})
+    try:
+        yield
+    finally:
+        _render_cache.reset(token)
+
+
+def _get_cached(key: tuple, func):
+    cache = _render_cache.get()
+    if cache is None or key[0] is None:
+        return func()
+    if key not in cache:
+        cache[key] = func()
+    return cache[key]
+
+
+def get_event_template_context(event: Event, version: str = API_STABLE_VERSION) -> dict:
+    "Return the template context for messages about the event"
+
+    def create_context():
+        return {
+            "title": f"{event}",
+            "event": event,
+            "incident_dict": incident_to_message_dict(event.incident),
+        }
+
+    return _get_cached((event.pk, None, version), create_context)
+
+
+def render_event_template(template_name: str, event: Event, version: str = API_STABLE_VERSION) -> str:
+    "Render the template for the event, only once per event within ``render_cache``"
+    return _get_cached(
+        (event.pk, template_name, version),
+        lambda: render_to_string(template_name, get_event_template_context(event, version)),
+    )
+
+
 class CommonDestinationConfigForm(forms.ModelForm):
     class Meta:
         model = DestinationConfig
@@ -62,6 +124,8 @@ class NotificationMedium(ABC):
 
     Class attributes:
 
+    - MESSAGE_TEMPLATES: names of the templates used, optional. These are
+      compiled when the app is loaded
     - MEDIA_SLUG: short string id for the medium, lowercase
     - MEDIA_NAME: human friendly id for the medium
     - MEDIA_SETTINGS_KEY: the field in settings that is specific for this medium
@@ -72,6 +136,12 @@ class NotificationMedium(ABC):
 
     - send(event, destinations): How to send the given event to the given
       destinations of type MEDIA_SLUG.
+
+    May be overridden by subclasses:
+
+    - send_digest(events, destinations): How to send several events at once,
+      see ``ARGUS_NOTIFICATION_DIGESTS``. Sends each event by itself by
+      default.
     """
 
     class NotDeletableError(Exception):
@@ -80,6 +150,8 @@ class NotificationMedium(ABC):
         deleted
         """
 
+    MESSAGE_TEMPLATES = ()
+
     def __init__(self, version: str = API_STABLE_VERSION):
         self.version = version
 
@@ -239,6 +311,17 @@ class NotificationMedium(ABC):
             LOG.info("notifications: turned off sitewide, not sending")
             return False
 
+    @classmethod
+    def send_digest(cls, events: list[Event], destinations: Iterable[DestinationConfig], **kwargs) -> bool:
+        """
+        Sends one message about all the given events to the given destinations
+
+        The default is to send a message per event. Returns True only if all
+        were sent.
+        """
+        sent = [cls.send(event=event, destinations=destinations, **kwargs) for event in events]
+        return all(sent)
+
     @classmethod
     def raise_if_not_deletable(cls, destination: DestinationConfig) -> NoneType:
         """
@@ -305,6 +388,7 @@ class NotificationMedium(ABC):
 
 
 class AppriseMedium(NotificationMedium):
+    MESSAGE_TEMPLATES = ("notificationprofile/apprise.txt", "notificationprofile/apprise_digest.txt")
     MEDIA_SLUG = "apprise"
     MEDIA_NAME = "Apprise"
     MEDIA_SETTINGS_KEY = "destination_url"
@@ -327,21 +411,21 @@ class AppriseMedium(NotificationMedium):
     @staticmethod
     def create_message_context(event: Event):
         """Creates the subject and message for the Apprise notification"""
-        title = f"{event}"
-        incident_dict = modelinstance_to_dict(event.incident)
-        for field in ("id", "source_id"):
-            incident_dict.pop(field)
-        incident_dict["details_url"] = event.incident.pp_details_url()
-        if event.incident.end_time in {INFINITY, LOCAL_INFINITY}:
-            incident_dict["end_time"] = "Still open"
+        subject = f"{settings.NOTIFICATION_SUBJECT_PREFIX}{event}"
+        message = render_event_template("notificationprofile/apprise.txt", event)
 
+        return subject, message
+
+    @staticmethod
+    def create_digest_message_context(events: list[Event]):
+        """Creates the subject and message for an Apprise digest of several events"""
+        title = f"{len(events)} events"
         template_context = {
             "title": title,
-            "event": event,
-            "incident_dict": incident_dict,
+            "events": [(event, get_event_template_context(event)["incident_dict"]) for event in events],
         }
         subject = f"{settings.NOTIFICATION_SUBJECT_PREFIX}{title}"
-        message = render_to_string("notificationprofile/apprise.txt", template_context)
+        message = render_to_string("notificationprofile/apprise_digest.txt", template_context)
 
         return subject, message
 
@@ -367,6 +451,30 @@ class AppriseMedium(NotificationMedium):
 
         # Note that Apprise automatically leaves out 'subject' for destinations that don't support it
         subject, message = cls.create_message_context(event=event)
+        return cls._notify(subject, message, destinations, f"event #{event.pk}", notify_type=notify_type)
+
+    @classmethod
+    def send_digest(cls, events: list[Event], destinations: Iterable[DestinationConfig], notify_type=None, **_) -> bool:
+        """
+        Sends one Apprise notification about all the given events to the given destinations
+        """
+        if not are_notifications_enabled():
+            LOG.info("notifications: turned off sitewide, not sending")
+            return False
+
+        destinations = cls.get_relevant_destinations(destinations)
+        if not destinations or not events:
+            return False
+
+        if Apprise is None:
+            LOG.error("The 'apprise' package is not installed")
+            return False
+
+        subject, message = cls.create_digest_message_context(events=events)
+        return cls._notify(subject, message, destinations, f"digest of {len(events)} events", notify_type=notify_type)
+
+    @classmethod
+    def _notify(cls, subject: str, message: str, destinations: set[DestinationConfig], what: str, notify_type=None):
         failed = 0
         num_destinations = len(destinations)
         for destination in destinations:
@@ -382,17 +490,17 @@ class AppriseMedium(NotificationMedium):
 
             if not result:
                 failed += 1
-                LOG.error("Apprise: Failed to send event #%i to destination #%i", event.pk, destination.pk)
+                LOG.error("Apprise: Failed to send %s to destination #%i", what, destination.pk)
             else:
-                LOG.debug("Apprise: Sent event #%i to destination #%i", event.pk, destination.pk)
+                LOG.debug("Apprise: Sent %s to destination #%i", what, destination.pk)
 
         if failed:
             if num_destinations == failed:
-                LOG.error("Apprise: Failed to send event #%i to any destinations", event.pk)
+                LOG.error("Apprise: Failed to send %s to any destinations", what)
                 return False
             LOG.warning(
-                "Apprise: Failed to send event #%i to %i of %i destinations",
-                event.pk,
+                "Apprise: Failed to send %s to %i of %i destinations",
+                what,
                 failed,
                 num_destinations,
             )
@@ -0,0 +1,182 @@
+"""Deliver notifications to many destinations at once
+
+By default each medium sends to its destinations one after the other, in the
+thread calling ``send_notification``. Media listed in
+``ARGUS_NOTIFICATION_CONCURRENT_DELIVERY`` instead get a pool of threads of
+their own, and each destination is sent to as a separate job. Since every
+medium has its own pool, a slow medium (for instance a hanging webhook) can
+only hold up itself, never the others.
+
+Media and Django's ORM are synchronous, so threads are used rather than
+asyncio.
+
+A thread cannot be stopped from the outside, so a send that is still running
+when the timeout is up goes on in the background, occupying a thread of the
+pool until it returns. Such stuck threads are logged and counted, see
+``get_stuck_workers``.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+import contextvars
+from functools import partial
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from argus.incident.models import Event
+
+    from ..models import DestinationConfig
+    from .base import NotificationMedium
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "get_delivery_config",
+    "get_stuck_workers",
+    "deliver",
+]
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30  # seconds
+
+_executors = {}
+_executors_lock = threading.Lock()
+_stuck_workers = Counter()
+_stuck_workers_lock = threading.Lock()
+
+
+def get_delivery_config(medium_slug: str) -> Optional[dict]:
+    """Return the concurrent delivery config of a medium, or None if it sends serially
+
+    Example setting::
+
+        ARGUS_NOTIFICATION_CONCURRENT_DELIVERY = {
+            "apprise": {"max_concurrency": 8, "timeout": 10},
+        }
+    """
+    config = getattr(settings, "ARGUS_NOTIFICATION_CONCURRENT_DELIVERY", {}).get(medium_slug)
+    if config is None:
+        return None
+    return {
+        "max_concurrency": config.get("max_concurrency", DEFAULT_MAX_CONCURRENCY),
+        "timeout": config.get("timeout", DEFAULT_TIMEOUT),
+    }
+
+
+def get_stuck_workers(medium_slug: str) -> int:
+    "Return how many threads of the medium are still sending after timing out"
+    with _stuck_workers_lock:
+        return _stuck_workers[medium_slug]
+
+
+def _release_stuck_worker(medium_slug: str, future):
+    with _stuck_workers_lock:
+        _stuck_workers[medium_slug] -= 1
+    LOG.warning('Notification: a send via "%s" that had timed out has finished', medium_slug)
+
+
+def _mark_stuck(medium: type[NotificationMedium], futures: list, max_concurrency: int):
+    """Count the futures that are still running
+
+    Futures that have not started yet are cancelled instead.
+    """
+    running = [future for future in futures if not future.cancel()]
+    with _stuck_workers_lock:
+        _stuck_workers[medium.MEDIA_SLUG] += len(running)
+        stuck = _stuck_workers[medium.MEDIA_SLUG]
+    for future in running:
+        future.add_done_callback(partial(_release_stuck_worker, medium.MEDIA_SLUG))
+    if running:
+        LOG.error(
+            'Notification: %i of %i threads sending via "%s" are stuck',
+            stuck,
+            max_concurrency,
+            medium.MEDIA_SLUG,
+        )
+
+
+def _get_executor(medium_slug: str, max_concurrency: int) -> ThreadPoolExecutor:
+    key = (medium_slug, max_concurrency)
+    with _executors_lock:
+        if key not in _executors:
+            _executors[key] = ThreadPoolExecutor(
+                max_workers=max_concurrency,
+                thread_name_prefix=f"argus-notify-{medium_slug}",
+            )
+        return _executors[key]
+
+
+def _send_to_destination(medium: type[NotificationMedium], event: Event, destination: DestinationConfig) -> bool:
+    # Each pool thread keeps its own database connection between jobs
+    close_old_connections()
+    return medium.send(event=event, destinations=[destination])
+
+
+def _submit(medium: type[NotificationMedium], event: Event, destinations: Iterable[DestinationConfig], config: dict):
+    executor = _get_executor(medium.MEDIA_SLUG, config["max_concurrency"])
+    futures = []
+    for destination in medium.get_relevant_destinations(destinations):
+        # Share the render cache and other context with the pool thread
+        context = contextvars.copy_context()
+        futures.append(executor.submit(context.run, _send_to_destination, medium, event, destination))
+    return futures
+
+
+def _collect(medium: type[NotificationMedium], event: Event, futures: list, deadline: float, config: dict) -> bool:
+    done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    if not_done:
+        _mark_stuck(medium, not_done, config["max_concurrency"])
+        LOG.error(
+            'Notification: timed out sending event "%s" via "%s" to %i of %i destinations',
+            event,
+            medium.MEDIA_SLUG,
+            len(not_done),
+            len(futures),
+        )
+    sent = False
+    for future in done:
+        exception = future.exception()
+        if exception is not None:
+            LOG.error('Notification: failed sending event "%s" via "%s": %r', event, medium.MEDIA_SLUG, exception)
+            continue
+        sent = sent or bool(future.result())
+    return sent
+
+
+def deliver(jobs: list[tuple[type[NotificationMedium], Event, Iterable[DestinationConfig]]]) -> list[bool]:
+    """Send each job, a triple of medium, event and destinations
+
+    Jobs of media with concurrent delivery are started first and sent to
+    every destination at once, the rest are sent one by one meanwhile. Returns
+    whether each job was sent to at least one destination, in order.
+    """
+    results = [False] * len(jobs)
+    started = []
+    serial = []
+    for position, (medium, event, destinations) in enumerate(jobs):
+        config = get_delivery_config(medium.MEDIA_SLUG)
+        if config is None:
+            serial.append(position)
+            continue
+        deadline = time.monotonic() + config["timeout"]
+        started.append((position, _submit(medium, event, destinations, config), deadline, config))
+
+    for position in serial:
+        medium, event, destinations = jobs[position]
+        results[position] = medium.send(event=event, destinations=destinations)
+
+    for position, futures, deadline, config in started:
+        medium, event, _ = jobs[position]
+        results[position] = _collect(medium, event, futures, deadline, config)
+    return results
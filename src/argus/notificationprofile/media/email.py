@@ -1,18 +1,24 @@
 from __future__ import annotations
 
 import logging
+import smtplib
+import threading
 from typing import TYPE_CHECKING
 
 from django import forms
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 
 from argus.incident.models import Event
-from .base import NotificationMedium, modelinstance_to_dict
+from .base import (  # noqa: F401
+    NotificationMedium,
+    get_event_template_context,
+    modelinstance_to_dict,
+    render_event_template,
+)
 from ..models import DestinationConfig
 from ..utils import are_notifications_enabled
-from argus.util.datetime_utils import INFINITY, LOCAL_INFINITY
 
 if TYPE_CHECKING:
     from collections.abc import Iterable
@@ -25,6 +31,9 @@ LOG = logging.getLogger(__name__)
 
 __all__ = [
     "send_email_safely",
+    "get_email_connection",
+    "close_email_connection",
+    "send_email_messages",
     "EmailNotification",
 ]
 
@@ -47,7 +56,76 @@ def send_email_safely(function, additional_error=None, *args, **kwargs) -> int:
         # TODO: Store error as incident
 
 
+# Connections that were dropped by the server, reconnect and try again
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionResetError, BrokenPipeError)
+
+_local = threading.local()
+
+
+def get_email_connection():
+    """Return an email connection to be reused by this thread
+
+    The connection is opened lazily and kept open, so that sending many emails
+    does not cost a new connection and TLS handshake per email.
+    """
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = get_connection()
+        _local.connection = connection
+    return connection
+
+
+def close_email_connection():
+    connection = getattr(_local, "connection", None)
+    _local.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            # Already dead, nothing to clean up
+            pass
+
+
+def send_email_messages(messages: list[EmailMultiAlternatives]) -> list[bool]:
+    """Send the messages over the reused connection, return which were sent
+
+    If the connection has been dropped, for instance because it has been idle
+    for too long, it is reopened and sending continues where it stopped. Should
+    sending a message fail again, the messages from there on are reported as
+    not sent, unless none were sent at all, in which case the error is raised.
+    """
+    results = []
+    for message in messages:
+        for attempt in range(2):
+            connection = get_email_connection()
+            try:
+                connection.open()
+                results.append(bool(connection.send_messages([message])))
+                break
+            except OSError as e:
+                close_email_connection()
+                if attempt == 0 and isinstance(e, RECONNECT_ERRORS):
+                    LOG.info("Notification: Email: Connection lost, reconnecting")
+                    continue
+                if not results:
+                    raise
+                LOG.error(
+                    "Notification: Email: Could not send %i of %i messages: %r",
+                    len(messages) - len(results),
+                    len(messages),
+                    e,
+                )
+                return results + [False] * (len(messages) - len(results))
+    return results
+
+
 class EmailNotification(NotificationMedium):
+    MESSAGE_TEMPLATES = (
+        "notificationprofile/email.txt",
+        "notificationprofile/email.html",
+        "notificationprofile/email_digest.txt",
+        "notificationprofile/email_digest.html",
+    )
     MEDIA_SLUG = "email"
     MEDIA_NAME = "Email"
     MEDIA_SETTINGS_KEY = "email_address"
@@ -70,22 +148,23 @@ class EmailNotification(NotificationMedium):
     @staticmethod
     def create_message_context(event: Event):
         """Creates the subject, message and html message for the email"""
-        title = f"{event}"
-        incident_dict = modelinstance_to_dict(event.incident)
-        for field in ("id", "source_id"):
-            incident_dict.pop(field)
-        incident_dict["details_url"] = event.incident.pp_details_url()
-        if event.incident.end_time in {INFINITY, LOCAL_INFINITY}:
-            incident_dict["end_time"] = "Still open"
+        subject = f"{settings.NOTIFICATION_SUBJECT_PREFIX}{event}"
+        message = render_event_template("notificationprofile/email.txt", event)
+        html_message = render_event_template("notificationprofile/email.html", event)
+
+        return subject, message, html_message
 
+    @staticmethod
+    def create_digest_message_context(events: list[Event]):
+        """Creates the subject, message and html message for a digest of several events"""
+        title = f"{len(events)} events"
         template_context = {
             "title": title,
-            "event": event,
-            "incident_dict": incident_dict,
+            "events": [(event, get_event_template_context(event)["incident_dict"]) for event in events],
         }
         subject = f"{settings.NOTIFICATION_SUBJECT_PREFIX}{title}"
-        message = render_to_string("notificationprofile/email.txt", template_context)
-        html_message = render_to_string("notificationprofile/email.html", template_context)
+        message = render_to_string("notificationprofile/email_digest.txt", template_context)
+        html_message = render_to_string("notificationprofile/email_digest.html", template_context)
 
         return subject, message, html_message
 
@@ -106,23 +185,42 @@ class EmailNotification(NotificationMedium):
             return False
 
         subject, message, html_message = cls.create_message_context(event=event)
+        return cls._send_emails(subject, message, html_message, destinations, f"event #{event.pk}")
+
+    @classmethod
+    def send_digest(cls, events: list[Event], destinations: Iterable[DestinationConfig], **_) -> bool:
+        """
+        Sends one email about all the given events to the given email destinations
+        """
+        if not are_notifications_enabled():
+            LOG.info("notifications: turned off sitewide, not sending")
+            return False
+
+        destinations = cls.get_relevant_destinations(destinations)
+        if not destinations or not events:
+            return False
+
+        subject, message, html_message = cls.create_digest_message_context(events=events)
+        return cls._send_emails(subject, message, html_message, destinations, f"digest of {len(events)} events")
+
+    @classmethod
+    def _send_emails(cls, subject, message, html_message, destinations: set[DestinationConfig], what: str) -> bool:
+        destinations = list(destinations)
+        messages = []
+        for destination in destinations:
+            email = EmailMultiAlternatives(subject=subject, body=message, to=[cls.get_relevant_address(destination)])
+            email.attach_alternative(html_message, "text/html")
+            messages.append(email)
+        results = send_email_safely(send_email_messages, messages=messages) or [False] * len(messages)
+
         failed = 0
         num_destinations = len(destinations)
-        for destination in destinations:
-            email_address = cls.get_relevant_address(destination)
-            sent = send_email_safely(
-                send_mail,
-                subject=subject,
-                message=message,
-                from_email=None,
-                recipient_list=[email_address],
-                html_message=html_message,
-            )
+        for destination, sent in zip(destinations, results):
             if not sent:
                 failed += 1
-                LOG.error("Email: Failed to send event #%i to destination #%i", event.pk, destination.pk)
+                LOG.error("Email: Failed to send %s to destination #%i", what, destination.pk)
             else:
-                LOG.debug("Email: Sent event #%i to destination #%i", event.pk, destination.pk)
+                LOG.debug("Email: Sent %s to destination #%i", what, destination.pk)
 
         if failed:
             if num_destinations == failed:
@@ -0,0 +1,142 @@
+"""A long-lived pool of threads sending notifications in the background
+
+Used by ``background_send_notification``. The threads are started on first use
+and live as long as the process, so they keep their database connections and
+SMTP sessions open between notifications. When the process exits, whatever is
+still queued is sent before the threads stop.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "NotificationWorkerPool",
+    "get_notification_worker_pool",
+]
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_SHUTDOWN_TIMEOUT = 30  # seconds
+
+_pool: Optional[NotificationWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+class NotificationWorkerPool:
+    """Run ``send`` in a fixed number of threads fed by a bounded queue
+
+    When the queue is full the caller sends the notification itself, which
+    slows down whoever is producing events instead of using ever more memory.
+    """
+
+    def __init__(self, send: Callable, workers: int = DEFAULT_WORKERS, max_queue_size: int = DEFAULT_QUEUE_SIZE):
+        self.send = send
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.threads = []
+        self.stopped = False
+        self.lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _start(self):
+        with self.lock:
+            if self.threads or self.stopped:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"argus-notification-worker-{number}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _run(self, args):
+        try:
+            self.send(*args)
+        except Exception:
+            LOG.exception("Notification: background sending failed")
+
+    def _work(self):
+        while True:
+            args = self.queue.get()
+            if args is None:
+                # Stopped by shutdown()
+                self.queue.task_done()
+                return
+            try:
+                # Keep the connection unless it has expired or broken
+                close_old_connections()
+                self._run(args)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, *args) -> bool:
+        "Queue ``send(*args)``, return False if it had to be run right away"
+        self._start()
+        with self.lock:
+            # Nothing is sent from the queue after shutdown()
+            if self.stopped:
+                queued = False
+            else:
+                try:
+                    self.queue.put_nowait(args)
+                    queued = True
+                except queue.Full:
+                    LOG.warning("Notification: background queue is full, sending in the foreground")
+                    queued = False
+        if not queued:
+            self._run(args)
+        return queued
+
+    def join(self):
+        "Wait until everything queued so far has been sent"
+        self.queue.join()
+
+    def shutdown(self, timeout: float = DEFAULT_SHUTDOWN_TIMEOUT):
+        """Send everything queued so far, then stop the threads
+
+        Waits at most ``timeout`` seconds. Anything submitted afterwards is
+        sent right away by the caller.
+        """
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+            threads = list(self.threads)
+        deadline = time.monotonic() + timeout
+        try:
+            for _ in threads:
+                self.queue.put(None, timeout=max(0, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        for thread in threads:
+            thread.join(timeout=max(0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in threads):
+            LOG.error("Notification: gave up sending %i queued notifications on shutdown", self.queue.qsize())
+
+
+def get_notification_worker_pool() -> NotificationWorkerPool:
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            from . import send_notification
+
+            _pool = NotificationWorkerPool(
+                send_notification,
+                workers=getattr(settings, "ARGUS_NOTIFICATION_WORKERS", DEFAULT_WORKERS),
+                max_queue_size=getattr(settings, "ARGUS_NOTIFICATION_QUEUE_SIZE", DEFAULT_QUEUE_SIZE),
+            )
+        return _pool
@@ -11,12 +11,12 @@ from typing import TYPE_CHECKING
 
 from django import forms
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from phonenumber_field.formfields import PhoneNumberField
 
 from ...incident.models import Event
 from .base import NotificationMedium
-from .email import send_email_safely
+from .email import send_email_messages, send_email_safely
 from ..utils import are_notifications_enabled
 
 if TYPE_CHECKING:
@@ -76,21 +76,44 @@ class SMSNotification(NotificationMedium):
         if not destinations:
             return False
 
+        return cls._send_sms(f"{event.description}", destinations, recipient, f"event #{event.pk}")
+
+    @classmethod
+    def send_digest(cls, events: list[Event], destinations: Iterable[DestinationConfig], **_) -> bool:
+        """
+        Sends one SMS listing all the given events to the given sms destinations
+        """
+        if not are_notifications_enabled():
+            LOG.info("notifications: turned off sitewide, not sending")
+            return False
+
+        recipient = getattr(settings, "SMS_GATEWAY_ADDRESS", None)
+        if not recipient:
+            LOG.error("SMS_GATEWAY_ADDRESS is not set, cannot dispatch SMS notifications using this plugin")
+            return False
+
+        destinations = cls.get_relevant_destinations(destinations)
+        if not destinations or not events:
+            return False
+
+        message = "\n".join([f"{len(events)} events:"] + [f"{event.description}" for event in events])
+        return cls._send_sms(message, destinations, recipient, f"digest of {len(events)} events")
+
+    @classmethod
+    def _send_sms(cls, message: str, destinations: set[DestinationConfig], recipient: str, what: str) -> bool:
         # there is only one recipient, so failing to send a single message
         # means something is wrong on the email server
+        destinations = list(destinations)
+        messages = [
+            EmailMessage(subject=f"sms {cls.get_relevant_address(destination)}", body=message, to=[recipient])
+            for destination in destinations
+        ]
+        results = send_email_safely(send_email_messages, messages=messages) or [False] * len(messages)
         sent = True
-        for destination in destinations:
-            phone_number = cls.get_relevant_address(destination)
-            sent = send_email_safely(
-                send_mail,
-                subject=f"sms {phone_number}",
-                message=f"{event.description}",
-                from_email=None,
-                recipient_list=[recipient],
-            )
+        for destination, sent in zip(destinations, results):
             if not sent:
-                LOG.error("SMS: Failed to send event #%i to destination #%i", event.pk, destination.pk)
+                LOG.error("SMS: Failed to send %s to destination #%i", what, destination.pk)
             else:
-                LOG.debug("SMS: Sent event #%i to destination #%i", event.pk, destination.pk)
+                LOG.debug("SMS: Sent %s to destination #%i", what, destination.pk)
 
         return sent
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.16 on 2026-10-18 04:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('argus_incident', '0004_alter_event_type'),
+        ('argus_notificationprofile', '0005_remove_synced'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('destination', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notifications', to='argus_notificationprofile.destinationconfig')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='argus_incident.event')),
+            ],
+            options={
+                'ordering': ['created'],
+                'constraints': [models.UniqueConstraint(fields=('destination', 'event'), name='unique_pending_event_per_destination')],
+            },
+        ),
+    ]
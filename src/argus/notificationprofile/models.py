@@ -12,6 +12,8 @@ from django.utils.text import slugify
 
 from argus.util.utils import collection_to_prose
 
+from .schedule import WeekSchedule
+
 if TYPE_CHECKING:
     from argus.incident.models import Event, Incident  # noqa: F401
 
@@ -25,6 +27,8 @@ class Timeslot(models.Model):
     user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name="timeslots")
     name = models.CharField(max_length=40)
 
+    _week_schedule = None
+
     class Meta:
         constraints = [models.UniqueConstraint(fields=["name", "user"], name="%(class)s_unique_name_per_user")]
         ordering = ["name"]
@@ -45,11 +49,24 @@ class Timeslot(models.Model):
         time_recurrence_prose = [collection_to_prose(tr) for tr in self.time_recurrences.all()]
         return " ".join(time_recurrence_prose)
 
+    def get_week_schedule(self) -> WeekSchedule:
+        """Return the time recurrences compiled for quick lookups
+
+        Kept for as long as the prefetched time recurrences are.
+        """
+        prefetched = getattr(self, "_prefetched_objects_cache", {}).get("time_recurrences")
+        if prefetched is None:
+            return WeekSchedule(self.time_recurrences.all())
+        if self._week_schedule is None or self._week_schedule[0] is not prefetched:
+            self._week_schedule = (prefetched, WeekSchedule(prefetched))
+        return self._week_schedule[1]
+
     def timestamp_is_within_time_recurrences(self, timestamp: datetime):
-        for time_recurrence in self.time_recurrences.all():
-            if time_recurrence.timestamp_is_within(timestamp):
-                return True
-        return False
+        return timestamp in self.get_week_schedule()
+
+    def save(self, *args, **kwargs):
+        self._week_schedule = None
+        super().save(*args, **kwargs)
 
 
 class TimeRecurrence(models.Model):
@@ -138,7 +155,7 @@ class TimeRecurrence(models.Model):
         return f"{hour_range}{days}"
 
     def timestamp_is_within(self, timestamp: datetime):
-        # FIXME: Might affect performance negatively if calling this method frequently
+        # Use Timeslot.timestamp_is_within_time_recurrences when checking many timestamps
         timestamp = timestamp.astimezone(timezone.get_current_timezone())
         return timestamp.isoweekday() in self.isoweekdays and self.start <= timestamp.time() <= self.end
 
@@ -229,6 +246,27 @@ class DestinationConfig(models.Model):
         return f"{self.media.name}: {list(self.settings.values())}"
 
 
+class PendingNotification(models.Model):
+    "An event held back from a destination, to be sent later as part of a digest"
+
+    destination = models.ForeignKey(
+        to=DestinationConfig,
+        on_delete=models.CASCADE,
+        related_name="pending_notifications",
+    )
+    event = models.ForeignKey(to="argus_incident.Event", on_delete=models.CASCADE, related_name="+")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["destination", "event"], name="unique_pending_event_per_destination"),
+        ]
+        ordering = ["created"]
+
+    def __str__(self):
+        return f"Event #{self.event_id} pending for destination #{self.destination_id}"
+
+
 class NotificationProfile(models.Model):
     class Meta:
         constraints = [
@@ -0,0 +1,69 @@
+"""Check timestamps against the time recurrences of a timeslot in one lookup
+
+All the time recurrences of a timeslot are compiled into a sorted list of
+non-overlapping intervals of the week, counted in microseconds since Monday
+midnight. Checking a timestamp is then a binary search.
+
+Time recurrences are in local wall clock time, so the timestamp is converted to
+the current timezone first. That takes care of daylight saving time: 08:00 is
+08:00 both in winter and in summer.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from typing import TYPE_CHECKING
+
+from django.utils import timezone
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import datetime, time
+
+    from .models import TimeRecurrence
+
+
+__all__ = [
+    "WeekSchedule",
+]
+
+MICROSECONDS_PER_DAY = 24 * 60 * 60 * 1_000_000
+
+
+def _time_to_microseconds(time_: time) -> int:
+    return ((time_.hour * 60 + time_.minute) * 60 + time_.second) * 1_000_000 + time_.microsecond
+
+
+class WeekSchedule:
+    "The parts of the week covered by some time recurrences"
+
+    def __init__(self, time_recurrences: Iterable[TimeRecurrence]):
+        intervals = []
+        for time_recurrence in time_recurrences:
+            start = _time_to_microseconds(time_recurrence.start)
+            end = _time_to_microseconds(time_recurrence.end)
+            for day in time_recurrence.isoweekdays:
+                offset = (day - 1) * MICROSECONDS_PER_DAY
+                intervals.append((offset + start, offset + end))
+
+        # Merge overlapping and adjacent intervals, both ends are included
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if start > end:
+                # Ends before it starts, never matches
+                continue
+            if self.ends and start <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end)
+                continue
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __contains__(self, timestamp: datetime) -> bool:
+        timestamp = timestamp.astimezone(timezone.get_current_timezone())
+        moment = (timestamp.isoweekday() - 1) * MICROSECONDS_PER_DAY + _time_to_microseconds(timestamp.time())
+        position = bisect_right(self.starts, moment) - 1
+        return position >= 0 and moment <= self.ends[position]
@@ -3,15 +3,24 @@ from __future__ import annotations
 import logging
 from typing import TYPE_CHECKING
 
+from django.apps import apps as global_apps
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.db.utils import ProgrammingError
 
+from argus.notificationprofile.matcher import invalidate_notification_profile_matcher
 from argus.notificationprofile.media import EMAIL_DESTINATION_SLUG, send_notifications_to_users
-from argus.notificationprofile.tasks import task_check_for_notifications
+from argus.notificationprofile.tasks import (
+    event_coalescer,
+    task_check_for_notifications,
+    task_check_for_notifications_for_many_events,
+)
+from argus.plannedmaintenance.cache import get_planned_maintenance_cache
 from argus.plannedmaintenance.utils import event_covered_by_planned_maintenance
 
 from .models import DestinationConfig, TimeRecurrence, Timeslot
+from .utils import get_notification_coalesce_window
 
 if TYPE_CHECKING:
     from argus.incident.models import Event
@@ -26,6 +35,9 @@ __all__ = [
     "sync_email_destination",
     "task_send_notification",
     "task_background_send_notification",
+    "task_background_send_notifications_for_many_events",
+    "invalidate_compiled_notification_profiles",
+    "invalidate_compiled_notification_profiles_on_setting_changed",
 ]
 
 
@@ -46,7 +58,8 @@ def sync_media(sender, **kwargs):
                 "or remove these media from MEDIA_PLUGINS."
             )
 
-    apps = kwargs["apps"]
+    # Not given when flushing the database, as done by TransactionTestCase
+    apps = kwargs.get("apps", global_apps)
     try:
         Media = apps.get_model("argus_notificationprofile", "Media")
     except ImportError:
@@ -142,4 +155,31 @@ def task_send_notification(sender, instance: Event, *args, **kwargs):
 def task_background_send_notification(sender, instance: Event, *args, **kwargs):
     if event_covered_by_planned_maintenance(event=instance):
         return
-    task_check_for_notifications.enqueue(instance.id)
+    window = get_notification_coalesce_window()
+    if not window:
+        task_check_for_notifications.enqueue(instance.id)
+        return
+    # The event must be visible to the task worker when the batch is enqueued
+    event_id = instance.id
+    transaction.on_commit(lambda: event_coalescer.add(event_id, window))
+
+
+def task_background_send_notifications_for_many_events(sender, events: list[Event], *args, **kwargs):
+    "Check all the events for notifications in one task"
+    planned_maintenance = get_planned_maintenance_cache()
+    event_ids = [event.id for event in events if not planned_maintenance.event_is_covered(event)]
+    if not event_ids:
+        return
+    transaction.on_commit(lambda: task_check_for_notifications_for_many_events.enqueue(event_ids))
+
+
+def invalidate_compiled_notification_profiles(sender, *args, **kwargs):
+    """
+    Recompile notification profiles on changes to profiles or what they use
+    """
+    invalidate_notification_profile_matcher()
+
+
+def invalidate_compiled_notification_profiles_on_setting_changed(sender, setting, *args, **kwargs):
+    if setting in ("ARGUS_FALLBACK_FILTER", "ARGUS_NOTIFICATION_MATCHER_MAX_AGE"):
+        invalidate_notification_profile_matcher()
@@ -1,9 +1,36 @@
+from collections import defaultdict
+
 from django_tasks import task
 
 from argus.incident.models import Event
 
+from .coalesce import Coalescer
+from .digest import pop_pending_events
 from .models import DestinationConfig
-from .media import find_destinations_for_event, send_notification
+from .media.base import render_cache
+from .media import (
+    find_destinations_for_event,
+    find_destinations_for_many_events,
+    send_digest_notification,
+    send_notification,
+)
+
+
+def enqueue_notifications_per_medium(destinations_per_event):
+    """Enqueue one task per medium for sending all the notifications
+
+    ``destinations_per_event`` is a dict of event: destinations.
+    """
+    notifications_per_medium = defaultdict(list)
+    for event, destinations in destinations_per_event.items():
+        destination_ids_per_medium = defaultdict(list)
+        for destination in destinations:
+            destination_ids_per_medium[destination.media_id].append(destination.id)
+        for medium, destination_ids in destination_ids_per_medium.items():
+            notifications_per_medium[medium].append((event.id, sorted(destination_ids)))
+
+    for notifications in notifications_per_medium.values():
+        task_send_many_notifications.enqueue(notifications)
 
 
 @task
@@ -21,6 +48,48 @@ def task_send_notifications(event_id, destination_id):
     send_notification([destination], event)
 
 
+@task
+def task_send_many_notifications(notifications):
+    """Send each event to its destinations
+
+    ``notifications`` is a list of pairs of event id and list of destination
+    ids.
+    """
+    event_ids = set()
+    destination_ids = set()
+    for event_id, event_destination_ids in notifications:
+        event_ids.add(event_id)
+        destination_ids.update(event_destination_ids)
+
+    events = Event.objects.select_related("incident", "actor").in_bulk(event_ids)
+    destinations = DestinationConfig.objects.select_related("media").in_bulk(destination_ids)
+
+    with render_cache():
+        for event_id, event_destination_ids in notifications:
+            event = events.get(event_id)
+            if event is None:
+                continue
+            event_destinations = [destinations[pk] for pk in event_destination_ids if pk in destinations]
+            if not event_destinations:
+                continue
+            send_notification(event_destinations, event)
+
+
+@task
+def task_send_digest(destination_id):
+    "Send all events held back for the destination in one go"
+    try:
+        destination = DestinationConfig.objects.select_related("media").get(id=destination_id)
+    except DestinationConfig.DoesNotExist:
+        return
+
+    events = pop_pending_events(destination)
+    if not events:
+        return
+
+    send_digest_notification(destination, events)
+
+
 @task
 def task_check_for_notifications(event_id):
     try:
@@ -32,5 +101,25 @@ def task_check_for_notifications(event_id):
     if not destinations:
         return
 
-    for destination in destinations:
-        task_send_notifications.enqueue(event_id, destination.id)
+    enqueue_notifications_per_medium({event: destinations})
+
+
+@task
+def task_check_for_notifications_for_many_events(event_ids):
+    events = Event.objects.filter(id__in=event_ids)
+    if not events:
+        return
+
+    destinations_per_event = find_destinations_for_many_events(events)
+    if not destinations_per_event:
+        return
+
+    enqueue_notifications_per_medium(destinations_per_event)
+
+
+def _enqueue_check_for_notifications_for_many_events(event_ids):
+    task_check_for_notifications_for_many_events.enqueue(event_ids)
+
+
+# Events saved within the coalescing window are checked by the same task
+event_coalescer = Coalescer(_enqueue_check_for_notifications_for_many_events)
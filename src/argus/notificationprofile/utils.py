@@ -12,6 +12,11 @@ def are_notifications_enabled():
     return getattr(settings, "SEND_NOTIFICATIONS", False)
 
 
+def get_notification_coalesce_window() -> float:
+    "Number of seconds to collect events for before checking them for notifications"
+    return getattr(settings, "ARGUS_NOTIFICATION_COALESCE_WINDOW", 0)
+
+
 def annotate_public_filters_with_usernames(qs: FilterQuerySet, user: User = None) -> FilterQuerySet:
     """
     Returns a filter queryset that is annotated with a label that is either the name if
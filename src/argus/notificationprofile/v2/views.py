@@ -1,8 +1,8 @@
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.views.generic import DetailView
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from rest_framework import status, viewsets
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
+from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
@@ -11,9 +11,12 @@ from rest_framework.views import APIView
 from drf_rw_serializers import viewsets as rw_viewsets
 
 from argus.drf.permissions import IsOwner
+from argus.drf.streaming import StreamingJSONListResponse
 from argus.filter import get_filter_backend
 from argus.filter.serializers import FilterSerializer
+from argus.incident.models import Incident
 from argus.incident.v2.serializers import IncidentSerializer
+from argus.incident.v2.views import IncidentPagination
 from argus.notificationprofile.media import safely_get_medium_object
 from argus.notificationprofile.media.base import NotificationMedium
 from argus.notificationprofile.models import (
@@ -35,6 +38,7 @@ from .serializers import (
 )
 
 VERSION = "v2"
+PREVIEW_MAX_LIMIT = 1000
 
 
 filter_backend = get_filter_backend()
@@ -42,6 +46,74 @@ QuerySetFilter = filter_backend.QuerySetFilter
 FilterBlobSerializer = filter_backend.FilterBlobSerializer
 
 
+INCIDENT_LIST_PARAMETERS = [
+    OpenApiParameter(name="count", description="Only return the number of incidents.", type=bool),
+    OpenApiParameter(
+        name="limit", description=f"Only return the newest incidents, at most {PREVIEW_MAX_LIMIT}.", type=int
+    ),
+    OpenApiParameter(name="cursor", description="The pagination cursor value.", type=str),
+    OpenApiParameter(name="page_size", description="Paginate the results with this many per page.", type=int),
+    OpenApiParameter(
+        name="stream", description="Stream all of the incidents as a list, for exporting very many.", type=bool
+    ),
+]
+
+
+def get_flag(params, name: str) -> bool:
+    "Whether the query parameter ``name`` is given and not false, ``?name`` alone is true"
+    if name not in params:
+        return False
+    value = params[name]
+    if value == "":
+        return True
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError as e:
+        raise ValidationError({name: e.detail})
+
+
+class FilteredIncidentsResponseMixin:
+    """
+    Respond with a possibly very large queryset of incidents
+
+    The query parameters select the format of the response:
+
+    * "count": only the number of incidents
+    * "limit": the newest incidents, at most ``PREVIEW_MAX_LIMIT``
+    * "cursor" or "page_size": a page at a time, like the incident list
+    * "stream": all of the incidents, streamed as a list, newest first
+    * none of the above: all of the incidents as a list, newest first
+    """
+
+    def get_filtered_incidents_response(self, request, incidents):
+        params = request.query_params
+        context = {"request": request, "view": self}
+
+        if get_flag(params, "count"):
+            return Response({"count": incidents.count()})
+
+        if "limit" in params:
+            try:
+                limit = int(params["limit"])
+            except ValueError:
+                raise ValidationError({"limit": "A whole number is required."})
+            if limit < 0:
+                raise ValidationError({"limit": "Must not be negative."})
+            incidents = incidents.order_by("-start_time")[: min(limit, PREVIEW_MAX_LIMIT)]
+            return Response(IncidentSerializer(incidents, many=True, context=context).data)
+
+        if {"cursor", "page_size"} & set(params):
+            paginator = IncidentPagination()
+            page = paginator.paginate_queryset(incidents, request, view=self)
+            serializer = IncidentSerializer(page, many=True, context=context)
+            return paginator.get_paginated_response(serializer.data)
+
+        incidents = incidents.order_by("-start_time")
+        if get_flag(params, "stream"):
+            return StreamingJSONListResponse(incidents, IncidentSerializer, context=context)
+        return Response(IncidentSerializer(incidents, many=True, context=context).data)
+
+
 @extend_schema_view(
     create=extend_schema(
         request=RequestNotificationProfileSerializer,
@@ -54,7 +126,7 @@ FilterBlobSerializer = filter_backend.FilterBlobSerializer
         request=RequestNotificationProfileSerializer,
     ),
 )
-class NotificationProfileViewSet(rw_viewsets.ModelViewSet):
+class NotificationProfileViewSet(FilteredIncidentsResponseMixin, rw_viewsets.ModelViewSet):
     permission_classes = [*rw_viewsets.ModelViewSet.permission_classes, IsOwner]
     serializer_class = ResponseNotificationProfileSerializer
     read_serializer_class = ResponseNotificationProfileSerializer
@@ -68,25 +140,30 @@ class NotificationProfileViewSet(rw_viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
     @extend_schema(
+        parameters=INCIDENT_LIST_PARAMETERS,
         responses={200: IncidentSerializer(many=True)},
     )
     @action(methods=["get"], detail=True)
     def incidents(self, request, pk, *args, **kwargs):
+        """
+        List the incidents matched by any of the filters of the notification profile
+
+        By default the complete list is returned. See the query parameters
+        for how to count, limit, paginate or stream it instead.
+        """
         try:
             notification_profile = request.user.notification_profiles.get(pk=pk)
         except NotificationProfile.DoesNotExist:
             raise ValidationError(f"Notification profile with pk={pk} does not exist.")
-        serializer = IncidentSerializer(
-            QuerySetFilter.incidents_by_notificationprofile(
-                incident_queryset=None,
-                notificationprofile=notification_profile,
-            ),
-            many=True,
+        incidents = QuerySetFilter.incidents_by_notificationprofile(
+            incident_queryset=Incident.objects.prefetch_default_related(),
+            notificationprofile=notification_profile,
         )
-        return Response(serializer.data)
+        return self.get_filtered_incidents_response(request, incidents)
 
     @extend_schema(
         request=FilterBlobSerializer,
+        parameters=INCIDENT_LIST_PARAMETERS,
         responses=IncidentSerializer(many=True),
     )
     @action(methods=["post"], detail=False)
@@ -107,6 +184,9 @@ class NotificationProfileViewSet(rw_viewsets.ModelViewSet):
         Minimal format:
         {}
 
+        By default the complete list is returned. See the query parameters
+        for how to count, limit, paginate or stream it instead.
+
         Will eventually take over for the filterpreview endpoint
         """
         filter_dict = request.data
@@ -114,8 +194,8 @@ class NotificationProfileViewSet(rw_viewsets.ModelViewSet):
         if not serializer.is_valid():
             raise ValidationError(serializer.errors)
 
-        serializer = IncidentSerializer(QuerySetFilter.filtered_incidents(serializer.data), many=True)
-        return Response(serializer.data)
+        incidents = QuerySetFilter.filtered_incidents(serializer.data, Incident.objects.prefetch_default_related())
+        return self.get_filtered_incidents_response(request, incidents)
 
 
 class SchemaView(DetailView):
@@ -281,10 +361,11 @@ class FilterViewSet(viewsets.ModelViewSet):
 @extend_schema_view(
     post=extend_schema(
         request=FilterBlobSerializer,
+        parameters=INCIDENT_LIST_PARAMETERS,
         responses={200: IncidentSerializer},
     ),
 )
-class FilterPreviewView(APIView):
+class FilterPreviewView(FilteredIncidentsResponseMixin, APIView):
     def post(self, request, format=None):
         """
         POST a filter, get a list of filtered incidents back
@@ -301,14 +382,17 @@ class FilterPreviewView(APIView):
 
         Minimal format:
         {}
+
+        By default the complete list is returned. See the query parameters
+        for how to count, limit, paginate or stream it instead.
         """
         filter_dict = request.data
         serializer = FilterBlobSerializer(data=filter_dict)
         if not serializer.is_valid():
             raise ValidationError(serializer.errors)
 
-        serializer = IncidentSerializer(QuerySetFilter.filtered_incidents(serializer.data), many=True)
-        return Response(serializer.data)
+        incidents = QuerySetFilter.filtered_incidents(serializer.data, Incident.objects.prefetch_default_related())
+        return self.get_filtered_incidents_response(request, incidents)
 
 
 filter_preview_view = FilterPreviewView.as_view()
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_save
+from django.core.signals import setting_changed
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 
 class PlannedmaintenanceConfig(AppConfig):
@@ -7,6 +8,23 @@ class PlannedmaintenanceConfig(AppConfig):
     label = "argus_plannedmaintenance"
 
     def ready(self):
-        from .signals import add_planned_maintenance_tasks_covering_incident
+        from argus.incident.signals import incidents_created_in_bulk
+        from argus.notificationprofile.models import Filter
+
+        from .models import PlannedMaintenanceTask
+        from .signals import (
+            add_planned_maintenance_tasks_covering_incident,
+            add_planned_maintenance_tasks_covering_incidents,
+            invalidate_cached_planned_maintenance,
+            invalidate_cached_planned_maintenance_on_setting_changed,
+        )
 
         post_save.connect(add_planned_maintenance_tasks_covering_incident, "argus_incident.Incident")
+        incidents_created_in_bulk.connect(add_planned_maintenance_tasks_covering_incidents)
+
+        # keep cached planned maintenance tasks up to date
+        for model in (PlannedMaintenanceTask, Filter):
+            post_save.connect(invalidate_cached_planned_maintenance, model)
+            post_delete.connect(invalidate_cached_planned_maintenance, model)
+        m2m_changed.connect(invalidate_cached_planned_maintenance, PlannedMaintenanceTask.filters.through)
+        setting_changed.connect(invalidate_cached_planned_maintenance_on_setting_changed)
@@ -0,0 +1,179 @@
+"""Keep the planned maintenance tasks that are not yet over in memory
+
+Every new event is checked against planned maintenance before notifications
+are sent. Rather than loading and compiling all tasks ever made, including
+years of past ones, for every event, the current and future tasks are loaded
+once together with their filters and kept until a task or filter changes.
+
+As with the compiled notification profiles, changes are signalled via a
+generation counter in Django's cache and the tasks are reloaded at the latest
+after ``ARGUS_PLANNED_MAINTENANCE_CACHE_MAX_AGE`` seconds. The counter is only
+bumped once a change is committed, and tasks loaded while a change is not yet
+committed are not kept.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from datetime import timedelta
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from argus.filter import get_filter_backend
+
+from .models import PlannedMaintenanceTask
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from datetime import datetime
+
+    from argus.incident.models import Event
+
+
+filter_backend = get_filter_backend()
+PrecisionFilterWrapper = filter_backend.PrecisionFilterWrapper
+
+LOG = logging.getLogger(__name__)
+
+__all__ = [
+    "CompiledPlannedMaintenanceTask",
+    "PlannedMaintenanceCache",
+    "get_planned_maintenance_cache",
+    "invalidate_planned_maintenance_cache",
+]
+
+DEFAULT_MAX_AGE = 60  # seconds
+# Events are usually a little older than the moment they are checked
+LOOKBACK = timedelta(hours=1)
+GENERATION_CACHE_KEY = "argus.plannedmaintenance.cache.generation"
+
+_cached_tasks: Optional[PlannedMaintenanceCache] = None
+# Per thread, as are database connections and their transactions
+_local = threading.local()
+
+
+class CompiledPlannedMaintenanceTask:
+    "A planned maintenance task with its filters compiled once"
+
+    def __init__(self, task: PlannedMaintenanceTask):
+        self.task = task
+        self.pk = task.pk
+        self.start_time = task.start_time
+        self.end_time = task.end_time
+        filterwrapper = PrecisionFilterWrapper.filterwrapper
+        self.filters = [filterwrapper(filter_.filter) for filter_ in task.filters.all()]
+
+    def active_at_time(self, timestamp: datetime) -> bool:
+        return self.start_time <= timestamp <= self.end_time
+
+    def covers(self, event: Event) -> bool:
+        "Equivalent of ``PlannedMaintenanceFilterWrapper.filter_fits``"
+        if not self.active_at_time(event.timestamp):
+            return False
+        # All filters must fit
+        for filterwrapper in self.filters:
+            if not filterwrapper.incident_fits(event.incident):
+                return False
+        return True
+
+
+class PlannedMaintenanceCache:
+    """Planned maintenance tasks ending after ``since``, ordered by start time
+
+    Events older than ``since`` are checked against the database instead.
+    """
+
+    def __init__(self, tasks: Iterable[PlannedMaintenanceTask], since: datetime):
+        self.since = since
+        self.tasks = sorted((CompiledPlannedMaintenanceTask(task) for task in tasks), key=lambda t: t.start_time)
+        self.start_times = [task.start_time for task in self.tasks]
+        self.generation = None
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    @classmethod
+    def build(cls, now: Optional[datetime] = None):
+        since = (now or timezone.now()) - LOOKBACK
+        qs = PlannedMaintenanceTask.objects.filter(end_time__gte=since).prefetch_related("filters")
+        return cls(qs, since)
+
+    def get_tasks_active_at_time(self, timestamp: datetime) -> list[CompiledPlannedMaintenanceTask]:
+        if timestamp < self.since:
+            qs = PlannedMaintenanceTask.objects.active_at_time(timestamp).prefetch_related("filters")
+            return [CompiledPlannedMaintenanceTask(task) for task in qs]
+        # Only tasks that have started can be active
+        started = self.tasks[: bisect_right(self.start_times, timestamp)]
+        return [task for task in started if task.active_at_time(timestamp)]
+
+    def event_is_covered(self, event: Event) -> bool:
+        for task in self.get_tasks_active_at_time(event.timestamp):
+            if task.covers(event):
+                return True
+        return False
+
+
+def _get_max_age() -> int:
+    return getattr(settings, "ARGUS_PLANNED_MAINTENANCE_CACHE_MAX_AGE", DEFAULT_MAX_AGE)
+
+
+def _get_generation() -> int:
+    return cache.get(GENERATION_CACHE_KEY, 0)
+
+
+def _bump_generation():
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        # Key is missing
+        cache.set(GENERATION_CACHE_KEY, 1, timeout=None)
+
+
+def _can_store_tasks() -> bool:
+    # Tasks loaded after an uncommitted change to planned maintenance might be
+    # rolled back, and rollbacks do not send any signals
+    if not transaction.get_connection().in_atomic_block:
+        # Any change has been committed or rolled back by now
+        _local.pending_invalidation = False
+    return not getattr(_local, "pending_invalidation", False)
+
+
+def get_planned_maintenance_cache() -> PlannedMaintenanceCache:
+    "Return the planned maintenance tasks that are not over yet, reloading them if stale"
+    global _cached_tasks
+
+    max_age = _get_max_age()
+    generation = _get_generation()
+    tasks = _cached_tasks
+    if tasks is not None and tasks.generation == generation and time.monotonic() - tasks.built_at < max_age:
+        return tasks
+
+    tasks = PlannedMaintenanceCache.build()
+    tasks.generation = generation
+    LOG.debug("Planned maintenance: loaded %i current and future tasks", len(tasks))
+    if max_age and _can_store_tasks():
+        _cached_tasks = tasks
+    return tasks
+
+
+def _commit_invalidation():
+    _local.pending_invalidation = False
+    _bump_generation()
+
+
+def invalidate_planned_maintenance_cache():
+    "Force all processes to reload the planned maintenance tasks"
+    global _cached_tasks
+
+    _cached_tasks = None
+    _local.pending_invalidation = True
+    # Other processes must not reload before the change is visible to them
+    transaction.on_commit(_commit_invalidation)
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+from argus.plannedmaintenance.cache import invalidate_planned_maintenance_cache
+from argus.plannedmaintenance.models import PlannedMaintenanceTask
 from argus.plannedmaintenance.utils import connect_incident_with_planned_maintenance_tasks
 
 if TYPE_CHECKING:
@@ -10,3 +12,23 @@ if TYPE_CHECKING:
 
 def add_planned_maintenance_tasks_covering_incident(instance: Incident, **kwargs):
     connect_incident_with_planned_maintenance_tasks(incident=instance)
+
+
+def add_planned_maintenance_tasks_covering_incidents(incidents: list[Incident], **kwargs):
+    pm_tasks = PlannedMaintenanceTask.objects.current()
+    if not pm_tasks.exists():
+        return
+    for incident in incidents:
+        connect_incident_with_planned_maintenance_tasks(incident=incident, pm_tasks=pm_tasks)
+
+
+def invalidate_cached_planned_maintenance(sender, *args, **kwargs):
+    """
+    Reload the planned maintenance tasks on changes to tasks or their filters
+    """
+    invalidate_planned_maintenance_cache()
+
+
+def invalidate_cached_planned_maintenance_on_setting_changed(sender, setting, *args, **kwargs):
+    if setting == "ARGUS_PLANNED_MAINTENANCE_CACHE_MAX_AGE":
+        invalidate_planned_maintenance_cache()
@@ -4,6 +4,7 @@ from typing import Optional, TYPE_CHECKING
 
 from argus.filter import get_filter_backend
 from argus.incident.models import Event, Incident, IncidentQuerySet
+from argus.plannedmaintenance.cache import get_planned_maintenance_cache
 from argus.plannedmaintenance.models import PlannedMaintenanceQuerySet, PlannedMaintenanceTask
 
 filter_backend = get_filter_backend()
@@ -75,9 +76,12 @@ def event_covered_by_planned_maintenance(
     """
     Returns true if the given event is covered by at least one of the given planned
     maintenance tasks
+
+    If no tasks are given, all tasks are checked via the in-memory cache of
+    current and future tasks.
     """
     if not pm_tasks:
-        pm_tasks = PlannedMaintenanceTask.objects.all()
+        return get_planned_maintenance_cache().event_is_covered(event)
 
     for pm in pm_tasks:
         pmfw = PlannedMaintenanceFilterWrapper(pm)
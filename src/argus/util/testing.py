@@ -1,9 +1,12 @@
 from django.db.models.signals import post_save
 
 from argus.incident.models import Event, Incident
+from argus.incident.signals import incidents_created_in_bulk
 from argus.notificationprofile.signals import task_send_notification
 from argus.notificationprofile.signals import task_background_send_notification
+from argus.notificationprofile.signals import task_background_send_notifications_for_many_events
 from argus.plannedmaintenance.signals import add_planned_maintenance_tasks_covering_incident
+from argus.plannedmaintenance.signals import add_planned_maintenance_tasks_covering_incidents
 
 
 __all__ = [
@@ -19,9 +22,17 @@ def disconnect_signals():
     post_save.disconnect(task_send_notification, Event, dispatch_uid="send_notification")
     post_save.disconnect(task_background_send_notification, Event, dispatch_uid="send_notification")
     post_save.disconnect(add_planned_maintenance_tasks_covering_incident, Incident)
+    incidents_created_in_bulk.disconnect(
+        task_background_send_notifications_for_many_events, dispatch_uid="send_notifications_for_many_events"
+    )
+    incidents_created_in_bulk.disconnect(add_planned_maintenance_tasks_covering_incidents)
 
 
 def connect_signals():
     post_save.connect(task_send_notification, Event, dispatch_uid="send_notification")
     post_save.connect(task_background_send_notification, Event, dispatch_uid="send_notification")
     post_save.connect(add_planned_maintenance_tasks_covering_incident, Incident)
+    incidents_created_in_bulk.connect(
+        task_background_send_notifications_for_many_events, dispatch_uid="send_notifications_for_many_events"
+    )
+    incidents_created_in_bulk.connect(add_planned_maintenance_tasks_covering_incidents)
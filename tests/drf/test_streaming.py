@@ -0,0 +1,33 @@
+import json
+
+from django.test import TestCase, tag
+from rest_framework.utils.encoders import JSONEncoder
+
+from argus.drf.streaming import StreamingJSONListResponse
+from argus.incident.factories import SourceSystemFactory, StatelessIncidentFactory
+from argus.incident.models import Incident
+from argus.incident.v2.serializers import IncidentSerializer
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+@tag("unit")
+class StreamingJSONListResponseTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        source = SourceSystemFactory()
+        StatelessIncidentFactory.create_batch(3, source=source)
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_when_chunk_size_changes_then_streamed_incidents_are_the_same(self):
+        incidents = Incident.objects.prefetch_default_related().order_by("pk")
+        expected = json.loads(json.dumps(IncidentSerializer(incidents, many=True).data, cls=JSONEncoder))
+
+        for chunk_size in (1, 2, 100):
+            response = StreamingJSONListResponse(incidents, IncidentSerializer, chunk_size=chunk_size)
+            self.assertEqual(json.loads(b"".join(response.streaming_content)), expected)
+
+    def test_given_nothing_to_stream_then_it_is_an_empty_list(self):
+        response = StreamingJSONListResponse(Incident.objects.none(), IncidentSerializer)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), [])
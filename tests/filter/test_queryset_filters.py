@@ -1,3 +1,7 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase, tag
 
 from argus.auth.factories import AdminUserFactory, SourceUserFactory
@@ -11,6 +15,8 @@ from argus.incident.factories import (
     TagFactory,
 )
 from argus.incident.models import Event, Incident
+from argus.filter.factories import FilterFactory
+from argus.notificationprofile.factories import NotificationProfileFactory, TimeslotFactory
 from argus.filter.queryset_filters import (
     QuerySetFilter,
     _incidents_fitting_event_types,
@@ -173,3 +179,80 @@ class FilteredIncidentsTests(TestCase):
             set(QuerySetFilter.filtered_incidents({"sourceSystemIds": [self.source1.pk], "tags": [str(self.tag1)]})),
             {self.incident1},
         )
+
+    def test_given_tags_of_the_same_key_then_incidents_matching_any_of_them_are_found(self):
+        tags = [str(self.tag1), str(self.tag2), str(self.tag3)]
+        self.assertEqual(set(QuerySetFilter.filtered_incidents({"tags": tags})), {self.incident1, self.incident2})
+        self.assertEqual(set(QuerySetFilter.filtered_incidents({"tags": [str(self.tag1), "location=Bergen"]})), set())
+
+    def test_when_filtering_incidents_then_it_is_a_single_query_without_distinct(self):
+        EventFactory(incident=self.incident1, type=Event.Type.STATELESS)
+        qs = QuerySetFilter.filtered_incidents(
+            {"sourceSystemIds": [self.source1.pk], "tags": [str(self.tag1)], "event_types": [Event.Type.STATELESS]}
+        )
+        sql = str(qs.query).upper()
+        self.assertNotIn("DISTINCT", sql)
+        self.assertEqual(sql.count("EXISTS"), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(list(qs), [self.incident1])
+
+
+@tag("database", "queryset-filter")
+class ExplainFilterTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_when_explaining_a_filter_then_query_and_plan_are_shown(self):
+        explanation = QuerySetFilter.explain({"maxlevel": 3})
+        self.assertIn('"argus_incident_incident"."level" <= 3', explanation)
+        self.assertIn("Scan", explanation)
+
+    def test_when_explaining_an_empty_filter_then_no_query_is_made(self):
+        with self.assertNumQueries(0):
+            explanation = QuerySetFilter.explain({})
+        self.assertIn("no query", explanation)
+
+    def test_when_explain_filter_command_is_given_a_filter_then_it_explains_it(self):
+        filter_ = FilterFactory(user=AdminUserFactory(), name="Critical", filter={"maxlevel": 1})
+        out = StringIO()
+        call_command("explain_filter", pk=filter_.pk, stdout=out)
+        self.assertIn("level", out.getvalue())
+
+    def test_when_explain_filter_command_is_given_an_unknown_filter_then_it_fails(self):
+        with self.assertRaises(CommandError):
+            call_command("explain_filter", name="Missing", stdout=StringIO())
+
+
+@tag("database", "queryset-filter")
+class IncidentsByNotificationProfileTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.user = AdminUserFactory()
+        self.source1 = SourceSystemFactory()
+        self.source2 = SourceSystemFactory()
+        self.incident1 = StatelessIncidentFactory(source=self.source1)
+        self.incident2 = StatelessIncidentFactory(source=self.source2)
+        StatelessIncidentFactory(source=SourceSystemFactory())
+        self.profile = NotificationProfileFactory(user=self.user, timeslot=TimeslotFactory(user=self.user))
+
+    def tearDown(self):
+        connect_signals()
+
+    def add_filter(self, filterblob):
+        self.profile.filters.add(FilterFactory(user=self.user, filter=filterblob))
+
+    def test_given_many_filters_then_incidents_matching_any_are_found_in_one_query(self):
+        self.add_filter({"sourceSystemIds": [self.source1.pk]})
+        self.add_filter({"sourceSystemIds": [self.source2.pk]})
+        self.add_filter({"sourceSystemIds": [self.source2.pk], "stateful": False})
+        qs = QuerySetFilter.incidents_by_notificationprofile(None, self.profile)
+        self.assertNotIn("DISTINCT", str(qs.query).upper())
+        with self.assertNumQueries(1):
+            self.assertEqual(set(qs), {self.incident1, self.incident2})
+
+    def test_given_no_filters_then_nothing_matches(self):
+        self.add_filter({})
+        self.assertFalse(QuerySetFilter.incidents_by_notificationprofile(None, self.profile).exists())
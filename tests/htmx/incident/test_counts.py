@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+
+from argus.auth.factories import PersonUserFactory
+from argus.htmx.incident.counts import estimate_incident_count, get_filtered_count, get_total_count
+from argus.htmx.incident.filter import incident_list_filter
+from argus.incident.factories import SourceSystemFactory, StatelessIncidentFactory
+from argus.incident.models import Incident
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+def own_incidents_filter(request, queryset):
+    return incident_list_filter(request, queryset)
+
+
+@tag("database")
+class IncidentCountTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.addCleanup(connect_signals)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.source = SourceSystemFactory()
+        StatelessIncidentFactory.create_batch(3, source=self.source)
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Incident._meta.db_table}")
+
+    def test_given_the_same_filter_then_the_filtered_count_is_shared(self):
+        qs = Incident.objects.filter(source=self.source)
+        self.assertEqual(get_filtered_count(qs, {"sourceSystemIds": [self.source], "page": 1, "sort": "level"}), 3)
+        StatelessIncidentFactory(source=self.source)
+        with self.assertNumQueries(0):
+            count = get_filtered_count(qs, {"page": 2, "sourceSystemIds": [self.source], "sort_order": "asc"})
+        self.assertEqual(count, 3)
+
+    def test_given_different_filters_then_the_filtered_counts_differ(self):
+        get_filtered_count(Incident.objects.all(), {})
+        count = get_filtered_count(Incident.objects.none(), {"sourceSystemIds": [self.source]})
+        self.assertEqual(count, 0)
+
+    def test_given_users_with_the_default_filter_function_then_the_filtered_count_is_shared(self):
+        get_filtered_count(Incident.objects.all(), {}, PersonUserFactory())
+        self.assertEqual(get_filtered_count(Incident.objects.none(), {}, PersonUserFactory()), 3)
+
+    def test_given_different_filter_functions_then_the_filtered_counts_differ(self):
+        get_filtered_count(Incident.objects.all(), {})
+        with override_settings(ARGUS_HTMX_FILTER_FUNCTION=own_incidents_filter):
+            self.assertEqual(get_filtered_count(Incident.objects.none(), {}), 0)
+
+    @override_settings(ARGUS_HTMX_FILTER_FUNCTION=own_incidents_filter)
+    def test_given_users_with_other_filter_functions_then_the_filtered_counts_differ(self):
+        user = PersonUserFactory()
+        get_filtered_count(Incident.objects.all(), {}, user)
+        self.assertEqual(get_filtered_count(Incident.objects.none(), {}, PersonUserFactory()), 0)
+        self.assertEqual(get_filtered_count(Incident.objects.none(), {}, user), 3)
+
+    def test_when_refreshing_then_counts_are_made_again(self):
+        get_filtered_count(Incident.objects.all(), {})
+        StatelessIncidentFactory(source=self.source)
+        self.assertEqual(get_filtered_count(Incident.objects.all(), {}, refresh=True), 4)
+        self.assertEqual(get_filtered_count(Incident.objects.none(), {}), 4)
+
+    @override_settings(ARGUS_INCIDENT_COUNT_CACHE_TIMEOUT=0)
+    def test_given_a_timeout_of_zero_then_counts_are_not_cached(self):
+        get_filtered_count(Incident.objects.all(), {})
+        StatelessIncidentFactory(source=self.source)
+        self.assertEqual(get_filtered_count(Incident.objects.all(), {}), 4)
+
+    def test_when_the_table_has_been_analyzed_then_the_estimate_is_known(self):
+        self.analyze()
+        self.assertEqual(estimate_incident_count(), 3)
+
+    @override_settings(ARGUS_INCIDENT_COUNT_ESTIMATE_THRESHOLD=3)
+    def test_given_more_incidents_than_the_threshold_then_the_total_count_is_estimated(self):
+        self.analyze()
+        StatelessIncidentFactory(source=self.source)
+        total = get_total_count(Incident.objects.all())
+        self.assertTrue(total.estimated)
+        self.assertEqual(total.value, 3)
+
+    @override_settings(ARGUS_INCIDENT_COUNT_ESTIMATE_THRESHOLD=10)
+    def test_given_fewer_incidents_than_the_threshold_then_the_total_count_is_exact(self):
+        self.analyze()
+        total = get_total_count(Incident.objects.all())
+        self.assertFalse(total.estimated)
+        self.assertEqual(total.value, 3)
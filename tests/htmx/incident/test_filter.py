@@ -2,9 +2,10 @@ import json
 from unittest.mock import Mock
 
 from django.contrib.messages.middleware import MessageMiddleware
+from django.core.cache import cache
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.http import Http404, QueryDict
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, override_settings
 
 from argus.auth.factories import PersonUserFactory
 from argus.auth.utils import get_preference_obj
@@ -13,7 +14,7 @@ from argus.htmx.incident.filter import IncidentFilterForm, NamedFilterForm, crea
 from argus.htmx.incident.views import create_filter, update_filter, delete_filter, search_tags
 from argus.incident.constants import AckedStatus, OpenStatus
 from argus.incident.factories import IncidentFactory, SourceSystemFactory
-from argus.incident.models import Incident, Tag
+from argus.incident.models import Incident, IncidentTagRelation, Tag
 from argus.notificationprofile.models import Filter
 from argus.util.testing import connect_signals, disconnect_signals
 
@@ -477,3 +478,45 @@ class TestSearchTagsFilter(TestCase):
         assert "text" in result
         assert result["id"] == str(tag)
         assert result["text"] == str(tag)
+
+
+@override_settings(ARGUS_TAG_SUGGESTIONS_CACHE_TIMEOUT=0)
+class TestSearchTagsSuggestions(TestCase):
+    def setUp(self) -> None:
+        disconnect_signals()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        connect_signals()
+
+    def _search(self, query):
+        response = search_tags(self.factory.get("/search-tags/", {"q": query}))
+        return [result["id"] for result in json.loads(response.content)["results"]]
+
+    def test_when_suggesting_tags_then_the_most_used_come_first(self):
+        rare = Tag.objects.create(key="location", value="oslo")
+        common = Tag.objects.create(key="location", value="trondheim")
+        for incident in IncidentFactory.create_batch(2):
+            IncidentTagRelation.objects.create(tag=common, incident=incident, added_by=incident.source.user)
+        self.assertEqual(self._search("location"), [str(common), str(rare)])
+
+    def test_given_a_substring_anywhere_in_the_key_then_it_matches_case_insensitively(self):
+        tag = Tag.objects.create(key="source_location", value="oslo")
+        self.assertEqual(self._search("LOCA"), [str(tag)])
+
+    @override_settings(ARGUS_TAG_SUGGESTIONS_CACHE_TIMEOUT=60)
+    def test_when_asking_again_then_the_suggestions_are_cached(self):
+        cache.clear()
+        tag = Tag.objects.create(key="cached", value="1")
+        self.assertEqual(self._search("cached"), [str(tag)])
+        Tag.objects.create(key="cached", value="2")
+        with self.assertNumQueries(0):
+            self.assertEqual(self._search("cached"), [str(tag)])
+
+    def test_given_many_matches_then_only_the_closest_are_ranked_by_usage(self):
+        close = Tag.objects.create(key="location", value="oslo")
+        distant = Tag.objects.create(key="location_of_the_rack", value="b3")
+        for incident in IncidentFactory.create_batch(2):
+            IncidentTagRelation.objects.create(tag=distant, incident=incident, added_by=incident.source.user)
+        self.assertEqual(list(Tag.objects.suggest("location", candidates=1)), [close])
+        self.assertEqual(list(Tag.objects.suggest("location", candidates=2)), [distant, close])
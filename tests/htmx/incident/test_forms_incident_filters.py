@@ -6,7 +6,13 @@ from django.utils import timezone
 
 from argus.incident.models import Incident
 from argus.incident.factories import IncidentFactory
-from argus.htmx.incident.forms.incident_filters import DescriptionForm, HasTicketForm, IdForm, IsUnderMaintenanceForm
+from argus.htmx.incident.forms.incident_filters import (
+    DescriptionForm,
+    FullTextSearchForm,
+    HasTicketForm,
+    IdForm,
+    IsUnderMaintenanceForm,
+)
 from argus.plannedmaintenance.factories import PlannedMaintenanceFactory
 
 
@@ -116,6 +122,37 @@ class DescriptionFormTest(TestCase):
         self.assertEqual(result_qs[0], self.incident)
 
 
+class FullTextSearchFormTest(TestCase):
+    class obj:
+        pass
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.incident = IncidentFactory(description="Jubalong server is down")
+        IncidentFactory(description="Something else")
+
+    def test_given_no_fulltext_input_then_form_returns_every_incident(self):
+        qs = Incident.objects.all()
+        request = self.obj()
+
+        request.GET = QueryDict(query_string="")
+        form = FullTextSearchForm(data=request.GET)
+        result_qs = form.filter(qs, request)
+        self.assertEqual(qs, result_qs)
+
+    def test_given_found_fulltext_input_then_form_returns_ranked_specific_incident(self):
+        qs = Incident.objects.all()
+        request = self.obj()
+
+        request.GET = QueryDict(query_string="fulltext=serv+JUBAL")
+        form = FullTextSearchForm(data=request.GET)
+        result_qs = form.filter(qs, request)
+        self.assertEqual(result_qs.count(), 1)
+        self.assertEqual(result_qs[0], self.incident)
+        self.assertGreater(result_qs[0].search_rank, 0)
+
+
 class HasTicketFormTest(TestCase):
     class obj:
         pass
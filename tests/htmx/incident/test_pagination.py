@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+from django import test
+from django.core.cache import cache
+from django.test import override_settings, tag
+from django.test.client import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from argus.auth.factories import PersonUserFactory
+from argus.htmx.incident.pagination import KeysetPaginator
+from argus.htmx.incident.views import incident_list
+from argus.htmx.user.factories import ArgusHtmxPreferencesFactory
+from argus.incident.constants import Level
+from argus.incident.factories import (
+    SourceSystemFactory,
+    StatefulIncidentFactory,
+    StatelessIncidentFactory,
+)
+from argus.incident.models import Incident
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+@tag("database")
+class KeysetPaginatorTests(test.TestCase):
+    ORDERINGS = [
+        ["-start_time"],
+        ["start_time"],
+        ["level", "-start_time"],
+        ["-level", "-start_time"],
+        ["end_time", "-start_time"],
+        ["-end_time", "-start_time"],
+        ["source__name", "-start_time"],
+        ["-pk"],
+    ]
+
+    def setUp(self):
+        disconnect_signals()
+        self.addCleanup(connect_signals)
+        now = timezone.now()
+        sources = SourceSystemFactory.create_batch(2)
+        for i in range(4):
+            # Some share start time and level to exercise the tiebreaker
+            start_time = now - timedelta(hours=i // 2)
+            StatelessIncidentFactory(start_time=start_time, level=1 + i % 2, source=sources[0])
+            StatefulIncidentFactory(start_time=start_time, level=1 + i % 3, source=sources[i % 2])
+            StatefulIncidentFactory(
+                start_time=start_time, end_time=now + timedelta(minutes=i), level=2, source=sources[1]
+            )
+
+    def walk(self, paginator):
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor()))
+        return pages
+
+    def test_when_walking_forward_then_every_incident_is_visited_once_in_order(self):
+        for ordering in self.ORDERINGS:
+            with self.subTest(ordering=ordering):
+                paginator = KeysetPaginator(Incident.objects.all(), ordering, per_page=5)
+                expected = list(paginator._order_by(Incident.objects.all()))
+                pages = self.walk(paginator)
+                self.assertEqual([incident for page in pages for incident in page], expected)
+                self.assertEqual(len(pages), 3)
+
+    def test_when_walking_backward_then_the_pages_are_the_same(self):
+        for ordering in self.ORDERINGS:
+            with self.subTest(ordering=ordering):
+                paginator = KeysetPaginator(Incident.objects.all(), ordering, per_page=5)
+                pages = self.walk(paginator)
+                page = pages[-1]
+                for expected in reversed(pages[:-1]):
+                    page = paginator.get_page(page.previous_cursor())
+                    self.assertEqual(page.object_list, expected.object_list)
+                self.assertFalse(page.has_previous())
+
+    def test_given_the_first_page_then_there_is_no_previous_page(self):
+        page = KeysetPaginator(Incident.objects.all(), ["-start_time"], per_page=5).get_page()
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_given_an_invalid_cursor_then_the_first_page_is_shown(self):
+        paginator = KeysetPaginator(Incident.objects.all(), ["-start_time"], per_page=5)
+        first_page = paginator.get_page()
+        self.assertEqual(paginator.get_page("not a cursor").object_list, first_page.object_list)
+
+    def test_given_a_cursor_for_another_sort_order_then_the_first_page_is_shown(self):
+        cursor = KeysetPaginator(Incident.objects.all(), ["level"], per_page=5).get_page().next_cursor()
+        paginator = KeysetPaginator(Incident.objects.all(), ["-start_time"], per_page=5)
+        self.assertEqual(paginator.get_page(cursor).object_list, paginator.get_page().object_list)
+
+
+@tag("integration")
+@override_settings(ARGUS_INCIDENTS_KEYSET_PAGINATION=True)
+class IncidentListKeysetPaginationTests(test.TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.addCleanup(connect_signals)
+        StatefulIncidentFactory.create_batch(15)
+        self.user = PersonUserFactory()
+        preferences = ArgusHtmxPreferencesFactory(user=self.user)
+        preferences.preferences["incidents_table_column_name"] = "default"
+        preferences.save()
+
+    def get(self, **params):
+        request = RequestFactory().get("/incidents", {"page_size": 10, "maxlevel": max(Level).value, **params})
+        request.session = {}
+        request.user = self.user
+        request.htmx = False
+        return incident_list(request)
+
+    def test_given_the_first_page_then_it_links_to_the_next_page_only(self):
+        response = self.get()
+        self.assertContains(response, "Next ›")
+        self.assertNotContains(response, "‹ Previous")
+        self.assertNotContains(response, '"page": "2"')
+
+    def test_given_the_next_page_then_it_links_back(self):
+        paginator = KeysetPaginator(Incident.objects.all(), ["-start_time"], per_page=10)
+        cursor = paginator.get_page().next_cursor()
+        response = self.get(cursor=cursor)
+        self.assertContains(response, "‹ Previous")
+        self.assertNotContains(response, "Next ›")
+        self.assertContains(response, f'"cursor": "{cursor}"')
+
+
+@tag("integration")
+class IncidentListPageNumberPaginationTests(test.TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.addCleanup(connect_signals)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        StatefulIncidentFactory.create_batch(15)
+        self.user = PersonUserFactory()
+        preferences = ArgusHtmxPreferencesFactory(user=self.user)
+        preferences.preferences["incidents_table_column_name"] = "default"
+        preferences.save()
+
+        self.client.force_login(user=self.user)
+
+    def get(self, **params):
+        return self.client.get(reverse("htmx:incident-list"), {"page_size": 10, "maxlevel": max(Level).value, **params})
+
+    def test_given_a_stale_count_then_the_last_page_is_not_based_on_it(self):
+        self.get(page=1)
+        StatefulIncidentFactory.create_batch(10)
+
+        response = self.get(page=2)
+
+        self.assertEqual(response.context["page"].number, 2)
+        self.assertEqual(response.context["last_page_num"], 3)
+        self.assertEqual(response.context["refresh_info"]["filtered_count"], 25)
+
+    def test_given_a_stale_count_then_a_page_beyond_it_is_shown(self):
+        self.get(page=1)
+        StatefulIncidentFactory.create_batch(10)
+
+        response = self.get(page=3)
+
+        self.assertEqual(response.context["page"].number, 3)
+        self.assertEqual(len(response.context["page"].object_list), 5)
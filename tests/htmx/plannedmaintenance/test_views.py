@@ -347,6 +347,36 @@ class FilterPreviewViewTests(TestCase):
         self.assertIn("total_open", response.context)
         self.assertEqual(response.context["matching_count"], 1)
 
+    def test_when_previewing_a_filter_then_only_open_incidents_are_counted(self):
+        self.client.force_login(self.staff_user)
+        incident = StatefulIncidentFactory()
+        StatefulIncidentFactory(source=incident.source, end_time=timezone.now() - timedelta(hours=1))
+        StatefulIncidentFactory()
+        filter_with_match = FilterFactory(user=self.staff_user, filter={"sourceSystemIds": [incident.source.pk]})
+
+        response = self.client.get(
+            reverse("htmx:plannedmaintenance-filter-preview"),
+            {"filters": [filter_with_match.pk]},
+        )
+
+        self.assertEqual(response.context["total_open"], 2)
+        self.assertEqual(response.context["matching_count"], 1)
+        self.assertEqual(response.context["matching_percent"], 50)
+        self.assertEqual(list(response.context["incident_list"]), [incident])
+
+    def test_given_an_empty_filter_then_the_preview_matches_nothing(self):
+        self.client.force_login(self.staff_user)
+        StatefulIncidentFactory()
+        empty_filter = FilterFactory(user=self.staff_user, filter={})
+
+        response = self.client.get(
+            reverse("htmx:plannedmaintenance-filter-preview"),
+            {"filters": [empty_filter.pk]},
+        )
+
+        self.assertEqual(response.context["total_open"], 1)
+        self.assertEqual(response.context["matching_count"], 0)
+
     def test_filter_preview_with_no_matching_incidents(self):
         self.client.force_login(self.staff_user)
         # Create an open incident
@@ -54,6 +54,8 @@ class BulkIncidentsTests(TestCase):
             stderr=None,
         )
 
+        self.incident.refresh_from_db()
+
         self.assertTrue(self.incident.acked)
 
     def test_bulk_incidents_will_bulk_ack_filtered_incidents_with_set_expiration(self):
@@ -68,6 +70,8 @@ class BulkIncidentsTests(TestCase):
             stderr=None,
         )
 
+        self.incident.refresh_from_db()
+
         self.assertTrue(self.incident.acked)
         self.assertEqual(str(self.incident.acks.first().expiration), expiration)
 
@@ -81,6 +85,8 @@ class BulkIncidentsTests(TestCase):
             stderr=None,
         )
 
+        self.incident.refresh_from_db()
+
         self.assertFalse(self.incident.acked)
 
     def test_bulk_incidents_will_bulk_close_filtered_incidents(self):
@@ -0,0 +1,113 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from argus.incident.ack_expiry import EXPIRED_DESCRIPTION, process_expired_acks
+from argus.incident.factories import AcknowledgementFactory, EventFactory, StatefulIncidentFactory
+from argus.incident.models import Acknowledgement, Event
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+@tag("database")
+class ProcessExpiredAcksTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.now = timezone.now()
+        self.incident = StatefulIncidentFactory()
+
+    def tearDown(self):
+        connect_signals()
+
+    def ack(self, expiration, incident=None):
+        incident = incident or self.incident
+        event = EventFactory(incident=incident, type=Event.Type.ACKNOWLEDGE, timestamp=self.now - timedelta(hours=1))
+        return AcknowledgementFactory(event=event, expiration=expiration)
+
+    def expired_events(self, incident=None):
+        incident = incident or self.incident
+        return incident.events.filter(type=Event.Type.OTHER, description=EXPIRED_DESCRIPTION)
+
+    def test_event_is_added_when_the_last_acknowledgement_expires(self):
+        ack = self.ack(self.now + timedelta(minutes=5))
+        self.assertEqual(process_expired_acks(now=self.now), [])
+
+        later = self.now + timedelta(minutes=10)
+        events = process_expired_acks(now=later)
+        self.assertEqual(events, list(self.expired_events()))
+        self.assertEqual(events[0].timestamp, ack.expiration)
+        ack.refresh_from_db()
+        self.assertTrue(ack.expiry_processed)
+
+    def test_when_processed_again_then_the_expiry_is_not_repeated(self):
+        self.ack(self.now + timedelta(minutes=5))
+        later = self.now + timedelta(minutes=10)
+        process_expired_acks(now=later)
+        self.assertEqual(process_expired_acks(now=later), [])
+        self.assertEqual(self.expired_events().count(), 1)
+
+    def test_given_another_acknowledgement_in_effect_then_no_event_is_added(self):
+        self.ack(self.now + timedelta(minutes=5))
+        self.ack(None)
+        self.assertEqual(process_expired_acks(now=self.now + timedelta(minutes=10)), [])
+        self.assertFalse(Acknowledgement.objects.expiry_due(self.now + timedelta(minutes=10)).exists())
+
+    def test_when_an_expired_acknowledgement_is_extended_then_it_is_processed_again(self):
+        ack = self.ack(self.now + timedelta(minutes=5))
+        process_expired_acks(now=self.now + timedelta(minutes=10))
+        ack.expiration = timezone.now() + timedelta(minutes=30)
+        ack.save()
+        self.assertFalse(ack.expiry_processed)
+
+    def test_expiration_given_as_a_string_is_processed_again(self):
+        ack = self.ack(self.now + timedelta(minutes=5))
+        process_expired_acks(now=self.now + timedelta(minutes=10))
+        ack.expiration = (timezone.now() + timedelta(minutes=30)).isoformat()
+        ack.save()
+        self.assertFalse(ack.expiry_processed)
+
+    def test_given_naive_expiration_string_when_saving_then_it_should_be_processed_again(self):
+        ack = self.ack(self.now + timedelta(minutes=5))
+        process_expired_acks(now=self.now + timedelta(minutes=10))
+        later = timezone.localtime(timezone.now() + timedelta(minutes=30))
+        ack.expiration = later.replace(tzinfo=None).isoformat(sep=" ", timespec="minutes")
+        ack.save()
+        self.assertFalse(ack.expiry_processed)
+        self.assertTrue(timezone.is_aware(ack.expiration))
+
+    def test_given_acks_expiring_at_once_when_processed_in_separate_batches_then_one_event_is_added(self):
+        expiration = self.now + timedelta(minutes=5)
+        self.ack(expiration)
+        self.ack(expiration)
+        events = process_expired_acks(now=self.now + timedelta(minutes=10), batch_size=1)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(self.expired_events().count(), 1)
+
+    def test_given_incident_acked_again_when_the_new_ack_expires_then_another_event_is_added(self):
+        self.ack(self.now + timedelta(minutes=5))
+        process_expired_acks(now=self.now + timedelta(minutes=10))
+        self.ack(self.now + timedelta(minutes=20))
+        process_expired_acks(now=self.now + timedelta(minutes=30))
+        self.assertEqual(self.expired_events().count(), 2)
+
+    def test_given_more_acks_than_a_batch_then_all_batches_are_processed(self):
+        incidents = [StatefulIncidentFactory() for _ in range(5)]
+        for incident in incidents:
+            self.ack(self.now + timedelta(minutes=5), incident=incident)
+        events = process_expired_acks(now=self.now + timedelta(minutes=10), batch_size=2)
+        self.assertEqual({event.incident for event in events}, set(incidents))
+
+    @patch("argus.incident.ack_expiry.schedule_ack_expiry_processing")
+    def test_when_saving_an_expiring_acknowledgement_then_processing_is_scheduled(self, schedule):
+        ack = self.ack(self.now + timedelta(minutes=5))
+        schedule.assert_called_once_with(ack.expiration)
+
+    def test_when_running_the_management_command_then_expired_acks_are_processed(self):
+        self.ack(self.now - timedelta(minutes=5))
+        out = StringIO()
+        call_command("process_expired_acks", verbosity=2, stdout=out)
+        self.assertEqual(self.expired_events().count(), 1)
+        self.assertIn("1 incidents are no longer acked", out.getvalue())
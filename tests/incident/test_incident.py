@@ -1,4 +1,5 @@
 from datetime import timedelta
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.utils import timezone
@@ -11,7 +12,7 @@ from argus.incident.factories import (
     create_fake_incident,
     create_fake_source,
 )
-from argus.incident.models import HEARTBEAT_TAG, SOURCE_TAG_KEY, Event
+from argus.incident.models import HEARTBEAT_TAG, SOURCE_TAG_KEY, Acknowledgement, Event, Incident
 from argus.incident.factories import SourceSystemFactory, SourceUserFactory
 from argus.util.testing import disconnect_signals, connect_signals
 
@@ -80,6 +81,52 @@ class IncidentAckedTests(TestCase):
         incident = StatefulIncidentFactory(source=source)
         self.assertFalse(incident.acked)
 
+    def test_when_checking_acked_then_the_database_is_not_queried(self):
+        incident = AcknowledgementFactory().event.incident
+        with self.assertNumQueries(0):
+            self.assertTrue(incident.acked)
+
+    def test_given_many_acknowledgements_then_acked_until_is_the_latest_expiration(self):
+        later = timezone.now() + timedelta(days=3)
+        incident = AcknowledgementFactory(expiration=later).event.incident
+        AcknowledgementFactory(event__incident=incident, expiration=later - timedelta(days=1))
+        incident.refresh_from_db()
+        self.assertEqual(incident.acked_until, later)
+
+    def test_acked_becomes_false_when_acknowledgement_expires_without_writes(self):
+        expiration = timezone.now() + timedelta(minutes=5)
+        incident = AcknowledgementFactory(expiration=expiration).event.incident
+        self.assertTrue(incident.acked)
+        self.assertNotIn(incident, Incident.objects.not_acked())
+        with patch("argus.incident.models.timezone.now", return_value=expiration + timedelta(seconds=1)):
+            self.assertFalse(incident.acked)
+            self.assertIn(incident, Incident.objects.not_acked())
+
+    def test_when_the_expiration_changes_then_acked_is_updated(self):
+        ack = AcknowledgementFactory(expiration=None)
+        ack.expiration = timezone.now() - timedelta(minutes=1)
+        ack.save()
+        self.assertFalse(ack.event.incident.acked)
+        self.assertNotIn(ack.event.incident, Incident.objects.acked())
+
+    def test_when_the_acknowledgement_is_deleted_then_the_incident_is_unacked(self):
+        ack = AcknowledgementFactory(expiration=None)
+        incident = ack.event.incident
+        Acknowledgement.objects.filter(pk=ack.pk).delete()
+        incident.refresh_from_db()
+        self.assertIsNone(incident.acked_until)
+        self.assertFalse(incident.acked)
+
+    def test_when_creating_acks_then_all_incidents_are_acked(self):
+        user = SourceUserFactory()
+        incidents = [StatefulIncidentFactory(), StatefulIncidentFactory()]
+        expiration = timezone.now() + timedelta(days=1)
+        Incident.objects.filter(pk__in=[incident.pk for incident in incidents]).create_acks(user, expiration=expiration)
+        for incident in incidents:
+            incident.refresh_from_db()
+            self.assertEqual(incident.acked_until, expiration)
+            self.assertTrue(incident.acked)
+
 
 class IncidentLevelTests(TestCase):
     def setup(self):
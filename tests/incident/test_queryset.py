@@ -147,6 +147,17 @@ class TestTagQuerySetMethods(TestCase):
         self.assertNotIn(tag3, result)
         self.assertEqual(set((tag1, tag2)), set(result))
 
+    def test_when_getting_or_creating_many_then_existing_tags_are_got_and_missing_ones_created(self):
+        existing = TagFactory(key="foo", value="bar")
+        TagFactory(key="foo", value="baz")
+        TagFactory(key="xux", value="bar")
+        with self.assertNumQueries(1):
+            self.assertEqual(Tag.objects.get_or_create_many([("foo", "bar")]), {("foo", "bar"): existing})
+        result = Tag.objects.get_or_create_many([("foo", "bar"), ("xux", "baz")])
+        self.assertEqual(result[("foo", "bar")], existing)
+        self.assertEqual(result[("xux", "baz")], Tag.objects.get(key="xux", value="baz"))
+        self.assertEqual(len(result), 2)
+
 
 class TestSourceSystemQuerySet(TestCase):
     def setUp(self):
@@ -0,0 +1,124 @@
+from django.test import SimpleTestCase, TestCase, tag
+from django.utils import timezone
+
+from argus.incident.factories import EventFactory, StatefulIncidentFactory
+from argus.incident.models import Event, Incident
+from argus.incident.search import make_search_query
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+@tag("unittest")
+class MakeSearchQueryTests(SimpleTestCase):
+    def test_given_text_without_words_then_there_is_no_query(self):
+        self.assertIsNone(make_search_query(" ' - \\ "))
+
+    def test_given_many_words_then_every_word_is_a_quoted_prefix(self):
+        query = make_search_query("router-1 o'brien")
+        self.assertEqual(query.source_expressions[-1].value, "'router-1':* & 'o':* & 'brien':*")
+
+
+@tag("database")
+class IncidentSearchTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+
+    def tearDown(self):
+        connect_signals()
+
+    def search(self, text):
+        return list(Incident.objects.search(text))
+
+    def test_given_a_prefix_of_description_words_then_the_incident_is_found(self):
+        incident = StatefulIncidentFactory(description="Interface eth0/1 on core-router.example.org is down")
+        StatefulIncidentFactory(description="Something else")
+        self.assertEqual(self.search("inter eth0"), [incident])
+        self.assertEqual(self.search("core-router.example.org"), [incident])
+
+    def test_given_many_words_then_all_must_match(self):
+        StatefulIncidentFactory(description="Link down")
+        self.assertEqual(self.search("link up"), [])
+
+    def test_given_an_event_description_then_the_incident_is_found(self):
+        incident = StatefulIncidentFactory(description="Link down")
+        EventFactory(incident=incident, description="Reported by switch42")
+        self.assertEqual(self.search("switch42"), [incident])
+
+    def test_when_the_description_changes_then_it_is_searchable(self):
+        incident = StatefulIncidentFactory(description="Link down")
+        incident.description = "Power outage"
+        incident.save(update_fields=["description"])
+        self.assertEqual(self.search("power"), [incident])
+
+    def test_when_searching_then_more_relevant_incidents_rank_higher(self):
+        once = StatefulIncidentFactory(description="Disk full on server")
+        often = StatefulIncidentFactory(description="Disk disk disk problems")
+        ranked = Incident.objects.search("disk").order_by("-search_rank")
+        self.assertEqual(list(ranked), [often, once])
+
+    def test_given_text_without_words_then_nothing_is_filtered_out(self):
+        StatefulIncidentFactory()
+        self.assertEqual(Incident.objects.search("--").count(), 1)
+
+
+@tag("database")
+class IncidentSearchDocumentTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.incident = StatefulIncidentFactory(description="Link down")
+
+    def tearDown(self):
+        connect_signals()
+
+    def add_event(self, description):
+        return Event.objects.create(
+            incident=self.incident,
+            actor=self.incident.source.user,
+            timestamp=timezone.now(),
+            type=Event.Type.OTHER,
+            description=description,
+        )
+
+    def test_when_an_event_is_added_then_its_description_is_appended_once(self):
+        self.add_event("flapping")
+        self.add_event("flapping")
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.search_text, " flapping")
+        self.assertEqual(list(Incident.objects.search("flap")), [self.incident])
+
+    def test_when_an_event_is_added_then_the_incident_is_not_read(self):
+        with self.assertNumQueries(2):  # insert event, update incident
+            self.add_event("flapping")
+
+    def test_when_saving_a_stale_incident_then_the_search_document_is_kept(self):
+        stale = Incident.objects.get(pk=self.incident.pk)
+        self.add_event("flapping")
+        stale.level = 1
+        stale.save()
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.search_text, " flapping")
+        self.assertEqual(list(Incident.objects.search("flap")), [self.incident])
+
+    def test_given_an_unchanged_description_then_it_is_not_reindexed(self):
+        incident = Incident.objects.get(pk=self.incident.pk)
+        incident.level = 1
+        with self.assertNumQueries(1):
+            incident.save()
+
+    def test_when_saving_a_partially_loaded_incident_then_only_the_loaded_fields_are_written(self):
+        incident = Incident.objects.only("description").get(pk=self.incident.pk)
+        incident.description = "Link up"
+        with self.assertNumQueries(2):  # update incident, reindex
+            incident.save()
+        self.assertEqual(list(Incident.objects.search("up")), [self.incident])
+
+    def test_when_saving_an_incident_whose_row_is_gone_then_it_is_inserted(self):
+        incident = Incident.objects.get(pk=self.incident.pk)
+        Incident.objects.filter(pk=incident.pk).delete()
+        incident.save()
+        self.assertEqual(list(Incident.objects.search("link")), [incident])
+
+    def test_given_explicitly_named_sql_maintained_fields_then_they_are_written(self):
+        self.incident.search_text = " flapping"
+        self.incident.save(update_fields=["search_text"])
+        self.incident.refresh_from_db()
+        self.assertEqual(self.incident.search_text, " flapping")
@@ -1,9 +1,10 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
-from django.test import Client, tag, TestCase
+from django.test import Client, override_settings, tag, TestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient, APITestCase
@@ -50,6 +51,53 @@ class SourceSystemUpdateLastSeenTests(TestCase):
             self.assertEqual(source.last_seen, testtime)
 
 
+@tag("db")
+class SourceSystemThrottledUpdateLastSeenTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def test_updates_last_seen_when_never_seen(self):
+        source = SourceSystemFactory()
+        self.assertTrue(source.throttled_update_last_seen(self.now))
+        source.refresh_from_db()
+        self.assertEqual(source.last_seen, self.now)
+
+    def test_does_not_write_when_last_seen_is_recent(self):
+        source = SourceSystemFactory(last_seen=self.now - timedelta(seconds=10))
+        with self.assertNumQueries(0):
+            self.assertFalse(source.throttled_update_last_seen(self.now))
+
+    def test_updates_last_seen_when_older_than_the_interval(self):
+        source = SourceSystemFactory(last_seen=self.now - timedelta(minutes=2))
+        self.assertTrue(source.throttled_update_last_seen(self.now))
+        source.refresh_from_db()
+        self.assertEqual(source.last_seen, self.now)
+
+    def test_given_a_stale_copy_then_it_does_not_write_again(self):
+        source = SourceSystemFactory(last_seen=self.now - timedelta(minutes=2))
+        stale = SourceSystem.objects.get(pk=source.pk)
+        source.throttled_update_last_seen(self.now)
+        self.assertFalse(stale.throttled_update_last_seen(self.now + timedelta(seconds=1)))
+
+    def test_given_frequent_heartbeats_then_the_interval_is_shorter(self):
+        source = SourceSystemFactory(heartbeat_frequency=timedelta(minutes=1))
+        self.assertEqual(source.get_last_seen_interval(), timedelta(seconds=15))
+        with override_settings(ARGUS_HEARTBEAT_LAST_SEEN_INTERVAL=5):
+            self.assertEqual(source.get_last_seen_interval(), timedelta(seconds=5))
+
+    def test_when_the_source_makes_api_requests_then_last_seen_is_updated_once(self):
+        source = SourceSystemFactory()
+        client = APIClient()
+        client.force_authenticate(user=source.user)
+        client.get(reverse("v2:incident:incident-list"))
+        source.refresh_from_db()
+        last_seen = source.last_seen
+        self.assertIsNotNone(last_seen)
+        client.get(reverse("v2:incident:incident-list"))
+        source.refresh_from_db()
+        self.assertEqual(source.last_seen, last_seen)
+
+
 class SourceSystemIsDeadTests(TestCase):
     def test_when_heartbeat_frequency_not_set_always_returns_None(self):
         source = SourceSystemFactory(heartbeat_frequency=None)
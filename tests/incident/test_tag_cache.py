@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings, tag
+
+from argus.incident.factories import TagFactory
+from argus.incident.models import Tag
+from argus.incident.tag_cache import GENERATION_CACHE_KEY, TagCache, get_tag_cache, invalidate_tag_cache
+
+
+@tag("unittest")
+class TagCacheTests(SimpleTestCase):
+    def test_when_full_then_the_least_recently_used_tags_are_dropped_first(self):
+        tags = TagCache(size=2)
+        tags.set_many({("a", "1"): 1, ("b", "2"): 2})
+        tags.get_many([("a", "1")])
+        tags.set_many({("c", "3"): 3})
+        self.assertEqual(tags.get_many([("a", "1"), ("b", "2"), ("c", "3")]), {("a", "1"): 1, ("c", "3"): 3})
+
+    def test_when_used_from_many_threads_then_the_size_is_kept(self):
+        tags = TagCache(size=10)
+
+        def use(n):
+            for i in range(200):
+                pair = (str(n), str(i % 20))
+                tags.set_many({pair: i})
+                tags.get_many([pair, (str(n + 1), str(i % 20))])
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(use, range(8)))
+        self.assertEqual(len(tags), 10)
+
+
+@tag("database")
+class TagQuerySetGetOrCreateManyCachingTests(TestCase):
+    def setUp(self):
+        invalidate_tag_cache()
+
+    def tearDown(self):
+        invalidate_tag_cache()
+
+    def test_when_committed_then_the_tags_are_remembered(self):
+        existing = TagFactory(key="host", value="example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.get_or_create_many([("host", "example.com"), ("problem_type", "down")])
+        with self.assertNumQueries(0):
+            tags = Tag.objects.get_or_create_many([("host", "example.com"), ("problem_type", "down")])
+        self.assertEqual(tags[("host", "example.com")], existing)
+        self.assertEqual(tags[("problem_type", "down")], Tag.objects.get(key="problem_type"))
+
+    def test_given_no_commit_then_the_tags_are_not_remembered(self):
+        Tag.objects.get_or_create_many([("host", "example.com")])
+        self.assertEqual(len(get_tag_cache()), 0)
+
+    def test_when_a_tag_is_deleted_then_it_is_forgotten(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = Tag.objects.create_from_tag("host=example.com")
+        tag.delete()
+        new_tag = Tag.objects.create_from_tag("host=example.com")
+        self.assertNotEqual(new_tag.pk, tag.pk)
+        self.assertTrue(Tag.objects.filter(pk=new_tag.pk).exists())
+
+    def test_when_a_tag_is_deleted_then_other_processes_are_told_only_on_commit(self):
+        generation = cache.get(GENERATION_CACHE_KEY)
+        with self.captureOnCommitCallbacks() as callbacks:
+            TagFactory().delete()
+        self.assertEqual(cache.get(GENERATION_CACHE_KEY), generation)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache.get(GENERATION_CACHE_KEY), generation)
+
+    @override_settings(ARGUS_TAG_CACHE_SIZE=0)
+    def test_given_a_size_of_zero_then_tags_are_not_cached(self):
+        self.assertIsNone(get_tag_cache())
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.get_or_create_many([("host", "example.com")])
+        with self.assertNumQueries(1):
+            Tag.objects.get_or_create_many([("host", "example.com")])
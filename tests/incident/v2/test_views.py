@@ -1,5 +1,8 @@
 import datetime
+import json
+from unittest.mock import Mock, patch
 
+from django.db import IntegrityError
 from django.urls import reverse
 from django.utils.timezone import now
 from django.test import TestCase, RequestFactory, override_settings, tag
@@ -33,6 +36,7 @@ from argus.incident.models import (
     SourceSystemType,
     Tag,
 )
+from argus.incident.signals import incidents_created_in_bulk
 from argus.incident.v2.views import EventViewSet
 from argus.notificationprofile.models import Filter
 from argus.util.testing import disconnect_signals, connect_signals
@@ -265,6 +269,19 @@ class IncidentViewSetTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response_pks, set([incident_pk1, incident_pk2]))
 
+    def test_when_searching_fulltext_then_incidents_are_ordered_by_relevance(self):
+        incident_pk1 = self.add_open_incident_with_start_event_and_tag(description="switch down").pk
+        incident_pk2 = self.add_open_incident_with_start_event_and_tag(description="switch and switch").pk
+        self.add_open_incident_with_start_event_and_tag(description="router down")
+        self.add_event(incident_pk=incident_pk1, description="switch again")
+        self.add_event(incident_pk=incident_pk2, description="switch and switch again")
+        response = self.client.get(path=f"{API_PATH}/?fulltext=swi&page_size=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["pk"], incident_pk2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"][0]["pk"], incident_pk1)
+        self.assertIsNone(response.data["next"])
+
     def test_can_get_specific_incident(self):
         incident_pk = self.add_open_incident_with_start_event_and_tag().pk
         response = self.client.get(path=f"{API_PATH}/{incident_pk}/")
@@ -1077,3 +1094,181 @@ class BulkTicketUrlViewSetTestCase(APITestCase):
 
         incident_1.refresh_from_db()
         self.assertEqual(incident_1.ticket_url, data["ticket_url"])
+
+
+class BulkIncidentViewSetTestCase(APITestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.user = SourceUserFactory()
+        self.source = SourceSystemFactory(user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        connect_signals()
+
+    def incident_data(self, source_incident_id, **kwargs):
+        data = {
+            "start_time": "2022-08-02T13:04:03.529Z",
+            "end_time": "infinity",
+            "source_incident_id": source_incident_id,
+            "description": f"incident {source_incident_id}",
+            "tags": [{"tag": "host=example.com"}, {"tag": f"id={source_incident_id}"}],
+        }
+        data.update(kwargs)
+        return data
+
+    def test_when_bulk_creating_then_incidents_get_tags_and_first_events(self):
+        data = [self.incident_data("1"), self.incident_data("2", end_time=None)]
+
+        response = self.client.post(path=f"{API_PATH}/bulk/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["changes"]["0"]["status"], status.HTTP_201_CREATED)
+        pk = response.data["changes"]["0"]["incident"]["pk"]
+        incident = Incident.objects.get(pk=pk)
+        self.assertEqual(incident.source, self.source)
+        self.assertTrue(incident.open)
+        self.assertEqual({str(tag) for tag in incident.deprecated_tags}, {"host=example.com", "id=1"})
+        self.assertEqual(incident.start_event.description, "incident 1")
+        self.assertIn(incident, Incident.objects.search("incident"))
+        stateless = Incident.objects.get(pk=response.data["changes"]["1"]["incident"]["pk"])
+        self.assertTrue(stateless.stateless_event)
+        self.assertEqual(Tag.objects.filter(key="host").count(), 1)
+
+    def test_given_newline_delimited_json_then_incidents_are_bulk_created(self):
+        body = "\n".join(json.dumps(self.incident_data(str(i))) for i in range(3))
+
+        response = self.client.post(path=f"{API_PATH}/bulk/", data=body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.source.incidents.count(), 3)
+
+    def test_given_invalid_and_duplicate_incidents_then_they_are_reported_per_item(self):
+        StatefulIncidentFactory(source=self.source, source_incident_id="1")
+        data = [
+            self.incident_data("1"),
+            self.incident_data("2"),
+            self.incident_data("2"),
+            self.incident_data("3", start_time="not a timestamp"),
+        ]
+
+        response = self.client.post(path=f"{API_PATH}/bulk/", data=data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        changes = response.data["changes"]
+        self.assertEqual(
+            [changes[str(position)]["status"] for position in range(4)],
+            [
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_201_CREATED,
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_400_BAD_REQUEST,
+            ],
+        )
+        self.assertIn("source_incident_id", changes["0"]["errors"])
+        self.assertIn("start_time", changes["3"]["errors"])
+        self.assertEqual(self.source.incidents.count(), 2)
+
+    def test_given_only_invalid_incidents_then_it_is_a_bad_request(self):
+        response = self.client.post(path=f"{API_PATH}/bulk/", data=[{"description": "x"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_when_bulk_creating_then_the_incidents_are_signalled_once(self):
+        receiver = Mock()
+        incidents_created_in_bulk.connect(receiver)
+        self.addCleanup(incidents_created_in_bulk.disconnect, receiver)
+        data = [self.incident_data(str(i)) for i in range(3)]
+
+        self.client.post(path=f"{API_PATH}/bulk/", data=data, format="json")
+
+        receiver.assert_called_once()
+        self.assertEqual(len(receiver.call_args.kwargs["events"]), 3)
+        self.assertEqual(len(receiver.call_args.kwargs["incidents"]), 3)
+
+
+class IncidentUpsertTestCase(APITestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.user = SourceUserFactory()
+        self.source = SourceSystemFactory(user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("v2:incident:incident-upsert")
+        self.data = {
+            "start_time": "2022-08-02T13:04:03.529Z",
+            "source_incident_id": "1",
+            "description": "Link down",
+            "level": 3,
+            "tags": [{"tag": "host=example.com"}],
+        }
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_given_an_unknown_source_incident_id_then_a_new_incident_is_created(self):
+        response = self.client.post(self.url, data=self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        incident = Incident.objects.get(pk=response.data["pk"])
+        self.assertEqual(incident.source_incident_id, "1")
+        self.assertTrue(incident.open)
+        self.assertTrue(incident.start_event)
+
+    def test_when_posting_the_same_incident_again_then_nothing_changes(self):
+        self.client.post(self.url, data=self.data, format="json")
+        response = self.client.post(self.url, data=self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incident = Incident.objects.get()
+        self.assertEqual(incident.events.count(), 1)
+
+    def test_when_an_existing_incident_changes_then_the_changes_are_recorded_as_events(self):
+        self.client.post(self.url, data=self.data, format="json")
+        self.data.update(level=1, description="Link flapping", tags=[{"tag": "host=example.org"}])
+
+        response = self.client.post(self.url, data=self.data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        incident = Incident.objects.get()
+        self.assertEqual(incident.level, 1)
+        self.assertEqual(incident.description, "Link flapping")
+        self.assertEqual([str(tag) for tag in incident.deprecated_tags], ["host=example.org"])
+        self.assertEqual(incident.events.filter(type=Event.Type.INCIDENT_CHANGE).count(), 3)
+        self.assertEqual(list(Incident.objects.search("flapping")), [incident])
+
+    def test_given_tags_added_by_others_then_they_are_kept(self):
+        self.client.post(self.url, data=self.data, format="json")
+        incident = Incident.objects.get()
+        IncidentTagRelationFactory(incident=incident, tag=TagFactory(key="customer", value="x"))
+
+        self.client.post(self.url, data=self.data, format="json")
+
+        self.assertEqual({str(tag) for tag in incident.deprecated_tags}, {"host=example.com", "customer=x"})
+        self.assertFalse(incident.events.filter(type=Event.Type.INCIDENT_CHANGE).exists())
+
+    def test_when_end_time_is_set_then_it_ends_and_infinity_restarts_the_incident(self):
+        self.client.post(self.url, data=self.data, format="json")
+        incident = Incident.objects.get()
+
+        self.client.post(self.url, data={**self.data, "end_time": "2022-08-02T14:00:00Z"}, format="json")
+        incident.refresh_from_db()
+        self.assertFalse(incident.open)
+        self.assertTrue(incident.events.filter(type=Event.Type.INCIDENT_END).exists())
+
+        self.client.post(self.url, data={**self.data, "end_time": "infinity"}, format="json")
+        incident.refresh_from_db()
+        self.assertTrue(incident.open)
+        self.assertTrue(incident.events.filter(type=Event.Type.INCIDENT_RESTART).exists())
+
+    def test_given_no_source_incident_id_then_it_is_a_bad_request(self):
+        del self.data["source_incident_id"]
+        response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("source_incident_id", response.data)
+
+    def test_given_other_integrity_errors_then_they_are_bad_requests(self):
+        with patch(
+            "argus.incident.v2.serializers.IncidentSerializer.create", side_effect=IntegrityError("violates constraint")
+        ):
+            response = self.client.post(self.url, data=self.data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Incident.objects.exists())
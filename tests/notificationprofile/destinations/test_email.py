@@ -1,11 +1,16 @@
-from django.test import TestCase, tag
+import smtplib
+from unittest.mock import Mock, patch
+
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection
+from django.test import TestCase, override_settings, tag
 from rest_framework import status
 from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 
 from argus.auth.factories import PersonUserFactory
 from argus.incident.factories import EventFactory, IncidentFactory
 from argus.notificationprofile.factories import DestinationConfigFactory, NotificationProfileFactory, TimeslotFactory
-from argus.notificationprofile.media.email import EmailNotification
+from argus.notificationprofile.media.email import EmailNotification, close_email_connection, send_email_messages
 from argus.notificationprofile.models import DestinationConfig, Media
 from argus.notificationprofile.v2.serializers import RequestDestinationConfigSerializer
 from argus.util.testing import connect_signals, disconnect_signals
@@ -1106,3 +1111,74 @@ class EmailDestinationSendTests(TestCase):
 
         self.assertIn(email_address, email_addresses)
         self.assertNotIn(phone_number, email_addresses)
+
+
+@tag("unittest")
+@override_settings(SEND_NOTIFICATIONS=True)
+class EmailConnectionReuseTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        close_email_connection()
+        self.messages = [EmailMessage(subject="subject", body="body", to=[f"{i}@example.com"]) for i in range(2)]
+
+    def tearDown(self):
+        close_email_connection()
+        connect_signals()
+
+    def test_when_sending_many_emails_then_one_connection_is_opened(self):
+        user = PersonUserFactory()
+        destinations = [user.destinations.get()]
+        destinations.extend(
+            DestinationConfigFactory(
+                user=user,
+                media=Media.objects.get(slug="email"),
+                settings={"email_address": f"extra{i}@example.com"},
+                managed=False,
+            )
+            for i in range(2)
+        )
+        events = [EventFactory(incident=IncidentFactory()) for _ in range(2)]
+        with patch("argus.notificationprofile.media.email.get_connection", wraps=get_connection) as connect:
+            for event in events:
+                self.assertTrue(EmailNotification.send(event, destinations))
+        connect.assert_called_once()
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertTrue(mail.outbox[0].alternatives)
+
+    def test_when_the_connection_drops_then_it_is_reopened_and_sending_continues(self):
+        connection = Mock()
+        connection.send_messages.side_effect = [1, smtplib.SMTPServerDisconnected(), 1]
+        with patch("argus.notificationprofile.media.email.get_connection", return_value=connection) as connect:
+            self.assertEqual(send_email_messages(self.messages), [True, True])
+        self.assertEqual(connect.call_count, 2)
+        connection.close.assert_called_once()
+        self.assertEqual(connection.send_messages.call_count, 3)
+
+    def test_given_separate_drops_when_sending_then_it_should_reconnect_for_each_message(self):
+        self.messages.append(EmailMessage(subject="subject", body="body", to=["2@example.com"]))
+        connection = Mock()
+        connection.send_messages.side_effect = [1, smtplib.SMTPServerDisconnected(), 1, ConnectionResetError(), 1]
+        with patch("argus.notificationprofile.media.email.get_connection", return_value=connection):
+            self.assertEqual(send_email_messages(self.messages), [True, True, True])
+
+    def test_given_sent_messages_when_reconnecting_fails_then_the_rest_are_not_sent(self):
+        connection = Mock()
+        connection.send_messages.side_effect = [1, smtplib.SMTPServerDisconnected(), smtplib.SMTPServerDisconnected()]
+        with patch("argus.notificationprofile.media.email.get_connection", return_value=connection):
+            with self.assertLogs("argus.notificationprofile.media.email", level="ERROR"):
+                self.assertEqual(send_email_messages(self.messages), [True, False])
+
+    def test_given_sent_messages_when_the_server_refuses_to_reconnect_then_the_rest_are_not_sent(self):
+        connection = Mock()
+        connection.send_messages.side_effect = [1, smtplib.SMTPServerDisconnected()]
+        connection.open.side_effect = [None, None, ConnectionRefusedError()]
+        with patch("argus.notificationprofile.media.email.get_connection", return_value=connection):
+            with self.assertLogs("argus.notificationprofile.media.email", level="ERROR"):
+                self.assertEqual(send_email_messages(self.messages), [True, False])
+
+    def test_when_the_same_message_drops_the_connection_twice_then_it_is_reopened_only_once(self):
+        connection = Mock()
+        connection.send_messages.side_effect = smtplib.SMTPServerDisconnected()
+        with patch("argus.notificationprofile.media.email.get_connection", return_value=connection):
+            with self.assertRaises(smtplib.SMTPServerDisconnected):
+                send_email_messages(self.messages)
@@ -0,0 +1,37 @@
+import threading
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, tag
+
+from argus.notificationprofile.coalesce import Coalescer
+
+
+@tag("unittest")
+class CoalescerTests(SimpleTestCase):
+    def test_when_flushing_then_the_items_are_flushed_together(self):
+        flush = Mock()
+        coalescer = Coalescer(flush)
+        coalescer.add(1, window=60)
+        coalescer.add(2, window=60)
+        self.assertEqual(len(coalescer), 2)
+        coalescer.flush()
+        flush.assert_called_once_with([1, 2])
+        self.assertEqual(len(coalescer), 0)
+
+    def test_given_no_items_then_flush_does_nothing(self):
+        flush = Mock()
+        Coalescer(flush).flush()
+        flush.assert_not_called()
+
+    def test_items_are_flushed_when_the_window_runs_out(self):
+        flushed = threading.Event()
+        batches = []
+
+        def flush(items):
+            batches.append(items)
+            flushed.set()
+
+        coalescer = Coalescer(flush)
+        coalescer.add(1, window=0.01)
+        self.assertTrue(flushed.wait(timeout=5))
+        self.assertEqual(batches, [[1]])
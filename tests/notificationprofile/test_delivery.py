@@ -0,0 +1,114 @@
+import threading
+import time
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase, override_settings, tag
+
+from argus.notificationprofile.media.base import NotificationMedium
+from argus.notificationprofile.media.delivery import deliver, get_delivery_config, get_stuck_workers
+
+
+class RecordingMedium(NotificationMedium):
+    MEDIA_SLUG = "recording"
+    sent_from = []
+
+    @classmethod
+    def send(cls, event, destinations, **_):
+        cls.sent_from.append(threading.current_thread().name)
+        return True
+
+
+class SlowMedium(NotificationMedium):
+    MEDIA_SLUG = "slow"
+
+    @classmethod
+    def send(cls, event, destinations, **_):
+        time.sleep(0.5)
+        return True
+
+
+class BlockedMedium(NotificationMedium):
+    MEDIA_SLUG = "blocked"
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    @classmethod
+    def send(cls, event, destinations, **_):
+        cls.started.release()
+        cls.release.wait(timeout=5)
+        return True
+
+
+class BrokenMedium(NotificationMedium):
+    MEDIA_SLUG = "broken"
+
+    @classmethod
+    def send(cls, event, destinations, **_):
+        raise ValueError("broken")
+
+
+def make_destinations(medium, count):
+    return [Mock(pk=pk, media_id=medium.MEDIA_SLUG) for pk in range(count)]
+
+
+@tag("unittest")
+class DeliverTests(SimpleTestCase):
+    def setUp(self):
+        RecordingMedium.sent_from = []
+        self.event = Mock(pk=1)
+
+    def test_given_media_without_config_then_they_send_serially_in_the_calling_thread(self):
+        results = deliver([(RecordingMedium, self.event, make_destinations(RecordingMedium, 3))])
+        self.assertEqual(results, [True])
+        self.assertEqual(RecordingMedium.sent_from, [threading.current_thread().name])
+
+    @override_settings(ARGUS_NOTIFICATION_CONCURRENT_DELIVERY={"recording": {"max_concurrency": 2}})
+    def test_given_media_with_config_then_they_send_to_each_destination_in_the_pool(self):
+        results = deliver([(RecordingMedium, self.event, make_destinations(RecordingMedium, 3))])
+        self.assertEqual(results, [True])
+        self.assertEqual(len(RecordingMedium.sent_from), 3)
+        for thread_name in RecordingMedium.sent_from:
+            self.assertTrue(thread_name.startswith("argus-notify-recording"))
+
+    @override_settings(ARGUS_NOTIFICATION_CONCURRENT_DELIVERY={"slow": {"timeout": 0.05}})
+    def test_given_a_slow_medium_then_it_times_out_without_holding_up_other_media(self):
+        with self.assertLogs("argus.notificationprofile.media.delivery", level="ERROR"):
+            results = deliver(
+                [
+                    (SlowMedium, self.event, make_destinations(SlowMedium, 1)),
+                    (RecordingMedium, self.event, make_destinations(RecordingMedium, 1)),
+                ]
+            )
+        self.assertEqual(results, [False, True])
+
+    @override_settings(ARGUS_NOTIFICATION_CONCURRENT_DELIVERY={"blocked": {"max_concurrency": 1, "timeout": 0.05}})
+    def test_when_sends_still_run_after_the_timeout_then_they_are_counted_as_stuck(self):
+        BlockedMedium.release.clear()
+        self.addCleanup(BlockedMedium.release.set)
+        with self.assertLogs("argus.notificationprofile.media.delivery", level="ERROR") as cm:
+            results = deliver([(BlockedMedium, self.event, make_destinations(BlockedMedium, 2))])
+        self.assertEqual(results, [False])
+        # The second destination was still queued, and is cancelled
+        self.assertTrue(BlockedMedium.started.acquire(timeout=5))
+        self.assertFalse(BlockedMedium.started.acquire(timeout=0.1))
+        self.assertEqual(get_stuck_workers("blocked"), 1)
+        self.assertTrue(any("1 of 1 threads" in line for line in cm.output))
+
+        with self.assertLogs("argus.notificationprofile.media.delivery", level="WARNING"):
+            BlockedMedium.release.set()
+            deadline = time.monotonic() + 5
+            while get_stuck_workers("blocked") and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(get_stuck_workers("blocked"), 0)
+
+    @override_settings(ARGUS_NOTIFICATION_CONCURRENT_DELIVERY={"broken": {}})
+    def test_when_a_send_fails_then_it_is_logged_and_reported_as_not_sent(self):
+        with self.assertLogs("argus.notificationprofile.media.delivery", level="ERROR") as cm:
+            results = deliver([(BrokenMedium, self.event, make_destinations(BrokenMedium, 1))])
+        self.assertEqual(results, [False])
+        self.assertIn("broken", cm.output[0])
+
+    @override_settings(ARGUS_NOTIFICATION_CONCURRENT_DELIVERY={"slow": {}})
+    def test_given_missing_config_then_it_is_defaulted(self):
+        self.assertEqual(get_delivery_config("slow"), {"max_concurrency": 4, "timeout": 30})
+        self.assertIsNone(get_delivery_config("recording"))
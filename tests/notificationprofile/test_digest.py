@@ -0,0 +1,167 @@
+from datetime import timedelta
+import threading
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, tag
+from django.utils.timezone import now as tznow
+
+from argus.auth.factories import PersonUserFactory
+from argus.incident.factories import EventFactory, IncidentFactory
+from argus.notificationprofile.digest import get_digest_config, hold_back_for_digest, pop_pending_events
+from argus.notificationprofile.factories import DestinationConfigFactory
+from argus.notificationprofile.media import send_notification
+from argus.notificationprofile.media.email import EmailNotification
+from argus.notificationprofile.media.sms_as_email import SMSNotification
+from argus.notificationprofile.models import Media, PendingNotification
+from argus.notificationprofile.tasks import task_send_digest
+from argus.util.testing import connect_signals, disconnect_signals
+
+DIGEST_CONFIG = {"max_per_minute": 1, "window": 60}
+
+
+@tag("unittest")
+class GetDigestConfigTests(TestCase):
+    def test_given_media_without_digest_settings_then_they_have_no_config(self):
+        with override_settings(ARGUS_NOTIFICATION_DIGESTS={}):
+            self.assertIsNone(get_digest_config("email"))
+
+    def test_given_missing_digest_settings_then_they_are_defaulted(self):
+        with override_settings(ARGUS_NOTIFICATION_DIGESTS={"sms": {}}):
+            self.assertEqual(get_digest_config("sms"), {"max_per_minute": 1, "window": 300})
+
+
+@tag("unittest")
+class HoldBackForDigestTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        cache.clear()
+        self.user = PersonUserFactory()
+        self.destination = self.user.destinations.get()  # default email
+        self.incident = IncidentFactory()
+        self.events = [
+            EventFactory(incident=self.incident, timestamp=tznow() - timedelta(minutes=minutes))
+            for minutes in (1, 2, 3)
+        ]
+
+    def tearDown(self):
+        connect_signals()
+
+    @patch("argus.notificationprofile.digest._schedule_digest")
+    def test_given_messages_below_the_cap_then_they_are_sent_at_once(self, schedule):
+        self.assertEqual(hold_back_for_digest(self.events[0], [self.destination], DIGEST_CONFIG), [self.destination])
+        self.assertFalse(PendingNotification.objects.exists())
+        schedule.assert_not_called()
+
+    @patch("argus.notificationprofile.digest._schedule_digest")
+    def test_given_messages_above_the_cap_then_they_are_held_back_and_a_digest_is_scheduled_once(self, schedule):
+        results = [hold_back_for_digest(event, [self.destination], DIGEST_CONFIG) for event in self.events]
+        self.assertEqual(results, [[self.destination], [], []])
+        self.assertEqual(PendingNotification.objects.filter(destination=self.destination).count(), 2)
+        schedule.assert_called_once_with(self.destination, DIGEST_CONFIG["window"])
+
+    def test_when_popping_pending_events_then_the_oldest_come_first_and_are_forgotten(self):
+        for event in self.events:
+            PendingNotification.objects.create(destination=self.destination, event=event)
+        self.assertEqual(pop_pending_events(self.destination), self.events[::-1])
+        self.assertEqual(pop_pending_events(self.destination), [])
+
+
+@tag("integration")
+class HoldBackDuringDigestTests(TransactionTestCase):
+    def setUp(self):
+        disconnect_signals()
+        cache.clear()
+        self.destination = PersonUserFactory().destinations.get()  # default email
+        incident = IncidentFactory()
+        self.events = [EventFactory(incident=incident) for _ in range(2)]
+        PendingNotification.objects.create(destination=self.destination, event=self.events[0])
+
+    def tearDown(self):
+        connect_signals()
+
+    def hold_back(self, event):
+        try:
+            hold_back_for_digest(event, [self.destination], {"max_per_minute": 0, "window": 60})
+        finally:
+            connection.close()
+
+    @patch("argus.notificationprofile.digest._schedule_digest")
+    def test_when_digest_pops_while_an_event_is_held_back_then_a_new_digest_is_scheduled(self, schedule):
+        with transaction.atomic():
+            self.assertEqual(pop_pending_events(self.destination), [self.events[0]])
+            sender = threading.Thread(target=self.hold_back, args=(self.events[1],))
+            sender.start()
+            sender.join(timeout=0.5)
+            # Waits for the digest to finish popping
+            self.assertTrue(sender.is_alive())
+        sender.join(timeout=5)
+
+        self.assertFalse(sender.is_alive())
+        schedule.assert_called_once_with(self.destination, 60)
+        self.assertEqual(list(PendingNotification.objects.values_list("event", flat=True)), [self.events[1].pk])
+
+
+@tag("integration")
+@override_settings(
+    SEND_NOTIFICATIONS=True,
+    ARGUS_NOTIFICATION_DIGESTS={"email": DIGEST_CONFIG},
+)
+class DigestDeliveryTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        cache.clear()
+        self.user = PersonUserFactory()
+        self.destination = self.user.destinations.get()  # default email
+        self.incident = IncidentFactory()
+        self.events = [EventFactory(incident=self.incident) for _ in range(3)]
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_given_a_storm_then_it_is_sent_as_one_message_and_one_digest(self):
+        for event in self.events:
+            send_notification([self.destination], event)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(PendingNotification.objects.count(), 2)
+
+        task_send_digest.func(self.destination.pk)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("2 events", mail.outbox[1].subject)
+        self.assertFalse(PendingNotification.objects.exists())
+
+    def test_given_no_pending_events_then_the_digest_task_sends_nothing(self):
+        task_send_digest.func(self.destination.pk)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@tag("unittest")
+@override_settings(SEND_NOTIFICATIONS=True, SMS_GATEWAY_ADDRESS="sms@example.com")
+class MediumSendDigestTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.user = PersonUserFactory()
+        self.incident = IncidentFactory()
+        self.events = [EventFactory(incident=self.incident) for _ in range(2)]
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_when_sending_an_email_digest_then_it_is_one_email_listing_all_events(self):
+        destination = self.user.destinations.get()  # default email
+        self.assertTrue(EmailNotification.send_digest(self.events, [destination]))
+        self.assertEqual(len(mail.outbox), 1)
+        for event in self.events:
+            self.assertIn(str(event), mail.outbox[0].body)
+
+    def test_when_sending_an_sms_digest_then_it_is_one_sms_listing_all_events(self):
+        destination = DestinationConfigFactory(
+            user=self.user,
+            media=Media.objects.get_or_create(slug="sms")[0],
+            settings={"phone_number": "+4747474747"},
+        )
+        self.assertTrue(SMSNotification.send_digest(self.events, [destination]))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(mail.outbox[0].body.startswith("2 events:"))
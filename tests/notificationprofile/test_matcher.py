@@ -0,0 +1,174 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings, tag
+from django.utils.timezone import now as tznow
+
+from argus.auth.factories import PersonUserFactory
+from argus.filter.factories import FilterFactory
+from argus.incident.factories import SourceSystemFactory, StatefulIncidentFactory, TagFactory
+from argus.incident.models import Event, Incident
+from argus.notificationprofile.factories import NotificationProfileFactory
+from argus.notificationprofile.matcher import (
+    GENERATION_CACHE_KEY,
+    NotificationProfileIndex,
+    NotificationProfileMatcher,
+    get_notification_profile_matcher,
+    invalidate_notification_profile_matcher,
+)
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+def get_matching_incident(incident):
+    return (
+        Incident.objects.select_related("source__type")
+        .prefetch_related("incident_tag_relations__tag")
+        .get(pk=incident.pk)
+    )
+
+
+@tag("unittest")
+class NotificationProfileMatcherTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.source = SourceSystemFactory()
+        self.incident = StatefulIncidentFactory(start_time=tznow(), source=self.source)
+        self.incident.create_first_event()
+        self.event = self.incident.events.get(type=Event.Type.INCIDENT_START)
+        self.user = PersonUserFactory()
+        self.destination = self.user.destinations.get()  # default email
+        self.profile = NotificationProfileFactory(user=self.user, timeslot=self.user.timeslots.first(), active=True)
+        self.profile.destinations.add(self.destination)
+        filter_ = FilterFactory(user=self.user, filter={"sourceSystemIds": [self.source.id]})
+        self.profile.filters.add(filter_)
+
+    def tearDown(self):
+        connect_signals()
+        invalidate_notification_profile_matcher()
+
+    def test_when_finding_destinations_for_an_event_then_those_of_fitting_profiles_are_returned(self):
+        matcher = NotificationProfileMatcher.build()
+        destinations = matcher.find_destinations_for_event(self.event, get_matching_incident(self.incident))
+        self.assertEqual(destinations, {self.destination})
+
+    def test_given_inactive_profiles_then_finding_destinations_for_an_event_skips_them(self):
+        self.profile.active = False
+        self.profile.save()
+        matcher = NotificationProfileMatcher.build()
+        self.assertFalse(matcher.find_destinations_for_event(self.event, get_matching_incident(self.incident)))
+
+    def test_when_finding_destinations_for_an_event_then_it_does_not_query_per_profile(self):
+        for _ in range(3):
+            profile = NotificationProfileFactory(user=self.user, timeslot=self.user.timeslots.first())
+            profile.filters.add(FilterFactory(user=self.user, filter={"maxlevel": 5}))
+        matcher = NotificationProfileMatcher.build()
+        incident = get_matching_incident(self.incident)
+        with self.assertNumQueries(0):
+            matcher.find_destinations_for_event(self.event, incident)
+
+    @patch("argus.notificationprofile.matcher._can_store_matcher", return_value=True)
+    def test_when_getting_the_matcher_again_then_the_compiled_profiles_are_reused(self, _):
+        invalidate_notification_profile_matcher()
+        matcher = get_notification_profile_matcher()
+        self.assertIs(matcher, get_notification_profile_matcher())
+
+    @patch("argus.notificationprofile.matcher._can_store_matcher", return_value=True)
+    def test_when_a_profile_changes_then_the_profiles_are_recompiled(self, _):
+        invalidate_notification_profile_matcher()
+        matcher = get_notification_profile_matcher()
+        self.profile.active = False
+        self.profile.save()
+        new_matcher = get_notification_profile_matcher()
+        self.assertIsNot(matcher, new_matcher)
+        self.assertEqual(len(new_matcher), 0)
+
+    @patch("argus.notificationprofile.matcher._can_store_matcher", return_value=True)
+    def test_when_the_filters_of_a_profile_change_then_the_profiles_are_recompiled(self, _):
+        invalidate_notification_profile_matcher()
+        matcher = get_notification_profile_matcher()
+        self.profile.filters.clear()
+        self.assertIsNot(matcher, get_notification_profile_matcher())
+
+    def test_given_committed_change_when_inside_a_transaction_then_the_matcher_is_kept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_notification_profile_matcher()
+        matcher = get_notification_profile_matcher()
+        self.assertIs(matcher, get_notification_profile_matcher())
+
+    def test_given_uncommitted_change_when_compiling_then_the_matcher_is_not_kept(self):
+        invalidate_notification_profile_matcher()
+        self.assertIsNot(get_notification_profile_matcher(), get_notification_profile_matcher())
+
+    def test_when_a_profile_changes_then_other_processes_recompile_only_after_commit(self):
+        generation = cache.get(GENERATION_CACHE_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_notification_profile_matcher()
+            self.assertEqual(cache.get(GENERATION_CACHE_KEY, 0), generation)
+        self.assertEqual(cache.get(GENERATION_CACHE_KEY), generation + 1)
+
+    @patch("argus.notificationprofile.matcher._can_store_matcher", return_value=True)
+    def test_given_a_max_age_of_zero_then_compiled_profiles_are_not_cached(self, _):
+        with override_settings(ARGUS_NOTIFICATION_MATCHER_MAX_AGE=0):
+            matcher = get_notification_profile_matcher()
+            self.assertIsNot(matcher, get_notification_profile_matcher())
+
+
+@tag("unittest")
+class NotificationProfileIndexTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.source = SourceSystemFactory()
+        self.other_source = SourceSystemFactory()
+        self.incident = StatefulIncidentFactory(start_time=tznow(), source=self.source, level=2)
+        self.user = PersonUserFactory()
+        self.timeslot = self.user.timeslots.first()
+
+    def tearDown(self):
+        connect_signals()
+
+    def _add_profile(self, *filterblobs):
+        profile = NotificationProfileFactory(user=self.user, timeslot=self.timeslot, active=True)
+        for filterblob in filterblobs:
+            profile.filters.add(FilterFactory(user=self.user, filter=filterblob))
+        return profile
+
+    def _get_candidate_pks(self):
+        index = NotificationProfileMatcher.build().index
+        incident = get_matching_incident(self.incident)
+        return [profile.pk for profile in index.get_candidates(incident)]
+
+    def test_given_profiles_without_list_constraints_then_they_are_always_candidates(self):
+        profile = self._add_profile({"open": True})
+        self.assertEqual(self._get_candidate_pks(), [profile.pk])
+
+    def test_given_profiles_for_other_sources_then_they_are_not_candidates(self):
+        profile = self._add_profile({"sourceSystemIds": [self.source.pk]})
+        self._add_profile({"sourceSystemIds": [self.other_source.pk]})
+        self.assertEqual(self._get_candidate_pks(), [profile.pk])
+
+    def test_given_profiles_with_many_filters_then_they_are_indexed_on_any_of_them(self):
+        self._add_profile({"open": True}, {"sourceSystemIds": [self.other_source.pk]})
+        self.assertEqual(self._get_candidate_pks(), [])
+
+    def test_given_profiles_with_tags_the_incident_lacks_then_they_are_not_candidates(self):
+        tag = TagFactory(key="host", value="example.org")
+        self.incident.incident_tag_relations.create(tag=tag, added_by=self.user)
+        profile = self._add_profile({"tags": ["host=example.org"]})
+        self._add_profile({"tags": ["host=example.com"]})
+        self.assertEqual(self._get_candidate_pks(), [profile.pk])
+
+    def test_given_profiles_with_lower_maxlevel_than_the_incident_then_they_are_not_candidates(self):
+        profile = self._add_profile({"maxlevel": 3})
+        self._add_profile({"maxlevel": 1})
+        self.assertEqual(self._get_candidate_pks(), [profile.pk])
+
+    @override_settings(ARGUS_FALLBACK_FILTER={"maxlevel": 1})
+    def test_fallback_filter_is_used_when_indexing(self):
+        self._add_profile({"open": True})
+        self.assertEqual(self._get_candidate_pks(), [])
+
+    def test_given_source_and_maxlevel_constraints_then_the_source_constraint_is_preferred(self):
+        self._add_profile({"maxlevel": 5, "sourceSystemIds": [self.other_source.pk]})
+        index = NotificationProfileMatcher.build().index
+        self.assertEqual(index.maxlevels, [])
+        self.assertNotIn((NotificationProfileIndex.KEY_PRIORITY[-1], 5), index.buckets)
@@ -1,19 +1,24 @@
 import logging
+from unittest.mock import patch
 
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.exceptions import ValidationError
 
 from argus.auth.factories import PersonUserFactory
 from argus.filter.factories import FilterFactory
-from argus.incident.factories import EventFactory, create_fake_incident
+from argus.incident.factories import EventFactory, IncidentFactory, create_fake_incident
 from argus.incident.models import get_or_create_default_instances, Event
 from argus.notificationprofile import factories
 from argus.notificationprofile.media import safely_get_medium_object
 from argus.notificationprofile.media import find_destinations_for_event
 from argus.notificationprofile.media import find_destinations_for_many_events
 from argus.notificationprofile.media import get_notification_media
-from argus.notificationprofile.media.base import NotificationMedium
-from argus.notificationprofile.media.email import modelinstance_to_dict
+from argus.notificationprofile.media import precompile_notification_templates
+from argus.notificationprofile.media import send_notification
+from argus.notificationprofile.media.base import NotificationMedium, render_cache
+from argus.notificationprofile.media.email import EmailNotification, modelinstance_to_dict
 from argus.notificationprofile.models import Media
 from argus.util.testing import disconnect_signals, connect_signals
 
@@ -27,6 +32,42 @@ class SerializeModelTest(TestCase):
         self.assertEqual(attributes1, attributes2)
 
 
+class RenderCacheTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.event = EventFactory(incident=IncidentFactory())
+
+    def tearDown(self):
+        connect_signals()
+
+    @patch("argus.notificationprofile.media.base.render_to_string", return_value="rendered")
+    def test_given_a_render_cache_then_an_event_is_rendered_once_per_template(self, render):
+        with render_cache():
+            EmailNotification.create_message_context(self.event)
+            with render_cache():
+                EmailNotification.create_message_context(self.event)
+        self.assertEqual(render.call_count, 2)  # text and html
+
+    @patch("argus.notificationprofile.media.base.render_to_string", return_value="rendered")
+    def test_given_no_render_cache_then_an_event_is_rendered_every_time(self, render):
+        EmailNotification.create_message_context(self.event)
+        EmailNotification.create_message_context(self.event)
+        self.assertEqual(render.call_count, 4)
+
+    @patch("argus.notificationprofile.media.get_template")
+    def test_when_precompiling_notification_templates_then_templates_of_all_media_are_loaded(self, get_template):
+        precompile_notification_templates()
+        get_template.assert_any_call("notificationprofile/email.txt")
+
+    @override_settings(SEND_NOTIFICATIONS=True)
+    @patch("argus.notificationprofile.media._templates_precompiled", False)
+    @patch("argus.notificationprofile.media.precompile_notification_templates")
+    def test_when_the_first_notification_is_sent_then_templates_are_precompiled(self, precompile):
+        send_notification([], self.event)
+        send_notification([], self.event)
+        precompile.assert_called_once_with()
+
+
 class FindDestinationsTest(TestCase):
     def setUp(self):
         disconnect_signals()
@@ -187,6 +228,19 @@ class FindDestinationsTest(TestCase):
         self.assertNotIn(self.extra_destination1, destinations[event3])
         self.assertIn(self.extra_destination2, destinations[event3])
 
+    def test_when_finding_destinations_for_many_events_then_it_does_not_query_per_event(self):
+        def count_queries(events):
+            with CaptureQueriesContext(connection) as context:
+                find_destinations_for_many_events(events)
+            return len(context.captured_queries)
+
+        incidents = [create_fake_incident(tags=["foo=bar"]) for _ in range(4)]
+        events = [incident.events.get(type=Event.Type.INCIDENT_START) for incident in incidents]
+        self.assertEqual(count_queries(events[:1]), count_queries(events))
+
+    def test_find_destinations_for_many_events_given_no_events_returns_empty_dict(self):
+        self.assertEqual(find_destinations_for_many_events([]), {})
+
 
 class GetNotificationMediaTests(TestCase):
     def setUp(self):
@@ -0,0 +1,100 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase, TestCase, tag
+
+from argus.notificationprofile.media import background_send_notification
+from argus.notificationprofile.media.pool import NotificationWorkerPool
+
+
+@tag("unittest")
+class NotificationWorkerPoolTests(SimpleTestCase):
+    def test_when_notifications_are_submitted_then_the_same_long_lived_threads_send_them(self):
+        threads = set()
+
+        def send(*args):
+            threads.add(threading.current_thread().name)
+
+        pool = NotificationWorkerPool(send, workers=1)
+        for number in range(5):
+            self.assertTrue(pool.submit(["destination"], number))
+        pool.join()
+        self.assertEqual(threads, {"argus-notification-worker-0"})
+
+    def test_given_a_full_queue_then_it_sends_in_the_foreground(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def send(arg):
+            if arg == "first":
+                started.set()
+                release.wait(5)
+
+        send = Mock(side_effect=send)
+        pool = NotificationWorkerPool(send, workers=1, max_queue_size=1)
+        pool.submit("first")
+        self.assertTrue(started.wait(5))  # taken by the worker, which now blocks
+        pool.submit("second")  # fills the queue
+        with self.assertLogs("argus.notificationprofile.media.pool", level="WARNING"):
+            self.assertFalse(pool.submit("third"))
+        release.set()
+        pool.join()
+        self.assertEqual(send.call_count, 3)
+
+    def test_when_a_send_fails_then_the_worker_keeps_going(self):
+        send = Mock(side_effect=[ValueError("broken"), None])
+        pool = NotificationWorkerPool(send, workers=1)
+        with self.assertLogs("argus.notificationprofile.media.pool", level="ERROR"):
+            pool.submit("first")
+            pool.join()
+        pool.submit("second")
+        pool.join()
+        self.assertEqual(send.call_count, 2)
+
+    def test_when_shut_down_then_queued_notifications_are_sent_before_the_threads_stop(self):
+        sent = []
+
+        def send(number):
+            time.sleep(0.01)
+            sent.append(number)
+
+        pool = NotificationWorkerPool(send, workers=1)
+        for number in range(5):
+            pool.submit(number)
+        pool.shutdown()
+        self.assertEqual(sent, list(range(5)))
+        self.assertFalse(any(thread.is_alive() for thread in pool.threads))
+
+    def test_given_shut_down_pool_when_submitting_then_it_should_send_in_the_foreground(self):
+        send = Mock()
+        pool = NotificationWorkerPool(send, workers=1)
+        pool.shutdown()
+        self.assertFalse(pool.submit("late"))
+        send.assert_called_once_with("late")
+        self.assertEqual(pool.threads, [])
+
+    def test_given_stuck_worker_when_shut_down_then_it_should_give_up_after_the_timeout(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        pool = NotificationWorkerPool(lambda arg: release.wait(5), workers=1)
+        pool.submit("stuck")
+        pool.submit("queued")
+        with self.assertLogs("argus.notificationprofile.media.pool", level="ERROR"):
+            pool.shutdown(timeout=0.1)
+
+    @patch("argus.notificationprofile.media.pool.atexit.register")
+    def test_it_should_shut_down_at_exit(self, register):
+        pool = NotificationWorkerPool(Mock())
+        register.assert_called_once_with(pool.shutdown)
+
+
+@tag("unittest")
+class BackgroundSendNotificationTests(TestCase):
+    def test_when_committed_then_the_events_are_handed_to_the_pool(self):
+        pool = Mock()
+        with patch("argus.notificationprofile.media.get_notification_worker_pool", return_value=pool):
+            with self.captureOnCommitCallbacks(execute=True):
+                background_send_notification(["destination"], "event")
+                pool.submit.assert_not_called()
+        pool.submit.assert_called_once_with(["destination"], "event")
@@ -0,0 +1,79 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import random
+
+from django.db.models import prefetch_related_objects
+from django.test import SimpleTestCase, TestCase, override_settings, tag
+
+from argus.auth.factories import PersonUserFactory
+from argus.notificationprofile.factories import TimeRecurrenceFactory, TimeslotFactory
+from argus.notificationprofile.models import TimeRecurrence, Timeslot
+from argus.notificationprofile.schedule import WeekSchedule
+
+
+def recurrence(days, start, end):
+    return TimeRecurrence(days=days, start=time.fromisoformat(start), end=time.fromisoformat(end))
+
+
+@tag("unittest")
+@override_settings(TIME_ZONE="Europe/Oslo")
+class WeekScheduleTests(SimpleTestCase):
+    def test_given_overlapping_and_adjacent_recurrences_then_they_are_merged(self):
+        schedule = WeekSchedule(
+            [
+                recurrence([1], "08:00", "12:00"),
+                recurrence([1], "11:00", "13:00"),
+                recurrence([1], "13:00:00.000001", "14:00"),
+                recurrence([1], "16:00", "17:00"),
+            ]
+        )
+        self.assertEqual(len(schedule), 2)
+
+    def test_given_a_time_at_either_end_then_it_is_included_to_the_microsecond(self):
+        schedule = WeekSchedule([recurrence([1], "00:30:00", "00:30:01")])
+        monday = datetime(2019, 11, 25, 0, 30, tzinfo=dt_timezone(timedelta(hours=1)))
+        self.assertIn(monday, schedule)
+        self.assertIn(monday.replace(second=1), schedule)
+        self.assertNotIn(monday.replace(second=1, microsecond=1), schedule)
+        self.assertNotIn(monday - timedelta(microseconds=1), schedule)
+
+    def test_given_daylight_saving_time_then_local_wall_clock_time_is_used(self):
+        schedule = WeekSchedule([recurrence(range(1, 8), "08:00", "09:00")])
+        # 08:30 in Oslo is 07:30 UTC in winter and 06:30 UTC in summer
+        self.assertIn(datetime(2024, 1, 15, 7, 30, tzinfo=dt_timezone.utc), schedule)
+        self.assertNotIn(datetime(2024, 7, 15, 7, 30, tzinfo=dt_timezone.utc), schedule)
+        self.assertIn(datetime(2024, 7, 15, 6, 30, tzinfo=dt_timezone.utc), schedule)
+
+    def test_when_checking_the_schedule_then_it_gives_the_same_answer_as_each_recurrence(self):
+        rng = random.Random(42)
+        recurrences = [
+            recurrence(rng.sample(range(1, 8), rng.randint(1, 7)), f"{hour:02}:00", f"{hour + 2:02}:59:59")
+            for hour in rng.sample(range(0, 21), 4)
+        ]
+        schedule = WeekSchedule(recurrences)
+        start = datetime(2024, 3, 25, tzinfo=dt_timezone.utc)
+        for _ in range(500):
+            timestamp = start + timedelta(seconds=rng.randint(0, 14 * 24 * 3600))
+            expected = any(recurrence.timestamp_is_within(timestamp) for recurrence in recurrences)
+            self.assertEqual(timestamp in schedule, expected, timestamp)
+
+
+@tag("database")
+class TimeslotWeekScheduleTests(TestCase):
+    def setUp(self):
+        self.timeslot = TimeslotFactory(user=PersonUserFactory())
+        TimeRecurrenceFactory(timeslot=self.timeslot, days=[1], start=time(8), end=time(9))
+
+    def test_when_time_recurrences_are_prefetched_then_the_schedule_is_kept(self):
+        timeslot = Timeslot.objects.prefetch_related("time_recurrences").get(pk=self.timeslot.pk)
+        schedule = timeslot.get_week_schedule()
+        with self.assertNumQueries(0):
+            self.assertIs(timeslot.get_week_schedule(), schedule)
+            timeslot.timestamp_is_within_time_recurrences(datetime.now(dt_timezone.utc))
+
+    def test_schedule_is_rebuilt_when_time_recurrences_change(self):
+        timeslot = Timeslot.objects.prefetch_related("time_recurrences").get(pk=self.timeslot.pk)
+        schedule = timeslot.get_week_schedule()
+        timeslot.time_recurrences.create(days=[1, 2, 3, 4, 5, 6, 7], start=time.min, end=time.max)
+        prefetch_related_objects([timeslot], "time_recurrences")
+        self.assertIsNot(timeslot.get_week_schedule(), schedule)
+        self.assertTrue(timeslot.timestamp_is_within_time_recurrences(datetime.now(dt_timezone.utc)))
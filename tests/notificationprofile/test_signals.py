@@ -2,7 +2,7 @@ from unittest.mock import Mock, patch
 
 from django.apps import apps
 from django.core.exceptions import ImproperlyConfigured
-from django.test import SimpleTestCase, TestCase, tag
+from django.test import SimpleTestCase, TestCase, override_settings, tag
 
 from argus.notificationprofile.media.base import AppriseMedium
 from argus.notificationprofile.media.email import EmailNotification
@@ -58,3 +58,18 @@ class TestTaskBackgroundSendNotification(SimpleTestCase):
                 task_background_send_notification(None, event)
                 guard.assert_called_once_with(event=event)
                 task.enqueue.assert_called_once_with("blapp")
+
+    @override_settings(ARGUS_NOTIFICATION_COALESCE_WINDOW=0.5)
+    def test_given_coalescing_then_event_is_added_to_coalescer(self):
+        with patch(
+            "argus.notificationprofile.signals.event_covered_by_planned_maintenance", return_value=False
+        ) as guard:
+            with patch("argus.notificationprofile.signals.task_check_for_notifications") as task:
+                with patch("argus.notificationprofile.signals.event_coalescer") as coalescer:
+                    with patch("argus.notificationprofile.signals.transaction.on_commit", side_effect=lambda f: f()):
+                        event = Mock()
+                        event.id = "blapp"
+                        task_background_send_notification(None, event)
+                        guard.assert_called_once_with(event=event)
+                        task.enqueue.assert_not_called()
+                        coalescer.add.assert_called_once_with("blapp", 0.5)
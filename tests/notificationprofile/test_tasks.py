@@ -2,7 +2,18 @@ from unittest.mock import Mock, patch
 
 from django.test import TestCase
 
-from argus.notificationprofile.tasks import task_check_for_notifications, task_send_notifications
+from argus.auth.factories import PersonUserFactory
+from argus.incident.factories import EventFactory
+from argus.notificationprofile.factories import DestinationConfigFactory
+from argus.notificationprofile.models import Media
+from argus.notificationprofile.tasks import (
+    enqueue_notifications_per_medium,
+    task_check_for_notifications,
+    task_check_for_notifications_for_many_events,
+    task_send_many_notifications,
+    task_send_notifications,
+)
+from argus.util.testing import connect_signals, disconnect_signals
 
 
 class TestTaskSendNotifications(TestCase):
@@ -42,18 +53,77 @@ class TestTaskCheckForNotifications(TestCase):
             guard.assert_called_once()
 
     @patch("argus.notificationprofile.tasks.Event.objects")
-    def test_known_event_and_destinations_calls_task_send_notifications(self, event_qs):
-        event_qs.get.return_value = "foo"
-        destination1 = Mock()
-        destination1.id = 1
-        destination2 = Mock()
-        destination2.id = 2
+    def test_given_known_event_and_destinations_then_one_task_per_medium_is_enqueued(self, event_qs):
+        event = Mock()
+        event.id = 5
+        event_qs.get.return_value = event
+        destination1 = Mock(id=1, media_id="email")
+        destination2 = Mock(id=2, media_id="sms")
+        destination3 = Mock(id=3, media_id="email")
         with patch(
             "argus.notificationprofile.tasks.find_destinations_for_event",
-            return_value=(destination1, destination2),
+            return_value=(destination1, destination2, destination3),
         ) as guard:
-            with patch("argus.notificationprofile.tasks.task_send_notifications") as task:
+            with patch("argus.notificationprofile.tasks.task_send_many_notifications") as task:
                 task.enqueue.return_value = None
                 task_check_for_notifications.func(0)
                 guard.assert_called_once()
                 self.assertEqual(task.enqueue.call_count, 2)
+                task.enqueue.assert_any_call([(5, [1, 3])])
+                task.enqueue.assert_any_call([(5, [2])])
+
+
+class TestTaskCheckForNotificationsForManyEvents(TestCase):
+    def test_given_unknown_events_then_it_aborts_early(self):
+        with patch("argus.notificationprofile.tasks.find_destinations_for_many_events") as guard:
+            task_check_for_notifications_for_many_events.func([0, -1])
+            guard.assert_not_called()
+
+    @patch("argus.notificationprofile.tasks.Event.objects")
+    def test_given_known_events_but_no_destinations_then_it_aborts_early(self, event_qs):
+        event_qs.filter.return_value = ["foo"]
+        with patch("argus.notificationprofile.tasks.find_destinations_for_many_events", return_value={}) as guard:
+            with patch("argus.notificationprofile.tasks.task_send_many_notifications") as task:
+                task_check_for_notifications_for_many_events.func([0])
+                guard.assert_called_once()
+                task.enqueue.assert_not_called()
+
+
+class EnqueueNotificationsPerMediumTests(TestCase):
+    def test_given_many_events_then_the_notifications_are_grouped_per_medium(self):
+        event1 = Mock(id=1)
+        event2 = Mock(id=2)
+        email1 = Mock(id=10, media_id="email")
+        email2 = Mock(id=11, media_id="email")
+        sms = Mock(id=20, media_id="sms")
+        with patch("argus.notificationprofile.tasks.task_send_many_notifications") as task:
+            enqueue_notifications_per_medium({event1: {email1, sms}, event2: {email1, email2}})
+        self.assertEqual(task.enqueue.call_count, 2)
+        task.enqueue.assert_any_call([(1, [10]), (2, [10, 11])])
+        task.enqueue.assert_any_call([(1, [20])])
+
+
+class TestTaskSendManyNotifications(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.event = EventFactory()
+        user = PersonUserFactory()
+        self.destination = user.destinations.get()  # default email
+        self.other_destination = DestinationConfigFactory(
+            user=user, media=Media.objects.get(slug="email"), settings={"email_address": "b@c.de"}
+        )
+
+    def tearDown(self):
+        connect_signals()
+
+    def test_when_run_then_each_event_is_sent_to_its_destinations(self):
+        notifications = [(self.event.id, [self.destination.id, self.other_destination.id])]
+        with patch("argus.notificationprofile.tasks.send_notification") as send:
+            task_send_many_notifications.func(notifications)
+        send.assert_called_once_with([self.destination, self.other_destination], self.event)
+
+    def test_given_unknown_events_and_destinations_then_they_are_skipped(self):
+        notifications = [(0, [self.destination.id]), (self.event.id, [0])]
+        with patch("argus.notificationprofile.tasks.send_notification") as send:
+            task_send_many_notifications.func(notifications)
+        send.assert_not_called()
@@ -1,4 +1,8 @@
+from datetime import timedelta
+import json
+
 from django.test import tag
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
@@ -11,6 +15,7 @@ from argus.incident.factories import (
     StatelessIncidentFactory,
     TagFactory,
 )
+from argus.incident.models import Incident
 from argus.notificationprofile.factories import (
     DestinationConfigFactory,
     NotificationProfileFactory,
@@ -243,19 +248,63 @@ class NotificationIncidentViewTests(APITestCase):
         )
         self.notification_profile1 = NotificationProfileFactory(user=user1, timeslot=timeslot1)
         self.notification_profile1.filters.add(filter1)
+        self.path = f"/api/v2/notificationprofiles/{self.notification_profile1.pk}/incidents/"
 
     def tearDown(self):
         connect_signals()
 
     def test_should_get_list_of_all_incidents_matched_by_notification_profile(self):
-        response = self.user1_rest_client.get(
-            path=f"/api/v2/notificationprofiles/{self.notification_profile1.pk}/incidents/"
-        )
+        response = self.user1_rest_client.get(path=self.path)
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)  # 1, not 2
         self.assertEqual(response.data[0]["pk"], self.incident1.pk)
 
+    def test_it_should_get_incidents_matched_by_any_filter_of_notification_profile(self):
+        filter2 = FilterFactory(
+            user=self.notification_profile1.user,
+            name="Other incidents",
+            filter={"sourceSystemIds": [self.source2.pk]},
+        )
+        self.notification_profile1.filters.add(filter2)
+
+        response = self.user1_rest_client.get(path=self.path)
+
+        self.assertEqual(
+            {incident["pk"] for incident in response.data}, set(Incident.objects.values_list("pk", flat=True))
+        )
+        self.assertEqual(len(response.data), 2)
+
+    def test_should_stream_incidents_when_asked_to(self):
+        response = self.user1_rest_client.get(path=self.path, data={"stream": "true"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([incident["pk"] for incident in data], [self.incident1.pk])
+
+    def test_should_not_stream_incidents_when_told_not_to(self):
+        response = self.user1_rest_client.get(path=self.path, data={"stream": "false"})
+
+        self.assertEqual([incident["pk"] for incident in response.data], [self.incident1.pk])
+
+    def test_it_should_reject_invalid_stream_value(self):
+        response = self.user1_rest_client.get(path=self.path, data={"stream": "maybe"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_should_paginate_incidents_when_asked_for_a_page_size(self):
+        incident3 = StatelessIncidentFactory(
+            source=self.source1, start_time=self.incident1.start_time + timedelta(hours=1)
+        )
+
+        response = self.user1_rest_client.get(path=self.path, data={"page_size": 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([incident["pk"] for incident in response.data["results"]], [incident3.pk])
+        response = self.user1_rest_client.get(path=response.data["next"])
+        self.assertEqual([incident["pk"] for incident in response.data["results"]], [self.incident1.pk])
+        self.assertIsNone(response.data["next"])
+
 
 @tag("API", "integration")
 class NotificationFilterIncidentViewTests(APITestCase):
@@ -313,6 +362,53 @@ class NotificationFilterIncidentViewTests(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]["pk"], self.incident1.pk)
 
+    def test_when_asked_to_count_then_the_preview_counts_matching_incidents(self):
+        for path in ("/api/v2/notificationprofiles/preview/", "/api/v2/notificationprofiles/filterpreview/"):
+            response = self.user1_rest_client.post(f"{path}?count", {"stateful": False}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data, {"count": 2})
+
+    def test_preview_does_not_count_when_told_not_to(self):
+        response = self.user1_rest_client.post(
+            "/api/v2/notificationprofiles/preview/?count=false", {"stateful": False}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_given_an_invalid_count_then_the_preview_rejects_it(self):
+        response = self.user1_rest_client.post(
+            "/api/v2/notificationprofiles/preview/?count=lots", {"stateful": False}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_given_a_limit_then_the_preview_returns_only_the_newest_incidents(self):
+        newest = StatelessIncidentFactory(source=self.source1, start_time=timezone.now() + timedelta(days=2))
+
+        response = self.user1_rest_client.post(
+            "/api/v2/notificationprofiles/preview/?limit=1", {"stateful": False}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([incident["pk"] for incident in response.data], [newest.pk])
+
+    def test_given_an_invalid_limit_then_the_preview_rejects_it(self):
+        response = self.user1_rest_client.post(
+            "/api/v2/notificationprofiles/preview/?limit=many", {"stateful": False}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_given_a_page_size_then_the_preview_paginates_incidents(self):
+        filterblob = {"stateful": False}
+        response = self.user1_rest_client.post(
+            "/api/v2/notificationprofiles/preview/?page_size=1", filterblob, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pks = [incident["pk"] for incident in response.data["results"]]
+        response = self.user1_rest_client.post(response.data["next"], filterblob, format="json")
+        pks += [incident["pk"] for incident in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(sorted(pks), sorted(Incident.objects.values_list("pk", flat=True)))
+
 
 @tag("API", "integration")
 class FilterViewTests(APITestCase):
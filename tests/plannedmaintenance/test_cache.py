@@ -0,0 +1,107 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from argus.filter.factories import FilterFactory
+from argus.incident.factories import EventFactory, StatefulIncidentFactory
+from argus.incident.models import Event
+from argus.notificationprofile.signals import task_background_send_notifications_for_many_events
+from argus.plannedmaintenance.cache import (
+    GENERATION_CACHE_KEY,
+    PlannedMaintenanceCache,
+    get_planned_maintenance_cache,
+    invalidate_planned_maintenance_cache,
+)
+from argus.plannedmaintenance.factories import PlannedMaintenanceFactory
+from argus.plannedmaintenance.utils import event_covered_by_planned_maintenance
+from argus.util.testing import connect_signals, disconnect_signals
+
+
+@tag("database")
+class PlannedMaintenanceCacheTests(TestCase):
+    def setUp(self):
+        disconnect_signals()
+        self.now = timezone.now()
+        self.incident = StatefulIncidentFactory(level=3)
+        self.event = EventFactory(incident=self.incident, type=Event.Type.INCIDENT_START, timestamp=self.now)
+        self.filter = FilterFactory(filter={"maxlevel": 3})
+
+    def tearDown(self):
+        connect_signals()
+        invalidate_planned_maintenance_cache()
+
+    def test_given_past_tasks_then_they_are_not_loaded(self):
+        PlannedMaintenanceFactory(start_time=self.now - timedelta(days=5), end_time=self.now - timedelta(days=4))
+        current = PlannedMaintenanceFactory()
+        future = PlannedMaintenanceFactory(start_time=self.now + timedelta(days=1))
+        tasks = PlannedMaintenanceCache.build()
+        self.assertEqual({task.pk for task in tasks.tasks}, {current.pk, future.pk})
+
+    def test_given_an_event_during_a_current_task_with_fitting_filter_then_it_is_covered(self):
+        pm = PlannedMaintenanceFactory()
+        pm.filters.add(self.filter)
+        self.assertTrue(PlannedMaintenanceCache.build().event_is_covered(self.event))
+
+    def test_given_an_event_before_a_future_task_then_it_is_not_covered(self):
+        pm = PlannedMaintenanceFactory(start_time=self.now + timedelta(days=1))
+        pm.filters.add(self.filter)
+        self.assertFalse(PlannedMaintenanceCache.build().event_is_covered(self.event))
+
+    def test_given_an_old_event_then_it_is_checked_against_the_database(self):
+        pm = PlannedMaintenanceFactory(start_time=self.now - timedelta(days=5), end_time=self.now - timedelta(days=4))
+        pm.filters.add(self.filter)
+        old_event = EventFactory(incident=self.incident, timestamp=self.now - timedelta(days=4, hours=12))
+        self.assertTrue(PlannedMaintenanceCache.build().event_is_covered(old_event))
+
+    def test_given_no_current_tasks_then_checking_events_costs_no_queries(self):
+        tasks = PlannedMaintenanceCache.build()
+        with self.assertNumQueries(0):
+            self.assertFalse(tasks.event_is_covered(self.event))
+
+    @patch("argus.plannedmaintenance.cache._can_store_tasks", return_value=True)
+    def test_when_a_task_changes_then_the_tasks_are_reloaded(self, _):
+        invalidate_planned_maintenance_cache()
+        tasks = get_planned_maintenance_cache()
+        self.assertIs(tasks, get_planned_maintenance_cache())
+        PlannedMaintenanceFactory().filters.add(self.filter)
+        self.assertIsNot(tasks, get_planned_maintenance_cache())
+        self.assertTrue(event_covered_by_planned_maintenance(self.event))
+
+    def test_given_a_transaction_then_the_tasks_are_kept_inside_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_planned_maintenance_cache()
+        tasks = get_planned_maintenance_cache()
+        self.assertIs(tasks, get_planned_maintenance_cache())
+
+    def test_given_an_uncommitted_change_then_the_tasks_are_not_kept(self):
+        invalidate_planned_maintenance_cache()
+        self.assertIsNot(get_planned_maintenance_cache(), get_planned_maintenance_cache())
+
+    def test_when_a_task_changes_then_other_processes_reload_only_after_commit(self):
+        generation = cache.get(GENERATION_CACHE_KEY, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_planned_maintenance_cache()
+            self.assertEqual(cache.get(GENERATION_CACHE_KEY, 0), generation)
+        self.assertEqual(cache.get(GENERATION_CACHE_KEY), generation + 1)
+
+    def test_given_many_events_then_they_are_checked_against_one_load_of_the_tasks(self):
+        PlannedMaintenanceFactory().filters.add(self.filter)
+        invalidate_planned_maintenance_cache()
+        events = [EventFactory(incident=self.incident, timestamp=self.now) for _ in range(5)]
+        with patch("argus.notificationprofile.signals.task_check_for_notifications_for_many_events"):
+            with CaptureQueriesContext(connection) as queries:
+                task_background_send_notifications_for_many_events(sender=Event, events=events)
+        # The tasks and their filters, once
+        pm_queries = [query for query in queries if "argus_plannedmaintenance" in query["sql"]]
+        self.assertEqual(len(pm_queries), 2)
+
+    @patch("argus.plannedmaintenance.cache._can_store_tasks", return_value=True)
+    def test_given_a_max_age_of_zero_then_tasks_are_not_cached(self, _):
+        with override_settings(ARGUS_PLANNED_MAINTENANCE_CACHE_MAX_AGE=0):
+            tasks = get_planned_maintenance_cache()
+            self.assertIsNot(tasks, get_planned_maintenance_cache())